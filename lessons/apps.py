@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class LessonsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lessons'
+
+    def ready(self):
+        """
+        Connect the signal receivers that keep denormalised data up to date
+        """
+        from lessons import signals
@@ -1,12 +1,12 @@
 from django import forms
-from ..models import User, UserType, StudentProfile, LessonRequest, AvailabilityPeriod, LessonBooking
+from ..models import User, UserType, StudentProfile, TeacherProfile, LessonRequest, AvailabilityPeriod, LessonBooking
 from django.core.validators import RegexValidator
 from django.core.exceptions import FieldDoesNotExist
 from django.forms import DateInput, TimeField
 from datetime import datetime, timedelta
 from lessons.models.term_models import SchoolTerm
 from django.db.models import Q
-from lessons.helpers import TimeHelper
+from lessons.helpers import TimeHelper, LessonBookingLockHelper, LessonSearchHelper
 
 class RequestLessonForm(forms.ModelForm):
     """
@@ -179,8 +179,10 @@ class BookLessonForm(forms.ModelForm):
         if start_date is None:
             start_date = school_term.start_date
 
-        if teacher and school_term and not teacher.is_available(LessonBooking.objects.filter(teacher=teacher), start_date, end_date, day, start_time, end_time):
-            self.add_error('teacher', 'The selected teacher is not available at the given time')
+        if teacher and school_term and day and interval and quantity:
+            clashes = teacher.clashing_bookings(start_date, end_date, day, start_time, end_time, interval, quantity, school_term_id=school_term.id)
+            if clashes:
+                self.add_error('teacher', LessonBooking.clash_message(clashes))
 
         if start_date < datetime.today().date():
             self.add_error('start_date', 'The lesson start date cannot be in the past')
@@ -230,7 +232,8 @@ class BookLessonForm(forms.ModelForm):
         lesson_booking.admin_profile = self.user.admin_profile
         lesson_booking.lesson_request = self.lesson_request
 
-        lesson_booking.save()
+        # Saved with the teacher locked, in case someone else has booked them since the form was checked
+        LessonBookingLockHelper().save(lesson_booking)
 
 class UpdateLessonBookingForm(forms.ModelForm):
     """
@@ -287,8 +290,11 @@ class UpdateLessonBookingForm(forms.ModelForm):
         if start_date is None:
             start_date = school_term.start_date
 
-        if teacher and school_term and not teacher.is_available(LessonBooking.objects.filter(teacher=teacher).filter(~Q(id=self.instance.id)), start_date, end_date, day, start_time, end_time):
-            self.add_error('teacher', 'The selected teacher is not available at the given time')
+        if teacher and school_term and day and interval and quantity:
+            clashes = teacher.clashing_bookings(start_date, end_date, day, start_time, end_time, interval, quantity,
+                exclude_lesson_booking_id=self.instance.id, school_term_id=school_term.id)
+            if clashes:
+                self.add_error('teacher', LessonBooking.clash_message(clashes))
 
         if start_date < datetime.today().date():
             self.add_error('start_date', 'The lesson start date cannot be in the past')
@@ -336,4 +342,42 @@ class UpdateLessonBookingForm(forms.ModelForm):
         lesson_booking.quantity = self.cleaned_data.get('quantity')
         lesson_booking.duration = self.cleaned_data.get('duration')
 
-        lesson_booking.save()
+        # Saved with the teacher locked, in case someone else has booked them since the form was checked
+        LessonBookingLockHelper().save(lesson_booking)
+
+class ScheduleLessonRequestsForm(forms.Form):
+    """
+    Used to book every unfulfilled lesson request into a term at once
+    """
+    school_term = forms.ModelChoiceField(label='What term should the lessons be booked in?', queryset=SchoolTerm.objects.order_by('start_date'))
+    dry_run = forms.BooleanField(label='Only show the plan, without booking any lessons', required=False, initial=True)
+
+class FilterLessonBookingsForm(forms.Form):
+    """
+    Used to narrow down and order the lesson bookings being viewed, every field is optional
+    """
+    school_term = forms.ModelChoiceField(label='Term', queryset=SchoolTerm.objects.order_by('start_date'), required=False, empty_label='Any term')
+    teacher = forms.ModelChoiceField(label='Teacher', queryset=TeacherProfile.objects.select_related('user').order_by('user__last_name', 'user__first_name'),
+        required=False, empty_label='Any teacher')
+    regular_day = forms.ChoiceField(label='Day', choices=[('', 'Any day')] + AvailabilityPeriod.choices, required=False)
+    from_date = forms.DateField(label='With lessons from', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    until_date = forms.DateField(label='With lessons until', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    sort = forms.ChoiceField(label='Order', choices=[(name, label) for name, (label, keyset) in LessonSearchHelper.LESSON_BOOKING_SORTS.items()], required=False)
+
+    def __init__(self, *args, show_teacher=True, **kwargs):
+        """
+        Teachers only see their own bookings, so they aren't given the teacher filter
+        """
+        super().__init__(*args, **kwargs)
+        if not show_teacher:
+            del self.fields['teacher']
+
+    def clean(self):
+        """
+        The date range can't end before it starts
+        """
+        super().clean()
+        from_date = self.cleaned_data.get('from_date')
+        until_date = self.cleaned_data.get('until_date')
+        if from_date and until_date and until_date < from_date:
+            self.add_error('until_date', 'The end of the date range cannot be before its start')
@@ -1,6 +1,7 @@
 from django import forms
-from ..models import User, UserType, StudentProfile, AdminProfile, Transfer, LessonBooking
+from ..models import User, UserType, StudentProfile, AdminProfile, Transfer, LessonBooking, SchoolTerm
 from django.core.validators import RegexValidator
+from django.core.exceptions import ValidationError
 from datetime import datetime
 
 class RegisterTransferForm(forms.ModelForm):
@@ -15,7 +16,7 @@ class RegisterTransferForm(forms.ModelForm):
         model = Transfer
         fields = [ 'date', 'balance' ]
 
-    invoice_ref_no = forms.CharField(label='Invoice reference number', max_length=10)
+    invoice_ref_no = forms.CharField(label='Invoice reference number', max_length=32)
 
     def clean(self):
         """
@@ -23,14 +24,36 @@ class RegisterTransferForm(forms.ModelForm):
         """
         super().clean()
 
-        if self.cleaned_data.get('date') > datetime.now().date():
-            self.add_error('date', 'The transfer date must not be in the future')
+        date_error = RegisterTransferForm.date_error(self.cleaned_data.get('date'))
+        if date_error:
+            self.add_error('date', date_error)
 
-        lesson_bookings_with_ref = list(filter(lambda booking: booking.invoice_number() == self.cleaned_data.get('invoice_ref_no'), LessonBooking.objects.all()))
-        if len(lesson_bookings_with_ref) == 0:
+        lesson_booking = LessonBooking.objects.filter(invoice_reference=self.cleaned_data.get('invoice_ref_no')).first()
+        if lesson_booking is None:
             self.add_error('invoice_ref_no', 'No invoice associated with that reference number')
         else:
-            self.cleaned_data['invoice_ref_no'] = lesson_bookings_with_ref[0]
+            self.cleaned_data['invoice_ref_no'] = lesson_booking
+
+    @staticmethod
+    def date_error(date):
+        """
+        Returns why a transfer date can't be registered, or None if it can
+        """
+        if date is not None and date > datetime.now().date():
+            return 'The transfer date must not be in the future'
+        return None
+
+    @staticmethod
+    def balance_error(balance):
+        """
+        Returns why a transfer amount can't be registered, or None if it can
+        Runs the same validators that the form applies to the balance of the transfer
+        """
+        try:
+            Transfer._meta.get_field('balance').clean(balance, None)
+        except ValidationError as error:
+            return error.messages[0]
+        return None
 
     def save(self):
         """
@@ -45,3 +68,35 @@ class RegisterTransferForm(forms.ModelForm):
         transfer.save()
 
         return transfer
+
+class ExportTransactionsForm(forms.Form):
+    """
+    Used to choose which transactions are exported and in what format
+    """
+    FORMAT_CHOICES = (
+        ('csv', "CSV"),
+        ('jsonl', "JSON lines"),
+    )
+
+    format = forms.ChoiceField(label='File format', choices=FORMAT_CHOICES)
+    school_term = forms.ModelChoiceField(label='Only include lessons booked within term', queryset=SchoolTerm.objects.all(), required=False)
+    start_date = forms.DateField(label='From (leave blank to start at the first transaction)', required=False)
+    end_date = forms.DateField(label='Until (leave blank to include every transaction since)', required=False)
+
+    def clean(self):
+        """
+        Checks that the date range is in the right order
+        """
+        super().clean()
+
+        start_date = self.cleaned_data.get('start_date')
+        end_date = self.cleaned_data.get('end_date')
+        if start_date and end_date and end_date < start_date:
+            self.add_error('end_date', 'The end date must not be before the start date')
+
+class ImportBankStatementForm(forms.Form):
+    """
+    Used to upload a bank statement whose transfers should be registered
+    """
+    statement = forms.FileField(label='Bank statement (CSV with date, amount and reference columns)')
+    dry_run = forms.BooleanField(label='Only check the statement, without registering any transfers', required=False)
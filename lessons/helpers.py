@@ -1,5 +1,13 @@
 from datetime import datetime, timedelta, date 
 from decimal import *
+import heapq
+import bisect
+import csv
+import json
+import re
+import threading
+from contextlib import contextmanager
+from django.core import signing
 
 class TimeHelper:
     """
@@ -17,35 +25,974 @@ class TransactionModelHelper:
     Contains functions that help with transactions
     """
 
-    def assign_balances(self, transactions):
+    # The number of transactions shown on each page of a ledger
+    TRANSACTIONS_PER_PAGE = 50
+
+    def ledger_page(self, student_profile=None, before=None, page_size=None):
+        """
+        Returns a page of the ledger newest first, along with the cursor of the next (older) page
+        Pages are keyed on (date, is_payment, id) rather than an offset, so every page costs the same to fetch.
+        The first page starts from the balance after every transaction, and each cursor carries the balance on to the next page,
+        so older pages don't have to sum the transactions before them.
+        """
+        if page_size is None:
+            page_size = TransactionModelHelper.TRANSACTIONS_PER_PAGE
+
+        transfer_sql, transfer_params, booking_sql, booking_params = self._ledger_select_sql(student_profile)
+
+        keyset = ""
+        keyset_params = []
+        if before:
+            keyset = "WHERE (ledger.date < %s OR (ledger.date = %s AND (ledger.is_payment < %s OR (ledger.is_payment = %s AND ledger.id < %s))))"
+            keyset_params = [before[0], before[0], before[1], before[1], before[2]]
+
+        # Each side of the union is ordered and limited on its own so neither is read in full
+        sql = f"""
+            SELECT * FROM (
+                SELECT * FROM (SELECT ledger.* FROM ({ transfer_sql }) ledger { keyset }
+                    ORDER BY ledger.date DESC, ledger.id DESC LIMIT %s) transfers
+                UNION ALL
+                SELECT * FROM (SELECT ledger.* FROM ({ booking_sql }) ledger { keyset }
+                    ORDER BY ledger.date DESC, ledger.id DESC LIMIT %s) bookings
+            ) ledger
+            ORDER BY ledger.date DESC, ledger.is_payment DESC, ledger.id DESC
+            LIMIT %s
+        """
+        params = transfer_params + keyset_params + [page_size + 1] + booking_params + keyset_params + [page_size + 1, page_size + 1]
+        rows = self._fetch_values(sql, params)
+
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if not rows:
+            return [], None
+
+        # Every transaction shows the closing balance of its day, which is the running balance at the newest transaction of that day
+        if before:
+            day, day_balance, balance = before[0], before[4], before[3]
+        else:
+            day, day_balance = None, None
+            balance = self.opening_balance(student_profile, self.to_date(rows[0][2]) + timedelta(days=1))
+
+        balances = {}
+        for row in rows:
+            row_date = self.to_date(row[2])
+            if row_date != day:
+                day, day_balance = row_date, balance
+            balances[(row[0], row[1])] = day_balance
+            balance -= self.to_decimal(row[3])
+
+        next_cursor = None
+        if has_more:
+            next_cursor = self.encode_ledger_cursor(student_profile, day, rows[-1][0], rows[-1][1], balance, day_balance)
+
+        return self.view_models(rows, lambda row: balances[(row[0], row[1])]), next_cursor
+
+    def current_balance(self, student_profile=None):
+        """
+        Returns the balance after every transaction, or None if there are no transactions
+        Read from the materialised student accounts rather than the transactions themselves
+        """
+        from django.db.models import Sum
+        from lessons.models import StudentAccount
+
+        accounts = StudentAccount.objects.all()
+        if student_profile:
+            accounts = accounts.filter(student_profile=student_profile)
+
+        totals = accounts.aggregate(balance=Sum('balance'), total_invoiced=Sum('total_invoiced'))
+
+        # Transfers can only be made against lesson bookings, so nothing has been invoiced means no transactions
+        if not totals['total_invoiced']:
+            return None
+        return self.to_decimal(totals['balance'])
+
+    def opening_balance(self, student_profile, before_date):
+        """
+        Returns the balance at the end of the day before the date provided
+        Starts from the latest closed term snapshot, so only the transactions since then are summed
+        """
+        balance, snapshot_date = TermClosingBalanceHelper().snapshot_before(student_profile, before_date)
+
+        union_sql, params = self._ledger_union_sql(student_profile)
+        where = "WHERE ledger.date < %s"
+        params = params + [before_date]
+        if snapshot_date is not None:
+            where += " AND ledger.date > %s"
+            params.append(snapshot_date)
+
+        rows = self._fetch_rows(f"SELECT SUM(ledger.fee) AS balance FROM ({ union_sql }) ledger { where }", params)
+        return balance + self.to_decimal(rows[0]['balance'])
+
+    # Keeps the cursors of ledgers apart from other signed values
+    LEDGER_CURSOR_SALT = 'lessons.ledger_cursor'
+
+    def encode_ledger_cursor(self, student_profile, date, is_payment, id, balance, day_balance):
+        """
+        Returns the cursor used to continue a ledger after the given transaction
+        It carries the running balance before the transaction and the closing balance of its day, and is signed so the balances shown can't be altered
+        """
+        values = [student_profile.id if student_profile else None, date.isoformat(), int(is_payment), id, str(balance), str(day_balance)]
+        return signing.Signer(salt=TransactionModelHelper.LEDGER_CURSOR_SALT).sign_object(values)
+
+    def decode_ledger_cursor(self, cursor, student_profile=None):
+        """
+        Returns the (date, is_payment, id, balance, day_balance) encoded in a cursor,
+        or None if the cursor is invalid or belongs to the ledger of someone else
+        """
+        try:
+            values = signing.Signer(salt=TransactionModelHelper.LEDGER_CURSOR_SALT).unsign_object(cursor)
+            student_profile_id, cursor_date, is_payment, id, balance, day_balance = values
+            if student_profile_id != (student_profile.id if student_profile else None):
+                return None
+            return (date.fromisoformat(cursor_date), int(is_payment), int(id), Decimal(balance), Decimal(day_balance))
+        except (signing.BadSignature, AttributeError, TypeError, ValueError, InvalidOperation):
+            return None
+
+    def student_names(self, student_profile_ids):
+        """
+        Returns a dictionary of student profile id to the student's full name
+        """
+        from lessons.models import StudentProfile
+
+        student_profile_ids = list(student_profile_ids)
+        names = {}
+        # Chunked to stay below the variable limit of older SQLite builds
+        for start in range(0, len(student_profile_ids), 900):
+            rows = StudentProfile.objects.filter(id__in=student_profile_ids[start:start + 900]).values_list('id', 'user__first_name', 'user__last_name')
+            for id, first_name, last_name in rows:
+                names[id] = f"{ first_name } { last_name }"
+        return names
+
+    def view_models(self, rows, balance_for, names=None):
         """
-        Assigns the balance to each transaction
+        Turns ledger rows (in TransactionViewModel.LEDGER_COLUMNS order) into view models
+        Names are looked up once per distinct student unless provided, and the date, fee and name objects
+        are shared between rows with equal values
         """
-        for transaction in transactions:
-            transaction.balance = self.balance_at(transactions, transaction.date)
+        from lessons.view_models import TransactionViewModel
+
+        if names is None:
+            names = self.student_names(set(row[6] for row in rows))
+        dates = {}
+        fees = {}
+
+        transactions = []
+        for row in rows:
+            is_payment, id, raw_date, raw_fee, lesson_booking_id, invoice_reference, student_profile_id = row[:7]
+            transaction_date = dates.get(raw_date)
+            if transaction_date is None:
+                transaction_date = dates[raw_date] = self.to_date(raw_date)
+            fee = fees.get(raw_fee)
+            if fee is None:
+                fee = fees[raw_fee] = self.to_decimal(raw_fee)
+
+            transactions.append(TransactionViewModel(
+                ledger_values=(is_payment, id, transaction_date, fee, lesson_booking_id, invoice_reference, student_profile_id),
+                balance=balance_for(row),
+                student_name=names.get(student_profile_id)))
 
         return transactions
 
-    def format_to_currency(self, value):
+    def _fetch_values(self, sql, params):
+        """
+        Runs a query and returns its rows as tuples
+        """
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _fetch_rows(self, sql, params):
+        """
+        Runs a query and returns its rows as dictionaries
+        """
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _ledger_union_sql(self, student_profile=None):
+        """
+        Returns the SQL and parameters that combine transfers and lesson booking charges into one ledger
+        """
+        transfer_sql, transfer_params, booking_sql, booking_params = self._ledger_select_sql(student_profile)
+        return f"{ transfer_sql } UNION ALL { booking_sql }", transfer_params + booking_params
+
+    def _ledger_select_sql(self, student_profile=None):
+        """
+        Returns the SQL and parameters for the transfer side of the ledger, followed by those of the lesson booking side
+        Columns are in TransactionViewModel.LEDGER_COLUMNS order, names are looked up separately once per student
+        """
+        from lessons.models import Transfer, LessonBooking, LessonRequest
+
+        where = ""
+        student_params = []
+        if student_profile:
+            where = "WHERE lesson_request.student_profile_id = %s"
+            student_params = [student_profile.id]
+
+        student_joins = f"""
+            INNER JOIN {LessonRequest._meta.db_table} lesson_request ON lesson_request.id = lesson_booking.lesson_request_id
+        """
+
+        transfer_sql = f"""
+            SELECT 1 AS is_payment, transfer.id AS id, transfer.date AS date, transfer.balance AS fee,
+                transfer.lesson_booking_id AS lesson_booking_id, lesson_booking.invoice_reference AS invoice_reference,
+                lesson_request.student_profile_id AS student_profile_id
+            FROM {Transfer._meta.db_table} transfer
+            INNER JOIN {LessonBooking._meta.db_table} lesson_booking ON lesson_booking.id = transfer.lesson_booking_id
+            { student_joins }
+            { where }
+        """
+
+        booking_sql = f"""
+            SELECT 0 AS is_payment, lesson_booking.id AS id, lesson_booking.ledger_date AS date,
+                -(%s * lesson_booking.quantity) AS fee, lesson_booking.id AS lesson_booking_id,
+                lesson_booking.invoice_reference AS invoice_reference, lesson_request.student_profile_id AS student_profile_id
+            FROM {LessonBooking._meta.db_table} lesson_booking
+            { student_joins }
+            { where }
+        """
+
+        return transfer_sql, student_params, booking_sql, [LessonBooking.LESSON_PRICE] + student_params
+
+    def to_decimal(self, value):
+        """
+        Converts a value returned by the database to a currency decimal
+        SQLite returns sums as floats, so the value is rounded to pennies
+        """
+        if value is None:
+            return Decimal(0)
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+
+    def to_date(self, value):
+        """
+        Converts a value returned by the database to a date
+        SQLite returns dates from raw queries as ISO formatted strings
+        """
+        if isinstance(value, str):
+            return date.fromisoformat(value[:10])
+        return value
+
+    @staticmethod
+    def format_to_currency(value):
         """
         Formats a number to GBP currency
         """
         # Source: https://bobbyhadz.com/blog/python-format-float-as-currency
         return f"{value:.2f} GBP"
 
-    def balance_at(self, transactions, date):
+class TransactionExportHelper:
+    """
+    Contains methods that stream the school ledger for export
+    """
+    # The number of rows fetched from the database at a time
+    CHUNK_SIZE = 2000
+
+    # The columns of every exported row, in order
+    COLUMNS = [ 'date', 'type', 'invoice_number', 'student_id', 'student_name', 'student_email', 'amount', 'running_balance' ]
+
+    def rows(self, school_term=None, start_date=None, end_date=None, chunk_size=CHUNK_SIZE):
         """
-        Calculates balance from list of transactions to a given date
+        Yields every transaction in ledger order (oldest first) with its running balance
+        Transfers and lesson bookings are read with QuerySet.iterator() and merged as they arrive,
+        so memory use doesn't depend on the number of rows
         """
-        new_trans = transactions[:]
-        new_trans.sort(key = lambda trans: trans.date, reverse=False)
-        total = Decimal(0)
-        for transaction in new_trans:
-            if transaction.date <= date:
-                total += transaction.fee
+        from lessons.models import Transfer, LessonBooking
+
+        transaction_helper = TransactionModelHelper()
+        student = 'lesson_request__student_profile'
+
+        transfers = Transfer.objects.all()
+        lesson_bookings = LessonBooking.objects.all()
+        if school_term:
+            transfers = transfers.filter(lesson_booking__school_term=school_term)
+            lesson_bookings = lesson_bookings.filter(school_term=school_term)
+
+        balance = Decimal(0)
+        if start_date:
+            if school_term:
+                balance = self._balance_before(transfers, lesson_bookings, start_date)
             else:
-                break
-        return total
+                # The whole school's ledger can start from the closing balance of the latest closed term
+                balance = transaction_helper.opening_balance(None, start_date)
+            transfers = transfers.filter(date__gte=start_date)
+            lesson_bookings = lesson_bookings.filter(ledger_date__gte=start_date)
+        if end_date:
+            transfers = transfers.filter(date__lte=end_date)
+            lesson_bookings = lesson_bookings.filter(ledger_date__lte=end_date)
+
+        transfer_rows = transfers.order_by('date', 'id').values_list(
+            'date', 'id', 'balance', 'lesson_booking__invoice_reference', f'lesson_booking__{student}_id',
+            f'lesson_booking__{student}__user__first_name', f'lesson_booking__{student}__user__last_name',
+            f'lesson_booking__{student}__user__email').iterator(chunk_size=chunk_size)
+
+        lesson_booking_rows = lesson_bookings.order_by('ledger_date', 'id').values_list(
+            'ledger_date', 'id', 'quantity', 'invoice_reference', f'{student}_id',
+            f'{student}__user__first_name', f'{student}__user__last_name', f'{student}__user__email').iterator(chunk_size=chunk_size)
+
+        # Payments sort after invoices on the same day, as they do in the ledger views
+        merged = heapq.merge(
+            ((row[0], 1, row) for row in transfer_rows),
+            ((row[0], 0, row) for row in lesson_booking_rows),
+            key=lambda entry: (entry[0], entry[1], entry[2][1]))
+
+        for ledger_date, is_payment, row in merged:
+            if is_payment:
+                amount = transaction_helper.to_decimal(row[2])
+            else:
+                amount = Decimal(-LessonBooking.LESSON_PRICE * row[2])
+            balance += amount
+
+            yield {
+                'date': transaction_helper.to_date(ledger_date).isoformat(),
+                'type': "Payment" if is_payment else "Invoice",
+                'invoice_number': row[3],
+                'student_id': row[4],
+                'student_name': f"{ row[5] } { row[6] }",
+                'student_email': row[7],
+                'amount': f"{amount:.2f}",
+                'running_balance': f"{balance:.2f}",
+            }
+
+    def csv_lines(self, rows):
+        """
+        Yields the rows as CSV, one line at a time, starting with a header
+        Source: https://docs.djangoproject.com/en/4.1/howto/outputting-csv/#streaming-large-csv-files
+        """
+        buffer = _LineBuffer()
+        writer = csv.DictWriter(buffer, fieldnames=TransactionExportHelper.COLUMNS)
+
+        yield writer.writeheader()
+        for row in rows:
+            yield writer.writerow(row)
+
+    def jsonl_lines(self, rows):
+        """
+        Yields the rows as JSON lines
+        """
+        for row in rows:
+            yield json.dumps(row) + "\n"
+
+    def _balance_before(self, transfers, lesson_bookings, start_date):
+        """
+        Returns the balance of the given transactions before a date, so running balances don't restart at zero
+        """
+        from django.db.models import Sum
+        from lessons.models import LessonBooking
+
+        paid = transfers.filter(date__lt=start_date).aggregate(total=Sum('balance'))['total']
+        quantity = lesson_bookings.filter(ledger_date__lt=start_date).aggregate(total=Sum('quantity'))['total']
+        return TransactionModelHelper().to_decimal(paid) - LessonBooking.LESSON_PRICE * (quantity or 0)
+
+class _LineBuffer:
+    """
+    A file-like object that hands back what is written to it instead of storing it
+    """
+    def write(self, value):
+        return value
+
+class StudentAccountHelper:
+    """
+    Contains methods that keep the materialised student account balances correct
+    """
+    # How many accounts are refreshed per query when refreshing in bulk
+    REFRESH_CHUNK_SIZE = 500
+
+    def refresh(self, student_profile_id):
+        """
+        Recomputes the account of a single student from their transfers and lesson bookings
+        Accounts are only ever updated here, so a student that is part way through being deleted isn't recreated
+        """
+        from django.db import transaction
+        from lessons.models import StudentAccount
+
+        with transaction.atomic():
+            # Lock the account so that concurrent writes for the same student are applied one after another
+            list(StudentAccount.objects.select_for_update().filter(student_profile_id=student_profile_id))
+            totals = self.totals(student_profile_id).get(student_profile_id, (Decimal(0), Decimal(0)))
+            StudentAccount.objects.filter(student_profile_id=student_profile_id).update(
+                total_invoiced=totals[0],
+                total_paid=totals[1],
+                balance=totals[1] - totals[0])
+
+    def refresh_many(self, student_profile_ids):
+        """
+        Recomputes the accounts of several students at once, for writes that bypass the model signals such as bulk_create
+        """
+        from django.db import transaction
+        from lessons.models import StudentAccount
+
+        student_profile_ids = list(set(student_profile_ids))
+        with transaction.atomic():
+            for start in range(0, len(student_profile_ids), self.REFRESH_CHUNK_SIZE):
+                chunk = student_profile_ids[start:start + self.REFRESH_CHUNK_SIZE]
+                accounts = list(StudentAccount.objects.select_for_update().filter(student_profile_id__in=chunk))
+                totals = self.totals(student_profile_ids=chunk)
+
+                for account in accounts:
+                    account.total_invoiced, account.total_paid = totals.get(account.student_profile_id, (Decimal(0), Decimal(0)))
+                    account.balance = account.total_paid - account.total_invoiced
+
+                StudentAccount.objects.bulk_update(accounts, ['total_invoiced', 'total_paid', 'balance'], batch_size=1000)
+
+    def totals(self, student_profile_id=None, student_profile_ids=None):
+        """
+        Returns a dictionary of student profile id to (total invoiced, total paid)
+        Computed with one grouped query over lesson bookings and one over transfers
+        If no student profile id is provided, totals for every student are returned
+        """
+        from django.db.models import Sum
+        from lessons.models import Transfer, LessonBooking
+
+        lesson_bookings = LessonBooking.objects.all()
+        transfers = Transfer.objects.all()
+        if student_profile_id is not None:
+            lesson_bookings = lesson_bookings.filter(lesson_request__student_profile_id=student_profile_id)
+            transfers = transfers.filter(lesson_booking__lesson_request__student_profile_id=student_profile_id)
+        if student_profile_ids is not None:
+            lesson_bookings = lesson_bookings.filter(lesson_request__student_profile_id__in=student_profile_ids)
+            transfers = transfers.filter(lesson_booking__lesson_request__student_profile_id__in=student_profile_ids)
+
+        totals = {}
+        for row in lesson_bookings.values('lesson_request__student_profile_id').annotate(quantity=Sum('quantity')).order_by():
+            totals[row['lesson_request__student_profile_id']] = (Decimal(row['quantity'] * LessonBooking.LESSON_PRICE), Decimal(0))
+
+        for row in transfers.values('lesson_booking__lesson_request__student_profile_id').annotate(paid=Sum('balance')).order_by():
+            id = row['lesson_booking__lesson_request__student_profile_id']
+            totals[id] = (totals.get(id, (Decimal(0), Decimal(0)))[0], TransactionModelHelper().to_decimal(row['paid']))
+
+        return totals
+
+    def rebuild(self, dry_run=False):
+        """
+        Recomputes every student account in bulk
+        Returns a list of (student profile id, stored balance, correct balance) for every account that had drifted
+        """
+        from django.db import transaction
+        from lessons.models import StudentAccount, StudentProfile
+
+        drift = []
+        with transaction.atomic():
+            totals = self.totals()
+            accounts = { account.student_profile_id: account for account in StudentAccount.objects.select_for_update() }
+            changed = []
+            created = []
+
+            for student_profile_id in StudentProfile.objects.values_list('id', flat=True).iterator():
+                total_invoiced, total_paid = totals.get(student_profile_id, (Decimal(0), Decimal(0)))
+                account = accounts.get(student_profile_id)
+
+                if account is None:
+                    account = StudentAccount(student_profile_id=student_profile_id)
+                    created.append(account)
+                    drift.append((student_profile_id, None, total_paid - total_invoiced))
+                elif account.total_invoiced != total_invoiced or account.total_paid != total_paid or account.balance != total_paid - total_invoiced:
+                    changed.append(account)
+                    drift.append((student_profile_id, account.balance, total_paid - total_invoiced))
+
+                account.total_invoiced = total_invoiced
+                account.total_paid = total_paid
+                account.balance = total_paid - total_invoiced
+
+            if not dry_run:
+                StudentAccount.objects.bulk_create(created, batch_size=1000)
+                StudentAccount.objects.bulk_update(changed, ['total_invoiced', 'total_paid', 'balance'], batch_size=1000)
+
+        return drift
+
+class TermClosingBalanceHelper:
+    """
+    Contains methods that write and maintain the closing balance snapshots of school terms
+    Ledgers start from the latest snapshot before the dates they show, so older history is never rescanned
+    """
+
+    def closed_terms(self):
+        """
+        Returns the terms that have been closed, oldest first
+        """
+        from lessons.models import SchoolTerm, TermClosingBalance
+
+        closed = TermClosingBalance.objects.filter(student_profile__isnull=True).values('school_term_id')
+        return SchoolTerm.objects.filter(id__in=closed).order_by('end_date')
+
+    def snapshot_before(self, student_profile, before_date):
+        """
+        Returns the balance at the end of the latest closed term that ended before a date, along with its end date
+        If no student profile is provided, the balance of the entire school is returned
+        Returns (0, None) if no term that ended before the date has been closed
+        """
+        from lessons.models import TermClosingBalance
+
+        school_term = self.closed_terms().filter(end_date__lt=before_date).last()
+        if school_term is None:
+            return Decimal(0), None
+
+        # A closed term only holds rows for students that had transactions by its end
+        balance = TermClosingBalance.objects.filter(school_term=school_term, student_profile=student_profile).values_list('balance', flat=True).first()
+        return TransactionModelHelper().to_decimal(balance), school_term.end_date
+
+    def close_term(self, school_term):
+        """
+        Writes the closing balance of every student and of the school at the end of a term
+        Starts from the snapshot of the previous closed term, so only the transactions since then are read
+        """
+        from django.db import transaction
+        from lessons.models import TermClosingBalance
+
+        transaction_helper = TransactionModelHelper()
+
+        with transaction.atomic():
+            previous_term = self.closed_terms().filter(end_date__lt=school_term.end_date).last()
+            balances = {}
+            where = "WHERE ledger.date <= %s"
+            params = [school_term.end_date]
+            if previous_term is not None:
+                balances = dict(TermClosingBalance.objects.filter(school_term=previous_term, student_profile__isnull=False).values_list('student_profile_id', 'balance'))
+                where += " AND ledger.date > %s"
+                params.append(previous_term.end_date)
+
+            union_sql, union_params = transaction_helper._ledger_union_sql()
+            rows = transaction_helper._fetch_values(
+                f"SELECT ledger.student_profile_id, SUM(ledger.fee) FROM ({ union_sql }) ledger { where } GROUP BY ledger.student_profile_id",
+                union_params + params)
+            for student_profile_id, fee in rows:
+                balances[student_profile_id] = balances.get(student_profile_id, Decimal(0)) + transaction_helper.to_decimal(fee)
+
+            TermClosingBalance.objects.filter(school_term=school_term).delete()
+            snapshots = [TermClosingBalance(school_term=school_term, student_profile_id=id, balance=balance) for id, balance in balances.items()]
+            snapshots.append(TermClosingBalance(school_term=school_term, student_profile=None, balance=sum(balances.values(), Decimal(0))))
+            TermClosingBalance.objects.bulk_create(snapshots, batch_size=1000)
+
+    def close_ended_terms(self, today=None):
+        """
+        Closes every term that has ended but hasn't been closed yet, oldest first, and returns them
+        """
+        from lessons.models import SchoolTerm
+
+        if today is None:
+            today = date.today()
+
+        school_terms = list(SchoolTerm.objects.filter(end_date__lt=today).exclude(id__in=self.closed_terms()).order_by('end_date'))
+        for school_term in school_terms:
+            self.close_term(school_term)
+        return school_terms
+
+    def refresh(self, student_profile_id, from_date):
+        """
+        Recomputes a student's snapshots, and those of the school, for every closed term ending on or after a date
+        Used when a transaction is back-dated into a term that has already been closed
+        """
+        from django.db import transaction
+        from django.db.models import Sum
+        from lessons.models import TermClosingBalance, StudentProfile
+
+        school_terms = list(self.closed_terms().filter(end_date__gte=from_date))
+        if not school_terms:
+            return
+
+        transaction_helper = TransactionModelHelper()
+        student_profile = StudentProfile(id=student_profile_id)
+
+        with transaction.atomic():
+            TermClosingBalance.objects.filter(school_term__in=school_terms, student_profile_id=student_profile_id).delete()
+            # Once a student has been deleted only the school's snapshots need recomputing
+            if StudentProfile.objects.filter(id=student_profile_id).exists():
+                TermClosingBalance.objects.bulk_create(self._student_snapshots(student_profile, from_date, school_terms))
+
+            totals = dict(TermClosingBalance.objects.filter(school_term__in=school_terms, student_profile__isnull=False)
+                .values('school_term_id').annotate(total=Sum('balance')).values_list('school_term_id', 'total').order_by())
+            for school_term in school_terms:
+                TermClosingBalance.objects.filter(school_term=school_term, student_profile__isnull=True).update(
+                    balance=transaction_helper.to_decimal(totals.get(school_term.id)))
+
+    def refresh_many(self, from_dates):
+        """
+        Recomputes the snapshots of several students, given a dictionary of student profile id to the earliest date that changed
+        Nothing is read per student unless one of the dates falls within a closed term
+        """
+        if not from_dates or not self.closed_terms().filter(end_date__gte=min(from_dates.values())).exists():
+            return
+
+        for student_profile_id, from_date in from_dates.items():
+            self.refresh(student_profile_id, from_date)
+
+    def _student_snapshots(self, student_profile, from_date, school_terms):
+        """
+        Returns a student's snapshots for the given closed terms, all of which end on or after a date
+        Starts from the student's latest snapshot before that date, so only the transactions since then are read
+        """
+        from lessons.models import TermClosingBalance
+
+        transaction_helper = TransactionModelHelper()
+        balance, snapshot_date = self.snapshot_before(student_profile, from_date)
+
+        union_sql, params = transaction_helper._ledger_union_sql(student_profile)
+        where = "WHERE ledger.date <= %s"
+        params = params + [school_terms[-1].end_date]
+        if snapshot_date is not None:
+            where += " AND ledger.date > %s"
+            params.append(snapshot_date)
+        days = transaction_helper._fetch_values(
+            f"SELECT ledger.date, SUM(ledger.fee) FROM ({ union_sql }) ledger { where } GROUP BY ledger.date ORDER BY ledger.date", params)
+
+        snapshots = []
+        day = 0
+        for school_term in school_terms:
+            while day < len(days) and transaction_helper.to_date(days[day][0]) <= school_term.end_date:
+                balance += transaction_helper.to_decimal(days[day][1])
+                day += 1
+            snapshots.append(TermClosingBalance(school_term=school_term, student_profile_id=student_profile.id, balance=balance))
+
+        return snapshots
+
+class BankStatementReport:
+    """
+    The outcome of importing a bank statement, with the lines that need looking at
+    Every entry is a dictionary holding the line number, date, amount, reference and the reason it was reported
+    """
+    def __init__(self):
+        self.imported = []
+        self.unmatched = []
+        self.duplicates = []
+        self.overpaid = []
+        self.invalid = []
+
+    def has_problems(self):
+        """
+        Returns whether any line of the statement needs looking at
+        """
+        return bool(self.unmatched or self.duplicates or self.overpaid or self.invalid)
+
+class BankStatementImportHelper:
+    """
+    Registers the transfers listed on a bank statement and reconciles them against the invoices
+    """
+    COLUMNS = ['date', 'amount', 'reference']
+    DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y']
+    # How many invoice references are resolved per query, kept below the variable limit of older SQLite builds
+    LOOKUP_CHUNK_SIZE = 900
+
+    def import_statement(self, lines, dry_run=False):
+        """
+        Reads a bank statement CSV and registers a transfer for every line that pays a known invoice
+        Invoices and existing transfers are looked up in batches, and the transfers are created together
+        Lines that are invalid, don't match an invoice or were already registered are skipped and reported
+        Lines that take an invoice over its price are registered, since the money was received, but are also reported
+        Raises a ValueError if the statement is missing one of the required columns
+        """
+        from django.db import transaction
+        from lessons.models import Transfer, LessonBooking
+
+        report = BankStatementReport()
+        entries = self._read(lines, report)
+
+        lesson_bookings = self._lesson_bookings_for(set(entry['reference'] for entry in entries))
+        registered, paid = self._transfers_for([lesson_booking[0] for lesson_booking in lesson_bookings.values()])
+
+        seen = {}
+        transfers = []
+        earliest_dates = {}
+        for entry in entries:
+            lesson_booking = lesson_bookings.get(entry['reference'])
+            if lesson_booking is None:
+                report.unmatched.append(dict(entry, reason='No invoice associated with that reference number'))
+                continue
+
+            lesson_booking_id, quantity, student_profile_id = lesson_booking
+            key = (lesson_booking_id, entry['date'], entry['amount'])
+            if key in registered:
+                report.duplicates.append(dict(entry, reason='A transfer with this date and amount is already registered'))
+                continue
+            if key in seen:
+                report.duplicates.append(dict(entry, reason=f'Repeats line {seen[key]} of the statement'))
+                continue
+            seen[key] = entry['line']
+
+            paid[lesson_booking_id] = paid.get(lesson_booking_id, Decimal(0)) + entry['amount']
+            price = LessonBooking.LESSON_PRICE * quantity
+            if paid[lesson_booking_id] > price:
+                report.overpaid.append(dict(entry, reason=f'Invoice has been paid {paid[lesson_booking_id]:.2f} GBP of {price:.2f} GBP'))
+
+            report.imported.append(entry)
+            transfers.append(Transfer(date=entry['date'], balance=entry['amount'], lesson_booking_id=lesson_booking_id))
+            earliest_dates[student_profile_id] = min(entry['date'], earliest_dates.get(student_profile_id, entry['date']))
+
+        if not dry_run:
+            with transaction.atomic():
+                Transfer.objects.bulk_create(transfers, batch_size=1000)
+                # bulk_create doesn't send post_save, so the affected accounts and closed term snapshots are brought up to date here
+                StudentAccountHelper().refresh_many(earliest_dates.keys())
+                TermClosingBalanceHelper().refresh_many(earliest_dates)
+
+        return report
+
+    def _read(self, lines, report):
+        """
+        Parses and validates the lines of the statement, reporting those that can't be registered
+        A statement that isn't valid CSV raises a ValueError, as a missing column does
+        """
+        try:
+            return self._parse(lines, report)
+        except csv.Error as error:
+            raise ValueError(f"The statement could not be read as CSV: {error}") from error
+
+    def _parse(self, lines, report):
+        """
+        Parses the lines of the statement into entries
+        Uses the same rules as registering a single transfer: a positive amount and a date that isn't in the future
+        """
+        from lessons.forms.transfer_forms import RegisterTransferForm
+
+        reader = csv.DictReader(lines)
+        if reader.fieldnames is None:
+            return []
+
+        columns = { name.strip().lower(): name for name in reader.fieldnames if name }
+        missing = [column for column in self.COLUMNS if column not in columns]
+        if missing:
+            raise ValueError(f"The statement is missing the {', '.join(missing)} column{'s' if len(missing) > 1 else ''}")
+
+        entries = []
+        # Line 1 holds the column names
+        for line, row in enumerate(reader, start=2):
+            entry = {
+                'line': line,
+                'date': (row.get(columns['date']) or '').strip(),
+                'amount': (row.get(columns['amount']) or '').strip(),
+                'reference': (row.get(columns['reference']) or '').strip(),
+            }
+
+            date = self._parse_date(entry['date'])
+            reason = 'The date is not in a recognised format' if date is None else RegisterTransferForm.date_error(date)
+            reason = reason or RegisterTransferForm.balance_error(entry['amount'])
+            if reason is None and not entry['reference']:
+                reason = 'The reference is missing'
+
+            if reason:
+                report.invalid.append(dict(entry, reason=reason))
+            else:
+                entry['date'] = date
+                entry['amount'] = Decimal(entry['amount'])
+                entries.append(entry)
+
+        return entries
+
+    def _parse_date(self, value):
+        """
+        Returns the date written in one of the accepted formats, or None
+        """
+        for date_format in self.DATE_FORMATS:
+            try:
+                return datetime.strptime(value, date_format).date()
+            except ValueError:
+                pass
+        return None
+
+    def _lesson_bookings_for(self, references):
+        """
+        Returns a dictionary of invoice reference to (lesson booking id, quantity, student profile id)
+        """
+        from lessons.models import LessonBooking
+
+        references = list(references)
+        lesson_bookings = {}
+        for start in range(0, len(references), self.LOOKUP_CHUNK_SIZE):
+            rows = LessonBooking.objects.filter(invoice_reference__in=references[start:start + self.LOOKUP_CHUNK_SIZE]).values_list(
+                'invoice_reference', 'id', 'quantity', 'lesson_request__student_profile_id')
+            for invoice_reference, id, quantity, student_profile_id in rows:
+                lesson_bookings[invoice_reference] = (id, quantity, student_profile_id)
+        return lesson_bookings
+
+    def _transfers_for(self, lesson_booking_ids):
+        """
+        Returns the set of (lesson booking id, date, amount) already registered against the given lesson bookings,
+        along with a dictionary of how much has been paid towards each of them
+        """
+        from lessons.models import Transfer
+
+        registered = set()
+        paid = {}
+        for start in range(0, len(lesson_booking_ids), self.LOOKUP_CHUNK_SIZE):
+            rows = Transfer.objects.filter(lesson_booking_id__in=lesson_booking_ids[start:start + self.LOOKUP_CHUNK_SIZE]).values_list(
+                'lesson_booking_id', 'date', 'balance')
+            for lesson_booking_id, date, balance in rows:
+                registered.add((lesson_booking_id, date, balance))
+                paid[lesson_booking_id] = paid.get(lesson_booking_id, Decimal(0)) + balance
+        return registered, paid
+
+class ArrearsReportHelper:
+    """
+    Contains methods that find the students who owe the school money
+    """
+    # The orderings the report can be sorted by, the id keeps pages stable between equal values
+    SORT_ORDERS = {
+        'amount': ['balance', 'id'],
+        'name': ['student_profile__user__last_name', 'student_profile__user__first_name', 'id'],
+        'email': ['student_profile__user__email', 'id'],
+    }
+    DEFAULT_SORT = 'amount'
+
+    def students_in_arrears(self, sort=None):
+        """
+        Returns the accounts of every student with a negative balance, most owed first by default
+        The balances are the grouped invoice and transfer totals kept by StudentAccountHelper, so this is an indexed range scan
+        """
+        from lessons.models import StudentAccount
+
+        order = self.SORT_ORDERS.get(sort, self.SORT_ORDERS[self.DEFAULT_SORT])
+        return StudentAccount.objects.filter(balance__lt=0).select_related('student_profile__user').order_by(*order)
+
+    def oldest_unpaid_invoices(self, student_profile_ids):
+        """
+        Returns a dictionary of student profile id to the oldest lesson booking they haven't fully paid for
+        Each lesson booking is annotated with the amount paid towards it, and comes with its ledger date and its term label
+        Computed with a single query grouped by lesson booking, over the given students only
+        """
+        from django.db.models import Sum, F, Value, DecimalField
+        from django.db.models.functions import Coalesce
+        from lessons.models import LessonBooking
+
+        lesson_bookings = (LessonBooking.objects
+            .filter(lesson_request__student_profile_id__in=student_profile_ids)
+            .annotate(paid=Coalesce(Sum('transfers__balance'), Value(0), output_field=DecimalField()))
+            .filter(paid__lt=F('quantity') * LessonBooking.LESSON_PRICE)
+            .order_by('ledger_date', 'id')
+            .values('id', 'invoice_reference', 'quantity', 'paid', 'ledger_date', 'lesson_request__student_profile_id', 'school_term__label'))
+
+        oldest = {}
+        for lesson_booking in lesson_bookings:
+            oldest.setdefault(lesson_booking['lesson_request__student_profile_id'], lesson_booking)
+        return oldest
+
+    def page(self, request, sort=None):
+        """
+        Returns the page of the report asked for by the request, with each account given its oldest unpaid invoice
+        The accounts are paged by keyset on the sort order, so no page needs them counted
+        """
+        order = self.SORT_ORDERS.get(sort, self.SORT_ORDERS[self.DEFAULT_SORT])
+        page = ListPaginationHelper().paginate(request, self.students_in_arrears(sort), keyset=order)
+        oldest = self.oldest_unpaid_invoices([account.student_profile_id for account in page.items])
+        for account in page.items:
+            account.oldest_unpaid_invoice = oldest.get(account.student_profile_id)
+        return page
+
+class UtilizationReportHelper:
+    """
+    Contains methods that show how full each teacher's week is in a school term
+    Booked minutes are summed per teacher, weekday and hour of the day, and compared with a capacity of minutes per hour
+    """
+    # How many minutes of each hour a teacher is expected to be able to teach, unless another capacity is chosen
+    DEFAULT_CAPACITY = 60
+    CACHE_TIMEOUT = 60 * 60 * 24
+
+    def booked_minutes(self, school_term):
+        """
+        Returns a dictionary of teacher id to weekday to the minutes booked in each of the 24 hours of the day, over the whole term
+        Cached per term under the count and newest change of the term's bookings, so any booking being made,
+        changed or removed means it is worked out again, checked with one aggregate query
+        """
+        from django.core.cache import cache
+        from django.db.models import Count, Max
+        from lessons.models import LessonBooking
+
+        version = LessonBooking.objects.filter(school_term_id=school_term.id).aggregate(count=Count('id'), updated=Max('updated_at'))
+        key = f"teacher_utilization:{school_term.id}:{version['count']}:{version['updated'].timestamp() if version['updated'] else 0}"
+
+        booked = cache.get(key)
+        if booked is None:
+            booked = self._booked_minutes(school_term)
+            cache.set(key, booked, self.CACHE_TIMEOUT)
+        return booked
+
+    def _booked_minutes(self, school_term):
+        """
+        Works out the booked minutes from the stored lessons of the term, counted by the database
+        for each teacher, weekday and lesson time, so only the distinct lesson times are spread over the hours here
+        """
+        from django.db.models import Count
+        from lessons.models import LessonOccurrence
+
+        rows = (LessonOccurrence.objects.filter(lesson_booking__school_term_id=school_term.id)
+            .values('teacher_id', 'lesson_booking__regular_day', 'start_time', 'end_time')
+            .annotate(lessons=Count('id'))
+            .order_by()
+            .values_list('teacher_id', 'lesson_booking__regular_day', 'start_time', 'end_time', 'lessons'))
+
+        booked = {}
+        for teacher_id, day, start_time, end_time, lessons in rows:
+            hours = booked.setdefault(teacher_id, {}).setdefault(day, [0] * 24)
+            start = start_time.hour * 60 + start_time.minute
+            end = end_time.hour * 60 + end_time.minute
+            if end <= start:
+                # Runs past midnight
+                end += 1440
+            for hour in range(start // 60, (end - 1) // 60 + 1):
+                hours[hour % 24] += (min(end, (hour + 1) * 60) - max(start, hour * 60)) * lessons
+        return booked
+
+    def weeks_per_day(self, school_term):
+        """
+        Returns how many of each weekday there are in the term
+        """
+        days = (school_term.end_date - school_term.start_date).days + 1
+        first = school_term.start_date.weekday()
+        return {day: days // 7 + (1 if (index - first) % 7 < days % 7 else 0) for index, day in enumerate(LessonOccurrenceHelper.WEEKDAYS)}
+
+    def hours_shown(self, booked):
+        """
+        Returns the hours of the day the report shows: the teaching day, and any other hour with a lesson
+        """
+        hours = set(range(FreeSlotHelper.DAY_START // 60, FreeSlotHelper.DAY_END // 60))
+        for days in booked.values():
+            for minutes in days.values():
+                hours.update(hour for hour, booked_minutes in enumerate(minutes) if booked_minutes)
+        return sorted(hours)
+
+    def page(self, request, school_term, capacity=None):
+        """
+        Returns the page of teachers asked for by the request, each given a row per weekday of cells with the booked minutes
+        and the percentage of the capacity they fill, and their totals
+        Also returns the hours shown, for the heading of the table
+        """
+        from lessons.models import TeacherProfile
+
+        if capacity is None:
+            capacity = self.DEFAULT_CAPACITY
+        booked = self.booked_minutes(school_term)
+        weeks = self.weeks_per_day(school_term)
+        hours = self.hours_shown(booked)
+
+        page = ListPaginationHelper().paginate(request, TeacherProfile.objects.select_related('user'), keyset=['user__last_name', 'user__first_name', 'id'])
+        for teacher in page.items:
+            teacher.utilization_days = []
+            total_minutes = 0
+            total_capacity = 0
+            for day in LessonOccurrenceHelper.WEEKDAYS:
+                minutes = booked.get(teacher.id, {}).get(day, [0] * 24)
+                hour_capacity = capacity * weeks[day]
+                cells = []
+                for hour in hours:
+                    percent = self._percent(minutes[hour], hour_capacity)
+                    # How strongly the cell is coloured in, full at the capacity
+                    cells.append({'minutes': minutes[hour], 'percent': percent, 'shade': f"{min(percent, 100) / 100:.2f}"})
+                day_minutes = sum(minutes)
+                total_minutes += day_minutes
+                total_capacity += hour_capacity * len(hours)
+                teacher.utilization_days.append({'day': day[:1] + day[1:].lower(), 'cells': cells, 'minutes': day_minutes,
+                    'percent': self._percent(day_minutes, hour_capacity * len(hours))})
+            teacher.utilization_minutes = total_minutes
+            teacher.utilization_percent = self._percent(total_minutes, total_capacity)
+        return page, hours
+
+    def _percent(self, minutes, capacity):
+        """
+        Returns the booked minutes as a whole percentage of the capacity
+        """
+        return round(minutes * 100 / capacity) if capacity else 0
 
 class StudentProfileModelHelper:
     """
@@ -65,7 +1012,361 @@ class StudentProfileModelHelper:
         from lessons.models.transfer_models import Transfer
         return list(filter(lambda transfer: transfer.lesson_booking.lesson_request.student_profile == student_profile, Transfer.objects.all()))
 
-class TeacherProfileModelHelper:
+class StudentSearchHelper:
+    """
+    Finds students by name or email through the SQLite FTS5 index of users created in migration 0033,
+    which the signals in lessons.signals keep in step with the users
+    Each word of a search matches the start of a word, and results are ranked by how well they match
+    Databases without the index fall back to a case insensitive match on the user table
+    """
+    TABLE = 'lessons_usersearch'
+    # Databases the index has been found in, so it is only looked for once per process
+    _indexed_databases = set()
+
+    def available(self):
+        """
+        Returns whether the database has the full-text index of users
+        """
+        from django.db import connection
+
+        if connection.vendor != 'sqlite':
+            return False
+        name = str(connection.settings_dict['NAME'])
+        if name not in self._indexed_databases:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [self.TABLE])
+                if cursor.fetchone() is None:
+                    return False
+            self._indexed_databases.add(name)
+        return True
+
+    def match_expression(self, search_term):
+        """
+        Turns a search into an FTS5 query, where each space separated part of the search is a phrase that has to appear in one column
+        and the last word of each phrase may be the start of a longer word, so "student_2@exa" finds student_2@example.org
+        """
+        phrases = []
+        for part in search_term.lower().split():
+            # The index splits text into words at anything other than a letter or digit, so searches are split the same way
+            words = re.findall(r'[^\W_]+', part)
+            if words:
+                phrases.append('"' + ' '.join(words) + '"*')
+        return ' '.join(phrases)
+
+    def search(self, search_term):
+        """
+        Returns the student profiles matching a search, best matches first
+        """
+        from django.db.models import Q, FloatField
+        from django.db.models.expressions import RawSQL
+        from lessons.models import StudentProfile
+
+        student_profiles = StudentProfile.objects.select_related('user')
+        if not self.available():
+            query = Q()
+            for word in search_term.split():
+                query &= Q(user__first_name__icontains=word) | Q(user__last_name__icontains=word) | Q(user__email__icontains=word)
+            return student_profiles.filter(query).order_by('user__last_name', 'user__first_name', 'id')
+
+        expression = self.match_expression(search_term)
+        if not expression:
+            return student_profiles.none()
+        # The index isn't a model, so it is queried with raw SQL rather than through a relation; its rowid is the user's id
+        matches = RawSQL(f"SELECT rowid FROM { self.TABLE } WHERE { self.TABLE } MATCH %s", [expression])
+        # LIMIT -1 stops SQLite merging the ranked matches into the outer query, so they are found once rather than once per student
+        rank = RawSQL(f"SELECT search.rank FROM (SELECT rowid, rank FROM { self.TABLE } WHERE { self.TABLE } MATCH %s LIMIT -1) search"
+            f" WHERE search.rowid = { StudentProfile._meta.db_table }.user_id", [expression], output_field=FloatField())
+        return student_profiles.filter(user_id__in=matches).alias(search_rank=rank).order_by('search_rank', 'id')
+
+    def index(self, user):
+        """
+        Adds a user to the index, replacing what was held for them before
+        """
+        from django.db import connection
+
+        if not self.available():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM { self.TABLE } WHERE rowid = %s", [user.id])
+            cursor.execute(f"INSERT INTO { self.TABLE } (rowid, first_name, last_name, email) VALUES (%s, %s, %s, %s)",
+                [user.id, user.first_name, user.last_name, user.email])
+
+    def remove(self, user_id):
+        """
+        Removes a user from the index
+        """
+        from django.db import connection
+
+        if not self.available():
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM { self.TABLE } WHERE rowid = %s", [user_id])
+
+    def rebuild(self):
+        """
+        Indexes every user again, returning how many were indexed
+        """
+        from django.db import connection, transaction
+        from lessons.models import User
+
+        if not self.available():
+            return 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM { self.TABLE }")
+            cursor.execute(f"INSERT INTO { self.TABLE } (rowid, first_name, last_name, email) SELECT id, first_name, last_name, email FROM { User._meta.db_table }")
+            return cursor.rowcount
+
+class StudentTypeaheadIndex:
+    """
+    Holds the names and email of every student in one sorted list of keys, so the students with a name or email
+    starting with what has been typed so far are found by bisection
+    The index is built once per process and kept up to date by the signals in lessons.signals, which count each change
+    in StudentTypeaheadVersion and apply it once it is committed, so other processes rebuild their index when they see the count move on
+    """
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 50
+
+    # The index of this process, and the lock held while it is read, changed or replaced
+    _index = None
+    _lock = threading.Lock()
+
+    def __init__(self, rows, version):
+        """
+        Builds the index from (student profile id, user id, first name, last name, email) rows
+        """
+        # Sorted (key, student profile id) pairs
+        self._keys = []
+        # student profile id -> (user id, full name, email, keys)
+        self._students = {}
+        # user id -> student profile id
+        self._user_students = {}
+        self.version = version
+
+        for student_profile_id, user_id, first_name, last_name, email in rows:
+            keys = self.keys_for(first_name, last_name, email)
+            self._students[student_profile_id] = (user_id, f'{ first_name } { last_name }', email, keys)
+            self._user_students[user_id] = student_profile_id
+            self._keys.extend((key, student_profile_id) for key in keys)
+        self._keys.sort()
+
+    @staticmethod
+    def keys_for(first_name, last_name, email):
+        """
+        Returns what a student can be found by: their first name, last name, full name and email
+        """
+        return sorted(set(' '.join(key.lower().split()) for key in (first_name, last_name, f'{ first_name } { last_name }', email)))
+
+    @classmethod
+    def current(cls):
+        """
+        Returns the index of this process, building it if it hasn't been yet or another process has changed a student since
+        Checking is one query of the version row
+        """
+        from lessons.models import StudentProfile, StudentTypeaheadVersion
+
+        version = StudentTypeaheadVersion.objects.filter(id=1).values_list('version', flat=True).first() or 0
+        with cls._lock:
+            if cls._index is None or cls._index.version != version:
+                cls._index = cls(StudentProfile.objects.values_list('id', 'user_id', 'user__first_name', 'user__last_name', 'user__email'), version)
+            return cls._index
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        """
+        Returns up to limit (student profile id, user id, full name, email) tuples of the students with a name or email
+        starting with the prefix, in the order of the key that matched
+        """
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+
+        students = []
+        with self._lock:
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(students) < limit:
+                key, student_profile_id = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                if all(student[0] != student_profile_id for student in students):
+                    students.append((student_profile_id,) + self._students[student_profile_id][:3])
+                position += 1
+        return students
+
+    @classmethod
+    def student_changed(cls, student_profile_id, user):
+        """
+        Counts a change to a student and, once it is committed, adds them to the index or replaces what it held for them
+        """
+        from django.db import transaction
+
+        version = cls._count_change()
+        student = (user.id, user.full_name(), user.email, cls.keys_for(user.first_name, user.last_name, user.email))
+        transaction.on_commit(lambda: cls._apply(version, student_profile_id, student))
+
+    @classmethod
+    def user_changed(cls, user):
+        """
+        Counts a change to a user's name or email if they are a student, updating the index once it is committed
+        """
+        from lessons.models import StudentProfile
+
+        student_profile_id = StudentProfile.objects.filter(user_id=user.id).values_list('id', flat=True).first()
+        if student_profile_id is not None:
+            cls.student_changed(student_profile_id, user)
+
+    @classmethod
+    def student_removed(cls, student_profile_id):
+        """
+        Counts the removal of a student, taking them out of the index once it is committed
+        """
+        from django.db import transaction
+
+        version = cls._count_change()
+        transaction.on_commit(lambda: cls._apply(version, student_profile_id))
+
+    @classmethod
+    def _apply(cls, version, student_profile_id, student=None):
+        """
+        Takes a student out of the index, and puts them back with the given (user id, full name, email, keys) if there are any
+        The index is only changed if the change is the next one after the version it holds, otherwise it is left to be rebuilt
+        """
+        with cls._lock:
+            index = cls._index
+            if index is None:
+                return
+            if index.version != version - 1:
+                index.version = None
+                return
+
+            index._remove(student_profile_id)
+            if student is not None:
+                index._students[student_profile_id] = student
+                index._user_students[student[0]] = student_profile_id
+                for key in student[3]:
+                    bisect.insort(index._keys, (key, student_profile_id))
+            index.version = version
+
+    def _remove(self, student_profile_id):
+        """
+        Takes out everything the index holds for a student
+        """
+        student = self._students.pop(student_profile_id, None)
+        if student is None:
+            return
+        self._user_students.pop(student[0], None)
+        for key in student[3]:
+            position = bisect.bisect_left(self._keys, (key, student_profile_id))
+            if position < len(self._keys) and self._keys[position] == (key, student_profile_id):
+                del self._keys[position]
+
+    @staticmethod
+    def _count_change():
+        """
+        Adds one to the version row in the current transaction, returning the new version
+        """
+        from django.db.models import F
+        from lessons.models import StudentTypeaheadVersion
+
+        versions = StudentTypeaheadVersion.objects.filter(id=1)
+        if not versions.update(version=F('version') + 1):
+            # Made by the migration, but tables can be emptied since, such as between tests
+            StudentTypeaheadVersion.objects.get_or_create(id=1)
+            versions.update(version=F('version') + 1)
+        return versions.values_list('version', flat=True).get()
+
+class LessonSearchHelper:
+    """
+    Finds lesson bookings and lesson requests by the name or email of their student, with the matching done by the database
+    The student and the other rows shown alongside each result are fetched in the same query
+    """
+    # Filters lesson bookings can be narrowed down by: parameter -> field it must equal
+    LESSON_BOOKING_FILTERS = {
+        'school_term': 'school_term',
+        'teacher': 'teacher',
+        'regular_day': 'regular_day',
+    }
+    # Orders lesson bookings can be listed in: parameter -> (label, keyset), each ending in the id so they can be paged by keyset
+    LESSON_BOOKING_SORTS = {
+        'oldest': ('Oldest booking first', ['id']),
+        'newest': ('Newest booking first', ['-id']),
+        'earliest_time': ('Earliest start time first', ['regular_start_time', 'id']),
+        'latest_time': ('Latest start time first', ['-regular_start_time', '-id']),
+    }
+    DEFAULT_LESSON_BOOKING_SORT = 'oldest'
+
+    def matching_student(self, search_term, student_profile_path):
+        """
+        Returns the annotation of the student's full name and the condition matching it or their email against a search,
+        for the model at the end of the given path to a student profile
+        """
+        from django.db.models import Q, Value
+        from django.db.models.functions import Concat
+
+        full_name = Concat(f'{ student_profile_path }__user__first_name', Value(' '), f'{ student_profile_path }__user__last_name')
+        search_term = search_term.strip()
+        return ({'student_full_name': full_name},
+            Q(student_full_name__icontains=search_term) | Q(**{f'{ student_profile_path }__user__email__icontains': search_term}))
+
+    def lesson_bookings(self, search_term=None, teacher=None, filters=None):
+        """
+        Returns the lesson bookings matching a search, of a single teacher if one is given
+        Filters are a dictionary of the LESSON_BOOKING_FILTERS parameters, along with from_date and until_date
+        """
+        from lessons.models import LessonBooking
+
+        lesson_bookings = LessonBooking.objects.select_related('lesson_request__student_profile__user', 'teacher__user', 'school_term')
+        if teacher is not None:
+            lesson_bookings = lesson_bookings.filter(teacher=teacher)
+        if filters:
+            lesson_bookings = self.filter_lesson_bookings(lesson_bookings, filters)
+        if search_term:
+            annotation, query = self.matching_student(search_term, 'lesson_request__student_profile')
+            lesson_bookings = lesson_bookings.annotate(**annotation).filter(query)
+        return lesson_bookings
+
+    def filter_lesson_bookings(self, lesson_bookings, filters):
+        """
+        Narrows lesson bookings down to those matching every filter given
+        A date range keeps the bookings with a lesson within it, found through the stored lessons' date index
+        """
+        from lessons.models import LessonOccurrence
+
+        for name, field in self.LESSON_BOOKING_FILTERS.items():
+            if filters.get(name):
+                lesson_bookings = lesson_bookings.filter(**{field: filters[name]})
+
+        from_date = filters.get('from_date')
+        until_date = filters.get('until_date')
+        if from_date or until_date:
+            occurrences = LessonOccurrence.objects.all()
+            if from_date:
+                occurrences = occurrences.filter(date__gte=from_date)
+            if until_date:
+                occurrences = occurrences.filter(date__lte=until_date)
+            lesson_bookings = lesson_bookings.filter(id__in=occurrences.values('lesson_booking_id'))
+        return lesson_bookings
+
+    def lesson_booking_keyset(self, sort):
+        """
+        Returns the keyset of a lesson booking sort, or of the default sort if it isn't one
+        """
+        return self.LESSON_BOOKING_SORTS.get(sort or self.DEFAULT_LESSON_BOOKING_SORT, self.LESSON_BOOKING_SORTS[self.DEFAULT_LESSON_BOOKING_SORT])[1]
+
+    def lesson_requests(self, search_term=None):
+        """
+        Returns the lesson requests matching a search, the unfulfilled ones first
+        """
+        from django.db.models import Exists, OuterRef
+        from lessons.models import LessonBooking, LessonRequest
+
+        lesson_requests = (LessonRequest.objects.select_related('student_profile__user', 'lesson_booking')
+            .annotate(is_fulfilled=Exists(LessonBooking.objects.filter(lesson_request=OuterRef('pk'))))
+            .order_by('is_fulfilled', 'id'))
+        if search_term:
+            annotation, query = self.matching_student(search_term, 'student_profile')
+            lesson_requests = lesson_requests.annotate(**annotation).filter(query)
+        return lesson_requests
+
+class TeacherProfileModelHelper:
     """
     Contains methods that assist in model retrieval on teacher profiles
     """
@@ -76,6 +1377,773 @@ class TeacherProfileModelHelper:
         from lessons.models.lesson_models import LessonBooking
         return list(filter(lambda lesson_booking: lesson_booking.teacher.id==teacher_profile.id, LessonBooking.objects.all()))
 
+class LessonOccurrenceHelper:
+    """
+    Contains methods that work out when the lessons of a booking actually take place
+    Occurrences are kept as bitsets of week numbers, so two bookings clash only if they share a week,
+    and stored as LessonOccurrence rows so the lessons on a date can be queried
+    """
+    WEEKDAYS = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
+    # How many bookings have their lessons regenerated per query, kept below the variable limit of older SQLite builds
+    CHUNK_SIZE = 900
+
+    def occurrence_dates(self, start_date, end_date, regular_day, interval, quantity):
+        """
+        Returns the dates of the lessons of a booking: the first regular day on or after the start date,
+        then every interval weeks, until the quantity is reached or the end date is passed
+        """
+        first = start_date + timedelta(days=(self.WEEKDAYS.index(regular_day) - start_date.weekday()) % 7)
+        dates = []
+        for number in range(quantity):
+            occurrence = first + timedelta(weeks=number * interval)
+            if occurrence > end_date:
+                break
+            dates.append(occurrence)
+        return dates
+
+    def week_of(self, day):
+        """
+        Returns the number of the week a date falls in, counting whole Monday to Sunday weeks
+        """
+        # Ordinal 1 is Monday 1st January of year 1
+        return (day.toordinal() - 1) // 7
+
+    def week_bits(self, start_date, end_date, regular_day, interval, quantity, origin_week):
+        """
+        Returns the weeks a booking has lessons in as an integer bitset, where bit n is the nth week after the origin week
+        Weeks before the origin are left out
+        """
+        bits = 0
+        for occurrence in self.occurrence_dates(start_date, end_date, regular_day, interval, quantity):
+            week = self.week_of(occurrence) - origin_week
+            if week >= 0:
+                bits |= 1 << week
+        return bits
+
+    @staticmethod
+    def to_seconds(start_time, duration):
+        """
+        Returns the start and end of a lesson as seconds since midnight
+        The end is worked out the same way as LessonBooking.end_time(), to the minute and wrapping past midnight
+        """
+        start = start_time.hour * 3600 + start_time.minute * 60 + start_time.second + start_time.microsecond / 1000000
+        end = ((start_time.hour * 60 + start_time.minute + duration) % 1440) * 60
+        return start, end
+
+    def weekly_lessons(self, start_date, end_date, origin_week, teacher_ids=None):
+        """
+        Returns the lessons of the bookings between two dates from one query, as a dictionary of (teacher id, weekday)
+        to (start, end, weeks, duration) sorted by start, where start and end are seconds since midnight and
+        weeks is a bitset counted from the origin week. Bookings with no lesson from the origin week on are left out
+        Two lessons clash if their weeks share a bit and their times overlap, including times that only touch
+        """
+        from django.db.models.functions import Coalesce
+        from lessons.models import LessonBooking
+
+        lesson_bookings = (LessonBooking.objects
+            .annotate(start_date_or_term=Coalesce('start_date', 'school_term__start_date'), end_date_or_term=Coalesce('end_date', 'school_term__end_date'))
+            .filter(start_date_or_term__lte=end_date, end_date_or_term__gte=start_date))
+        if teacher_ids is not None:
+            lesson_bookings = lesson_bookings.filter(teacher_id__in=teacher_ids)
+
+        lessons = {}
+        for teacher_id, day, start_time, duration, booking_start_date, booking_end_date, interval, quantity in lesson_bookings.values_list(
+                'teacher_id', 'regular_day', 'regular_start_time', 'duration', 'start_date_or_term', 'end_date_or_term', 'interval', 'quantity'):
+            bits = self.week_bits(booking_start_date, booking_end_date, day, interval, quantity, origin_week)
+            if bits:
+                start, end = self.to_seconds(start_time, duration)
+                lessons.setdefault((teacher_id, day), []).append((start, end, bits, duration))
+        for day_lessons in lessons.values():
+            day_lessons.sort()
+        return lessons
+
+    def regenerate(self, lesson_booking_ids):
+        """
+        Replaces the stored lessons of the given bookings with those worked out from the bookings as they are now
+        Bookings are read and their lessons written in bulk, a chunk at a time
+        """
+        from django.db import transaction
+        from django.db.models.functions import Coalesce
+        from lessons.models import LessonBooking, LessonOccurrence
+
+        lesson_booking_ids = list(lesson_booking_ids)
+        created = 0
+        with transaction.atomic():
+            for chunk_start in range(0, len(lesson_booking_ids), self.CHUNK_SIZE):
+                chunk = lesson_booking_ids[chunk_start:chunk_start + self.CHUNK_SIZE]
+                LessonOccurrence.objects.filter(lesson_booking_id__in=chunk).delete()
+
+                rows = (LessonBooking.objects.filter(id__in=chunk)
+                    .values_list('id', Coalesce('start_date', 'school_term__start_date'), Coalesce('end_date', 'school_term__end_date'),
+                        'regular_day', 'interval', 'quantity', 'regular_start_time', 'duration', 'teacher_id', 'lesson_request__student_profile_id'))
+                occurrences = []
+                for id, start_date, end_date, regular_day, interval, quantity, start_time, duration, teacher_id, student_profile_id in rows:
+                    end_time = TimeHelper().add_minutes_to_time(start_time, duration)
+                    occurrences.extend(LessonOccurrence(lesson_booking_id=id, date=occurrence, start_time=start_time, end_time=end_time,
+                            teacher_id=teacher_id, student_profile_id=student_profile_id)
+                        for occurrence in self.occurrence_dates(start_date, end_date, regular_day, interval, quantity))
+                LessonOccurrence.objects.bulk_create(occurrences, batch_size=1000)
+                created += len(occurrences)
+        return created
+
+    def rebuild(self):
+        """
+        Regenerates the stored lessons of every booking, returning how many there are
+        """
+        from lessons.models import LessonBooking, LessonOccurrence
+
+        LessonOccurrence.objects.all().delete()
+        return self.regenerate(LessonBooking.objects.order_by('id').values_list('id', flat=True))
+
+    def roster(self, on_date, teacher_id=None, student_profile_id=None):
+        """
+        Returns the lessons taking place on a date, for a teacher or student if one is given, in start time order
+        """
+        from lessons.models import LessonOccurrence
+
+        occurrences = LessonOccurrence.objects.filter(date=on_date)
+        if teacher_id is not None:
+            occurrences = occurrences.filter(teacher_id=teacher_id)
+        if student_profile_id is not None:
+            occurrences = occurrences.filter(student_profile_id=student_profile_id)
+        return occurrences.select_related('teacher__user', 'student_profile__user', 'lesson_booking').order_by('start_time', 'id')
+
+class TeacherTimetableHelper:
+    """
+    Keeps the weekly slot timetables of teachers in step with their bookings
+    Every teacher has a timetable for every term: made by the migration, or when the teacher or term is created,
+    and refreshed whenever one of their bookings is saved or deleted, so checking availability only ever reads them
+    Bookings lie within their term and terms don't overlap, so a term's timetable holds every lesson between its dates
+    """
+    def create_timetables(self, teacher_id=None, school_term_id=None):
+        """
+        Makes the empty timetables of a new teacher for every term, or of every teacher for a new term
+        Neither has any bookings yet, so there is nothing to fill them from
+        """
+        from lessons.models import SchoolTerm, TeacherProfile, TeacherTimetable
+
+        teacher_ids = [teacher_id] if teacher_id is not None else TeacherProfile.objects.values_list('id', flat=True)
+        school_term_ids = [school_term_id] if school_term_id is not None else SchoolTerm.objects.values_list('id', flat=True)
+        TeacherTimetable.objects.bulk_create([TeacherTimetable(teacher_id=teacher, school_term_id=school_term)
+            for teacher in teacher_ids for school_term in school_term_ids], batch_size=1000, ignore_conflicts=True)
+
+    def rebuild(self, teacher_id, school_term_id, days=None):
+        """
+        Recomputes the given weekdays of a teacher's timetable for a term from their bookings, or every day if none are given
+        A missing timetable, such as one whose teacher or term was loaded from a fixture, is made if the teacher has lessons in the term
+        """
+        from lessons.models import TeacherTimetable
+
+        timetable = TeacherTimetable.objects.filter(teacher_id=teacher_id, school_term_id=school_term_id).first()
+        if timetable is None:
+            # Not made when the teacher or term is being deleted, as their bookings have gone by then
+            timetable = self._fill(TeacherTimetable(teacher_id=teacher_id, school_term_id=school_term_id))
+            if timetable.slots_taken():
+                timetable.save()
+            return timetable
+
+        self._fill(timetable, days)
+        # The timetable may be being deleted along with its teacher or term, so it is updated rather than saved
+        TeacherTimetable.objects.filter(id=timetable.id).update(slots=timetable.slots)
+        return timetable
+
+    def timetables_for(self, school_term_id, teacher_ids):
+        """
+        Returns a dictionary of teacher ids to their timetables for a term
+        Teachers without one are left out, and their bookings have to be looked at instead
+        """
+        from lessons.models import TeacherTimetable
+
+        return {timetable.teacher_id: timetable for timetable in TeacherTimetable.objects.filter(school_term_id=school_term_id, teacher_id__in=list(teacher_ids))}
+
+    def _fill(self, timetable, days=None):
+        """
+        Sets the slots of the given weekdays of a timetable from the teacher's bookings in the term
+        """
+        from lessons.models import LessonBooking, TeacherTimetable
+
+        if days is None:
+            days = TeacherTimetable.DAYS
+        lesson_bookings = LessonBooking.objects.filter(teacher_id=timetable.teacher_id, school_term_id=timetable.school_term_id, regular_day__in=days)
+
+        day_slots = {day: 0 for day in days}
+        for day, start_time, duration in lesson_bookings.values_list('regular_day', 'regular_start_time', 'duration'):
+            day_slots[day] |= TeacherTimetable.slot_mask(start_time, duration)
+        for day, slots in day_slots.items():
+            timetable.set_day_slots(day, slots)
+        return timetable
+
+class CalendarFeedHelper:
+    """
+    Builds the iCalendar feeds of teachers' and students' lessons
+    Each booking is a single recurring event, so a feed grows with the number of bookings rather than lessons
+    Feeds are found by a signed token, as calendar apps fetch them without logging in
+    """
+    SALT = 'lessons.calendar_feed'
+    KINDS = ['teacher', 'student']
+    RRULE_DAYS = {'MONDAY': 'MO', 'TUESDAY': 'TU', 'WEDNESDAY': 'WE', 'THURSDAY': 'TH', 'FRIDAY': 'FR', 'SATURDAY': 'SA', 'SUNDAY': 'SU'}
+
+    def token_for(self, kind, id):
+        """
+        Returns the token of the feed of a teacher or student profile
+        """
+        return signing.Signer(salt=self.SALT).sign_object([kind, id], compress=True)
+
+    def read_token(self, token):
+        """
+        Returns the (kind, id) a token was made for, or None if it wasn't made by token_for
+        """
+        try:
+            kind, id = signing.Signer(salt=self.SALT).unsign_object(token)
+        except (signing.BadSignature, ValueError, TypeError):
+            return None
+        if kind not in self.KINDS or not isinstance(id, int):
+            return None
+        return kind, id
+
+    def lesson_bookings_for(self, kind, id):
+        """
+        Returns the bookings in a feed: those a teacher teaches, or those of a student and their children
+        """
+        from django.db.models import Q
+        from lessons.models import LessonBooking
+
+        if kind == 'teacher':
+            return LessonBooking.objects.filter(teacher_id=id)
+        return LessonBooking.objects.filter(Q(lesson_request__student_profile_id=id) | Q(lesson_request__student_profile__parent_id=id))
+
+    def version(self, kind, id):
+        """
+        Returns how many bookings are in a feed and when the newest change to them was, read with one aggregate query
+        The count changes when a booking is removed, which the newest change alone wouldn't show
+        """
+        from django.db.models import Count, Max
+        version = self.lesson_bookings_for(kind, id).aggregate(count=Count('id'), updated=Max('updated_at'))
+        return version['count'], version['updated']
+
+    def lines(self, kind, id):
+        """
+        Yields the lines of the feed, reading the bookings a chunk at a time
+        """
+        from datetime import timezone
+        from django.db.models.functions import Coalesce
+
+        yield 'BEGIN:VCALENDAR'
+        yield 'VERSION:2.0'
+        yield 'PRODID:-//MSMS//Lesson timetable//EN'
+        yield 'CALSCALE:GREGORIAN'
+        yield 'METHOD:PUBLISH'
+
+        rows = (self.lesson_bookings_for(kind, id).order_by('id')
+            .values_list('id', 'invoice_reference', 'regular_day', 'regular_start_time', 'duration', 'interval', 'quantity',
+                Coalesce('start_date', 'school_term__start_date'), Coalesce('end_date', 'school_term__end_date'), 'updated_at',
+                'teacher__user__first_name', 'teacher__user__last_name',
+                'lesson_request__student_profile__user__first_name', 'lesson_request__student_profile__user__last_name'))
+        occurrence_helper = LessonOccurrenceHelper()
+        for (id, invoice_reference, regular_day, start_time, duration, interval, quantity, start_date, end_date, updated_at,
+                teacher_first_name, teacher_last_name, student_first_name, student_last_name) in rows.iterator(chunk_size=500):
+            dates = occurrence_helper.occurrence_dates(start_date, end_date, regular_day, interval, quantity)
+            if not dates:
+                continue
+
+            if kind == 'teacher':
+                summary = f"Lesson with {student_first_name} {student_last_name}"
+            else:
+                summary = f"{student_first_name}'s lesson with {teacher_first_name} {teacher_last_name}"
+
+            yield 'BEGIN:VEVENT'
+            yield f'UID:lesson-booking-{id}@msms'
+            yield f'DTSTAMP:{updated_at.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")}'
+            yield f'DTSTART:{datetime.combine(dates[0], start_time).strftime("%Y%m%dT%H%M%S")}'
+            yield f'DURATION:PT{duration}M'
+            yield f'RRULE:FREQ=WEEKLY;INTERVAL={interval};COUNT={len(dates)};BYDAY={self.RRULE_DAYS[regular_day]}'
+            yield self._fold(f'SUMMARY:{self._escape(summary)}')
+            if invoice_reference:
+                yield self._fold(f'DESCRIPTION:{self._escape(f"Invoice {invoice_reference}")}')
+            yield 'END:VEVENT'
+
+        yield 'END:VCALENDAR'
+
+    def _escape(self, text):
+        """
+        Escapes the characters that have a meaning in iCalendar text values
+        """
+        return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+    def _fold(self, line):
+        """
+        Splits a line longer than 75 octets over several, each continuation starting with a space
+        """
+        encoded = line.encode('utf-8')
+        if len(encoded) <= 75:
+            return line
+
+        parts = []
+        while encoded:
+            limit = 75 if not parts else 74
+            # Don't split a multi-byte character
+            while limit < len(encoded) and (encoded[limit] & 0xC0) == 0x80:
+                limit -= 1
+            parts.append(encoded[:limit].decode('utf-8'))
+            encoded = encoded[limit:]
+        return '\r\n '.join(parts)
+
+class FreeSlotHelper:
+    """
+    Contains methods that find when teachers are free to take on a lesson request
+    """
+    # Candidate start times are this many minutes apart, within the teaching day
+    SLOT_MINUTES = 15
+    DAY_START = 8 * 60
+    DAY_END = 21 * 60
+
+    def free_slots(self, lesson_request, school_term, today=None):
+        """
+        Returns the (teacher, day, start time) slots where a lesson request could be booked in a term
+        Slots are on the days the student is available, for the requested duration and interval,
+        starting no earlier than today. Days with nothing on the teacher's timetable are free throughout,
+        the others are swept once against the teacher's sorted lessons
+        """
+        from lessons.models import TeacherProfile
+
+        if today is None:
+            today = date.today()
+        start_date = max(school_term.start_date, today)
+        end_date = school_term.end_date
+        if start_date > end_date:
+            return []
+
+        teachers = list(TeacherProfile.objects.select_related('user').order_by('user__last_name', 'user__first_name', 'id'))
+        timetables = TeacherTimetableHelper().timetables_for(school_term.id, [teacher.id for teacher in teachers])
+        days = [day for day in LessonOccurrenceHelper.WEEKDAYS if day in lesson_request.availability_formatted_as_list()]
+        starts = range(self.DAY_START, self.DAY_END - lesson_request.duration + 1, self.SLOT_MINUTES)
+
+        # Only teachers with a lesson on one of the days need their bookings looked at, to find which weeks they are in
+        occurrence_helper = LessonOccurrenceHelper()
+        origin_week = occurrence_helper.week_of(start_date)
+        free_days = {(teacher_id, day) for teacher_id, timetable in timetables.items() for day in days if not timetable.day_slots(day)}
+        busy_teacher_ids = [teacher.id for teacher in teachers if any((teacher.id, day) not in free_days for day in days)]
+        lessons = occurrence_helper.weekly_lessons(start_date, end_date, origin_week, busy_teacher_ids) if busy_teacher_ids else {}
+        weeks = {day: occurrence_helper.week_bits(start_date, end_date, day, lesson_request.interval, lesson_request.quantity, origin_week) for day in days}
+
+        slots = []
+        for teacher in teachers:
+            for day in days:
+                if (teacher.id, day) in free_days:
+                    free_starts = starts
+                else:
+                    busy = [(lesson_start, lesson_end) for lesson_start, lesson_end, lesson_bits, duration in lessons.get((teacher.id, day), [])
+                        if lesson_bits & weeks[day]]
+                    free_starts = self._free_starts(busy, starts, lesson_request.duration)
+                for start in free_starts:
+                    slots.append({'teacher': teacher, 'day': day, 'start_time': TimeHelper().add_minutes_to_time(datetime.min.time(), start)})
+
+        return slots
+
+    def first_free_start(self, busy, duration):
+        """
+        Returns the earliest start minute on the grid whose lesson clashes with none of the busy (start, end) seconds, or None
+        Each busy lesson is looked at once, moving the candidate past the ones it clashes with
+        """
+        start = self.DAY_START
+        for busy_start, busy_end in busy:
+            if start + duration > self.DAY_END:
+                return None
+            if busy_start > (start + duration) * 60:
+                break
+            if busy_end >= start * 60:
+                # The first start on the grid after the busy lesson has ended
+                start = self.DAY_START + (busy_end // 60 - self.DAY_START) // self.SLOT_MINUTES * self.SLOT_MINUTES + self.SLOT_MINUTES
+        return start if start + duration <= self.DAY_END else None
+
+    def _free_starts(self, busy, starts, duration):
+        """
+        Yields the candidate start minutes whose lessons clash with none of the busy (start, end) seconds
+        Both are walked in order, keeping the ends of the lessons that have begun in a heap
+        Times that only touch still clash, as in TeacherProfile.is_available
+        """
+        running = []
+        next_busy = 0
+        for start in starts:
+            lesson_start, lesson_end = start * 60, (start + duration) * 60
+            while next_busy < len(busy) and busy[next_busy][0] <= lesson_end:
+                heapq.heappush(running, busy[next_busy][1])
+                next_busy += 1
+            while running and running[0] < lesson_start:
+                heapq.heappop(running)
+            if not running:
+                yield start
+
+class LessonBookingLockHelper:
+    """
+    Saves lesson bookings with their teacher locked, so admins booking the same teacher at once can't both pass the clash check
+    The clash check is repeated inside the lock, so whoever saves second is told about the first booking instead of double booking the teacher
+    """
+    # How many times a booking is tried while another one holds the lock, and how long to wait before trying again
+    ATTEMPTS = 3
+    RETRY_DELAY = 0.1
+    BUSY_MESSAGE = 'Another lesson is being booked with this teacher right now, please try again'
+
+    @contextmanager
+    def lock_teachers(self, teacher_ids):
+        """
+        Runs the body of the with statement in a transaction, with the given teachers locked until it ends
+        Clash checks belong inside the body, so that no other booking of these teachers can be made between the check and the save
+        SQLite has no row locks, so there the teachers are written to instead, which takes the database write lock
+        before the check rather than when the booking is inserted
+        """
+        from django.db import connection, transaction
+        from django.db.models import F
+        from lessons.models import TeacherProfile
+
+        teacher_ids = list(teacher_ids)
+        with transaction.atomic():
+            if connection.features.has_select_for_update:
+                list(TeacherProfile.objects.select_for_update().filter(id__in=teacher_ids).values_list('id', flat=True))
+            else:
+                TeacherProfile.objects.filter(id__in=teacher_ids).update(id=F('id'))
+            yield
+
+    def save(self, lesson_booking):
+        """
+        Saves the booking if it doesn't clash with any of the teacher's other bookings, raising a ValidationError otherwise
+        """
+        from django.core.exceptions import ValidationError
+        from django.db import OperationalError, connection
+        from lessons.models import LessonBooking
+        import time
+
+        # Once a lock error has happened inside an outer transaction it can't be retried from here
+        attempts = 1 if connection.in_atomic_block else self.ATTEMPTS
+        for attempt in range(attempts):
+            try:
+                with self.lock_teachers([lesson_booking.teacher_id]):
+                    clashes = lesson_booking.clashing_bookings()
+                    if clashes:
+                        raise ValidationError(LessonBooking.clash_message(clashes))
+                    lesson_booking.save()
+                return lesson_booking
+            except OperationalError as error:
+                if 'locked' not in str(error):
+                    raise
+            if attempt + 1 < attempts:
+                time.sleep(self.RETRY_DELAY * (attempt + 1))
+        raise ValidationError(self.BUSY_MESSAGE)
+
+class LessonSchedulePlan:
+    """
+    The outcome of scheduling the unfulfilled lesson requests of a term
+    Scheduled bookings are unsaved LessonBooking instances until the plan is committed
+    """
+    def __init__(self, school_term):
+        self.school_term = school_term
+        self.lesson_bookings = []
+        self.unscheduled = []
+        # Scheduled bookings with fewer lessons than were requested, as the term ends before the rest
+        self.shortfalls = []
+        # teacher id -> minutes of lessons in the term, including those already booked
+        self.teacher_minutes = {}
+
+class LessonSchedulerHelper:
+    """
+    Books every unfulfilled lesson request into a term at once, without clashes
+    Requests with the fewest options are placed first, each with the least busy teacher who is free
+    on one of the student's days, at the earliest start time where none of that teacher's lessons share a week with it
+    """
+    def schedule(self, school_term, admin_profile=None, dry_run=False, today=None):
+        """
+        Plans the bookings for the term, then creates them unless this is a dry run
+        Every teacher is locked before planning, so bookings made through the form wait until the plan has been created
+        and then see it, rather than being made after the plan was worked out and clashing with it
+        """
+        from lessons.models import LessonBooking, TeacherProfile
+
+        # A dry run books nothing, so it only needs a transaction
+        locked_teacher_ids = [] if dry_run else TeacherProfile.objects.values_list('id', flat=True)
+        with LessonBookingLockHelper().lock_teachers(locked_teacher_ids):
+            plan = self.plan(school_term, today)
+            if dry_run or not plan.lesson_bookings:
+                return plan
+
+            teacher_ids = set(lesson_booking.teacher_id for lesson_booking in plan.lesson_bookings)
+            for lesson_booking in plan.lesson_bookings:
+                lesson_booking.admin_profile = admin_profile
+                lesson_booking.assign_ledger_date()
+            LessonBooking.objects.bulk_create(plan.lesson_bookings, batch_size=1000)
+
+            # bulk_create doesn't call save() or send post_save, so invoice numbers, accounts, closed term snapshots,
+            # timetables and lessons are brought up to date here
+            LessonBooking.assign_invoice_references(plan.lesson_bookings)
+            earliest_dates = {}
+            for lesson_booking in plan.lesson_bookings:
+                student_profile_id = lesson_booking.lesson_request.student_profile_id
+                earliest_dates[student_profile_id] = min(lesson_booking.start_date, earliest_dates.get(student_profile_id, lesson_booking.start_date))
+            StudentAccountHelper().refresh_many(earliest_dates.keys())
+            TermClosingBalanceHelper().refresh_many(earliest_dates)
+            for teacher_id in teacher_ids:
+                TeacherTimetableHelper().rebuild(teacher_id, school_term.id)
+            LessonOccurrenceHelper().regenerate(lesson_booking.id for lesson_booking in plan.lesson_bookings)
+
+        return plan
+
+    def plan(self, school_term, today=None):
+        """
+        Works out a booking for every unfulfilled lesson request, without saving anything
+        """
+        from lessons.models import LessonBooking, LessonRequest, TeacherProfile
+
+        if today is None:
+            today = date.today()
+        plan = LessonSchedulePlan(school_term)
+        start_date = max(school_term.start_date, today)
+        end_date = school_term.end_date
+
+        lesson_requests = list(LessonRequest.objects
+            .exclude(id__in=LessonBooking.objects.values('lesson_request_id'))
+            .select_related('student_profile__user'))
+        teachers = list(TeacherProfile.objects.select_related('user').order_by('id'))
+        if start_date > end_date or not teachers:
+            plan.unscheduled = lesson_requests
+            return plan
+
+        occurrence_helper = LessonOccurrenceHelper()
+        origin_week = occurrence_helper.week_of(start_date)
+
+        # (teacher id, weekday) -> (start, end, weeks, duration) of every lesson in the term, sorted by start
+        # Teachers whose timetable for the term is empty have no lessons to read
+        timetables = TeacherTimetableHelper().timetables_for(school_term.id, [teacher.id for teacher in teachers])
+        busy_teacher_ids = [teacher.id for teacher in teachers if teacher.id not in timetables or timetables[teacher.id].slots_taken()]
+        timetable = occurrence_helper.weekly_lessons(start_date, end_date, origin_week, busy_teacher_ids) if busy_teacher_ids else {}
+        plan.teacher_minutes = {teacher.id: 0 for teacher in teachers}
+        for (teacher_id, day), lessons in timetable.items():
+            plan.teacher_minutes[teacher_id] += sum(duration * bin(bits).count('1') for start, end, bits, duration in lessons)
+
+        # Requests that can go on fewer days, and take up more of the timetable, are harder to place so go first
+        lesson_requests.sort(key=lambda lesson_request: (len(lesson_request.availability_formatted_as_list()),
+            -lesson_request.duration * lesson_request.quantity, lesson_request.id))
+
+        free_slot_helper = FreeSlotHelper()
+        # (teacher id, weekday, duration, weeks) -> how many lessons the teacher had that day when the lesson didn't fit
+        full = {}
+        for lesson_request in lesson_requests:
+            lesson_booking = self._place(lesson_request, school_term, start_date, end_date, origin_week, teachers, timetable, plan.teacher_minutes, full, free_slot_helper)
+            if lesson_booking is None:
+                plan.unscheduled.append(lesson_request)
+            else:
+                plan.lesson_bookings.append(lesson_booking)
+                if lesson_booking.quantity < lesson_request.quantity:
+                    plan.shortfalls.append(lesson_booking)
+
+        return plan
+
+    def _place(self, lesson_request, school_term, start_date, end_date, origin_week, teachers, timetable, teacher_minutes, full, free_slot_helper):
+        """
+        Finds the least busy teacher who is free for a request and adds the lesson to the timetable
+        Returns the unsaved booking, or None if no teacher is free on any of the student's days
+        """
+        from lessons.models import LessonBooking
+
+        occurrence_helper = LessonOccurrenceHelper()
+        days = [day for day in LessonOccurrenceHelper.WEEKDAYS if day in lesson_request.availability_formatted_as_list()]
+
+        weeks = {}
+        for day in days:
+            dates = occurrence_helper.occurrence_dates(start_date, end_date, day, lesson_request.interval, lesson_request.quantity)
+            if dates:
+                weeks[day] = (dates, occurrence_helper.week_bits(start_date, end_date, day, lesson_request.interval, lesson_request.quantity, origin_week))
+
+        for teacher in sorted(teachers, key=lambda teacher: (teacher_minutes[teacher.id], teacher.id)):
+            for day, (dates, bits) in weeks.items():
+                lessons = timetable.get((teacher.id, day), [])
+                # A teacher's day only fills up, so a lesson that didn't fit won't fit until something else is added to it
+                key = (teacher.id, day, lesson_request.duration, bits)
+                if full.get(key) == len(lessons):
+                    continue
+
+                busy = [(lesson_start, lesson_end) for lesson_start, lesson_end, lesson_bits, duration in lessons if lesson_bits & bits]
+                start = free_slot_helper.first_free_start(busy, lesson_request.duration)
+                if start is None:
+                    full[key] = len(lessons)
+                    continue
+
+                start_time = TimeHelper().add_minutes_to_time(datetime.min.time(), start)
+                bisect.insort(timetable.setdefault((teacher.id, day), []), (start * 60, (start + lesson_request.duration) * 60, bits, lesson_request.duration))
+                teacher_minutes[teacher.id] += lesson_request.duration * len(dates)
+                return LessonBooking(school_term=school_term, start_date=start_date, end_date=end_date, teacher=teacher,
+                    regular_day=day, regular_start_time=start_time, duration=lesson_request.duration,
+                    interval=lesson_request.interval, quantity=len(dates), lesson_request=lesson_request)
+
+        return None
+
+class ListPage:
+    """
+    One page of a list view, with the query strings of the links to the next and first pages
+    """
+    def __init__(self, items, next_query=None, first_query=None):
+        self.items = items
+        # None when there is no next page, or when this is the first page
+        self.next_query = next_query
+        self.first_query = first_query
+
+class ListPaginationHelper:
+    """
+    Splits the tables of the list views into pages, so a page costs the same to render however long the table is
+    Lists ordered by columns ending in a unique one are paged by keyset: each page continues after the last row of the
+    previous one, whose values are held in the after parameter. Other lists, such as ranked search results, are paged by number.
+    Whether there is a next page is found by fetching one row more than is shown, rather than by counting the list
+    """
+    DEFAULT_PAGE_SIZE = 25
+    MAX_PAGE_SIZE = 100
+    # Searches report how many results they found, counting no further than this
+    COUNT_LIMIT = 1000
+
+    def page_size(self, request):
+        """
+        Returns the number of rows per page asked for by the page_size parameter, within the allowed range
+        """
+        page_size = request.GET.get('page_size', '')
+        if not page_size.isdigit() or int(page_size) == 0:
+            return self.DEFAULT_PAGE_SIZE
+        return min(int(page_size), self.MAX_PAGE_SIZE)
+
+    def paginate(self, request, queryset, keyset=None):
+        """
+        Returns the page of the queryset asked for by the request
+        With keyset fields (such as ['start_date', 'id'], prefixed with - for descending), the queryset is ordered by them
+        and paged by keyset, otherwise its own order is kept and it is paged by number
+        """
+        page_size = self.page_size(request)
+        if keyset is None:
+            return self._numbered_page(request, queryset, page_size)
+
+        queryset = queryset.order_by(*keyset)
+        after = self.decode_cursor(request.GET.get('after'), self._fields(queryset, keyset))
+        if after is not None:
+            queryset = queryset.filter(self._after(keyset, after))
+
+        items = list(queryset[:page_size + 1])
+        next_query = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_query = self._query(request, after=self.encode_cursor(self._values(items[-1], keyset)))
+        return ListPage(items, next_query, self._query(request) if after is not None else None)
+
+    def _numbered_page(self, request, queryset, page_size):
+        """
+        Returns a page of the queryset by its number, counted from 1
+        """
+        page_number = request.GET.get('page', '')
+        page_number = int(page_number) if page_number.isdigit() and int(page_number) > 0 else 1
+
+        offset = (page_number - 1) * page_size
+        items = list(queryset[offset:offset + page_size + 1])
+        next_query = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_query = self._query(request, page=page_number + 1)
+        return ListPage(items, next_query, self._query(request) if page_number > 1 else None)
+
+    def count(self, queryset):
+        """
+        Describes how many rows a queryset has, as a number up to the count limit and as "more than" the limit past it
+        Only the rows up to the limit are counted, so this stays cheap however many rows match
+        """
+        count = queryset.order_by()[:self.COUNT_LIMIT + 1].count()
+        if count > self.COUNT_LIMIT:
+            return f"more than { self.COUNT_LIMIT }"
+        return count
+
+    def encode_cursor(self, values):
+        """
+        Encodes the keyset values of a row as a cursor that can be put in a link
+        """
+        from django.core.serializers.json import DjangoJSONEncoder
+        import base64
+
+        return base64.urlsafe_b64encode(json.dumps(values, cls=DjangoJSONEncoder).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, fields):
+        """
+        Returns the keyset values encoded in a cursor, converted by the keyset's model fields,
+        or None if there is no cursor or it is invalid, so that a changed link shows the first page
+        """
+        import base64
+        import binascii
+        from django.core.exceptions import ValidationError
+
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+        if not isinstance(values, list) or len(values) != len(fields):
+            return None
+        try:
+            values = [field.to_python(value) for field, value in zip(fields, values)]
+        except (ValidationError, ValueError, TypeError):
+            return None
+        # Keyset columns are compared with < and >, which never match a null
+        if any(value is None for value in values):
+            return None
+        return values
+
+    def _fields(self, queryset, keyset):
+        """
+        Returns the model field (or annotation's output field) of each keyset field, following relations for fields such as user__last_name
+        """
+        fields = []
+        for field in keyset:
+            names = field.lstrip('-').split('__')
+            if names[0] in queryset.query.annotations:
+                fields.append(queryset.query.annotations[names[0]].output_field)
+                continue
+            model = queryset.model
+            for name in names:
+                model_field = model._meta.get_field(name)
+                model = model_field.related_model
+            fields.append(model_field.target_field if model_field.is_relation else model_field)
+        return fields
+
+    def _after(self, keyset, values):
+        """
+        Returns the condition matching the rows after the given keyset values: those greater in the first field,
+        or equal in it and greater in the second, and so on, with greater meaning less for descending fields
+        """
+        from django.db.models import Q
+
+        condition = Q()
+        equal = Q()
+        for field, value in zip(keyset, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{ name }__{ lookup }': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _values(self, item, keyset):
+        """
+        Returns the keyset values of a row, following relations for fields such as user__last_name
+        """
+        values = []
+        for field in keyset:
+            value = item
+            for name in field.lstrip('-').split('__'):
+                value = getattr(value, name)
+            values.append(value)
+        return values
+
+    def _query(self, request, **parameters):
+        """
+        Returns the request's query string with the paging parameters replaced by those given
+        """
+        query = request.GET.copy()
+        for name in ('after', 'page'):
+            query.pop(name, None)
+        for name, value in parameters.items():
+            query[name] = value
+        return query.urlencode()
+
 class SchoolTermModelHelper:
     """
     Contains methods that helper with school term related tasks
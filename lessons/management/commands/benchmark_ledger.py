@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from lessons.helpers import TransactionModelHelper, TransactionExportHelper, StudentAccountHelper
+from lessons.models import User, UserType, StudentProfile, StudentAccount, TeacherProfile, SchoolTerm, LessonRequest, LessonBooking, Transfer
+from datetime import date, time, timedelta
+from decimal import Decimal
+import random
+import time as clock
+
+class Command(BaseCommand):
+    """
+    Times the ledger views, the current balance and the export at increasing transaction counts
+    """
+    help = "Benchmarks the school ledger with 1k, 10k and 100k transfers and bookings to show that it scales linearly or better"
+
+    SIZES = [ 1000, 10000, 100000 ]
+    STUDENTS = 200
+
+    def add_arguments(self, parser):
+        """
+        Allows the numbers of transfers and bookings to be changed
+        """
+        parser.add_argument('--sizes', type=int, nargs='+', default=Command.SIZES, help="Numbers of transfers and of bookings to benchmark")
+
+    def handle(self, *args, **options):
+        """
+        Seed transactions into the database, growing to each size in turn, and time the ledger at each
+        Everything seeded is rolled back at the end
+        """
+        random.seed(3)
+        sizes = sorted(options['sizes'])
+
+        print(f"{'Transactions':>12} {'First page ms':>14} {'Later page ms':>14} {'Balance ms':>11} {'Export ms':>10} {'Export us/row':>14}")
+        with transaction.atomic():
+            self._setup()
+            seeded = 0
+            for size in sizes:
+                self._seed(seeded, size)
+                seeded = size
+                self._time(size * 2)
+            transaction.set_rollback(True)
+
+        # The first page sums every transaction since the latest closed term, so it grows with them as the export does
+        print("Later page and balance times should stay roughly flat, and first page and export times grow no faster than the number of transactions")
+
+    def _time(self, transactions):
+        """
+        Times each part of the ledger once and prints a row of the results
+        """
+        helper = TransactionModelHelper()
+
+        first_page, (_, next_cursor) = self._timed(lambda: helper.ledger_page())
+        before = helper.decode_ledger_cursor(next_cursor)
+        later_page, _ = self._timed(lambda: helper.ledger_page(None, before))
+        balance, _ = self._timed(lambda: helper.current_balance())
+        export, rows = self._timed(lambda: sum(1 for row in TransactionExportHelper().rows()))
+
+        print(f"{transactions:>12} {first_page * 1000:>14.1f} {later_page * 1000:>14.1f} {balance * 1000:>11.1f} {export * 1000:>10.1f} {export / rows * 1000000:>14.2f}")
+
+    def _timed(self, run):
+        """
+        Returns how many seconds a function took, along with what it returned
+        """
+        started = clock.perf_counter()
+        result = run()
+        return clock.perf_counter() - started, result
+
+    def _setup(self):
+        """
+        Creates the teacher, term and students the seeded bookings belong to
+        """
+        teacher_user = User.objects.create(username='benchmark.teacher@example.org', email='benchmark.teacher@example.org',
+            first_name='Benchmark', last_name='Teacher', type=UserType.TEACHER)
+        self.teacher = TeacherProfile.objects.create(user=teacher_user)
+        self.school_term = SchoolTerm.objects.create(label='Benchmark term', start_date=date(2020, 1, 1), end_date=date(2024, 12, 31))
+
+        users = User.objects.bulk_create([User(username=f'benchmark.student{number}@example.org', email=f'benchmark.student{number}@example.org',
+            first_name='Benchmark', last_name=f'Student{number}', type=UserType.STUDENT) for number in range(Command.STUDENTS)])
+        self.student_profiles = StudentProfile.objects.bulk_create([StudentProfile(user=user) for user in users])
+        StudentAccount.objects.bulk_create([StudentAccount(student_profile=student_profile) for student_profile in self.student_profiles])
+
+    def _seed(self, start, end):
+        """
+        Adds bookings and one transfer per booking until there are the given number of each, spread over roughly five years
+        bulk_create skips the signals, so the ledger dates are assigned and the accounts refreshed here
+        """
+        lesson_requests = LessonRequest.objects.bulk_create([LessonRequest(duration=30, quantity=1, interval=1, availability='MONDAY',
+                student_profile=random.choice(self.student_profiles)) for _ in range(start, end)], batch_size=1000)
+
+        lesson_bookings = []
+        for lesson_request in lesson_requests:
+            start_date = self.school_term.start_date + timedelta(days=random.randint(0, 1825))
+            lesson_bookings.append(LessonBooking(lesson_request=lesson_request, teacher=self.teacher, school_term=self.school_term,
+                start_date=start_date, end_date=start_date, ledger_date=start_date, regular_day='MONDAY', regular_start_time=time(hour=9),
+                duration=30, quantity=random.randint(1, 25), interval=1))
+        LessonBooking.objects.bulk_create(lesson_bookings, batch_size=1000)
+
+        Transfer.objects.bulk_create([Transfer(lesson_booking=lesson_booking, date=lesson_booking.start_date + timedelta(days=random.randint(0, 30)),
+                balance=Decimal(random.randint(5, 125))) for lesson_booking in lesson_bookings], batch_size=1000)
+
+        StudentAccountHelper().refresh_many(student_profile.id for student_profile in self.student_profiles)
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from lessons.helpers import TimeHelper
+from lessons.models import TeacherProfile, TeacherTimetable
+from datetime import date, time
+from types import SimpleNamespace
+import random
+import timeit
+
+class Command(BaseCommand):
+    """
+    Compares availability checks against a teacher's slot timetable with checks against their bookings
+    """
+    help = "Times availability checks for teachers with more and more bookings, against the bookings and against the timetable"
+
+    def add_arguments(self, parser):
+        """
+        Allows the number of checks to be changed
+        """
+        parser.add_argument('--checks', type=int, default=20000, help="Number of availability checks timed for each size")
+
+    def handle(self, *args, **options):
+        """
+        Build timetables of growing size in memory and time the same checks against both representations
+        No database access takes place
+        """
+        random.seed(16)
+        checks = options['checks']
+
+        print(f"{'Bookings':>10} {'Bookings ns/check':>18} {'Timetable ns/check':>19}")
+        for size in [10, 100, 1000, 10000]:
+            lesson_bookings = self._lesson_bookings(size)
+            timetable = TeacherTimetable()
+            for day in TeacherTimetable.DAYS:
+                day_slots = 0
+                for lesson_booking in lesson_bookings:
+                    if lesson_booking.regular_day == day:
+                        day_slots |= TeacherTimetable.slot_mask(lesson_booking.regular_start_time, lesson_booking.duration)
+                timetable.set_day_slots(day, day_slots)
+
+            queries = self._queries(checks)
+            teacher_profile = TeacherProfile()
+            start_date, end_date = date(2022, 9, 1), date(2022, 12, 1)
+
+            bookings_time = timeit.timeit(lambda: [teacher_profile.is_available(lesson_bookings, start_date, end_date, day, start_time, end_time)
+                for day, start_time, end_time in queries], number=1)
+            timetable_time = timeit.timeit(lambda: [timetable.is_free(day, start_time, end_time) for day, start_time, end_time in queries], number=1)
+
+            print(f"{size:>10} {bookings_time / checks * 1e9:>18.0f} {timetable_time / checks * 1e9:>19.0f}")
+
+    def _lesson_bookings(self, size):
+        """
+        Creates bookings spread over the week, as TeacherProfile.is_available reads them
+        Most days fill up once there are more than a few hundred, as a real timetable would
+        """
+        lesson_bookings = []
+        for _ in range(size):
+            start_time = time(hour=random.randint(8, 20), minute=random.choice([0, 15, 30, 45]))
+            duration = random.choice([15, 30, 45, 60])
+            lesson_bookings.append(SimpleNamespace(
+                regular_start_time=start_time, regular_day=random.choice(TeacherTimetable.DAYS), duration=duration,
+                end_time=lambda start_time=start_time, duration=duration: TimeHelper().add_minutes_to_time(start_time, duration),
+                start_date_actual=lambda: date(2022, 9, 1),
+                end_date_actual=lambda: date(2022, 12, 1)))
+        return lesson_bookings
+
+    def _queries(self, checks):
+        """
+        Creates the lessons whose availability is checked, early in the morning so the bookings are all looked at
+        """
+        return [(random.choice(TeacherTimetable.DAYS), time(hour=7), time(hour=7, minute=random.choice([15, 30, 45])))
+            for _ in range(checks)]
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand
+from lessons.helpers import TransactionModelHelper
+from lessons.models import User, StudentProfile, LessonRequest, LessonBooking, Transfer
+from datetime import date, timedelta
+from decimal import Decimal
+import random
+import tracemalloc
+import gc
+
+class _OrmTransactionViewModel:
+    """
+    The transaction view model as it used to be built: from a transfer, holding on to the whole chain of ORM instances
+    """
+    def __init__(self, transfer):
+        self.id = transfer.id
+        self.date = transfer.date
+        self.fee = transfer.balance
+        self.reference = "Payment"
+        self.is_payment = True
+        self.lesson_booking_id = transfer.lesson_booking_id
+        self.student = transfer.lesson_booking.lesson_request.student_profile
+        self.student_name = self.student.user.full_name()
+        self.balance = None
+
+class Command(BaseCommand):
+    """
+    Compares the memory held by transaction view models built from ORM instances and from value rows
+    """
+    help = "Measures the memory used by 100k transaction view models in the old and new representations"
+
+    def add_arguments(self, parser):
+        """
+        Allows the number of transactions and students to be changed
+        """
+        parser.add_argument('--rows', type=int, default=100000, help="Number of transactions to build")
+        parser.add_argument('--students', type=int, default=2000, help="Number of distinct students the transactions belong to")
+
+    def handle(self, *args, **options):
+        """
+        Build both representations in memory and report the peak allocated while building each
+        No database access takes place; the rows are what a ledger query would return
+        """
+        rows = self._rows(options['rows'], options['students'])
+
+        old_size = self._measure(lambda: [_OrmTransactionViewModel(transfer) for transfer in self._transfers(rows)])
+        new_size = self._measure(lambda: self._view_models(rows, options['students']))
+
+        print(f"{'Representation':<32} {'Peak MiB':>10} {'Bytes/row':>10}")
+        print(f"{'ORM instances':<32} {old_size / 1048576:>10.1f} {old_size / len(rows):>10.0f}")
+        print(f"{'Slotted, from value rows':<32} {new_size / 1048576:>10.1f} {new_size / len(rows):>10.0f}")
+        print(f"The value row representation uses {old_size / new_size:.1f}x less memory")
+
+    def _measure(self, build):
+        """
+        Returns the peak number of bytes allocated while building (and holding) a representation
+        """
+        gc.collect()
+        tracemalloc.start()
+        built = build()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del built
+        return peak
+
+    def _rows(self, size, students):
+        """
+        Creates ledger rows as the database returns them, spread over roughly five years
+        """
+        start = date(2020, 1, 1)
+        return [
+            (1, id, (start + timedelta(days=random.randint(0, 1825))).isoformat(), random.randint(1, 200), id, None, random.randint(1, students))
+            for id in range(size)
+        ]
+
+    def _transfers(self, rows):
+        """
+        Creates the transfers the ORM would load for the rows, each with its own copy of the related instances
+        """
+        transfers = []
+        for is_payment, id, transfer_date, fee, lesson_booking_id, invoice_reference, student_profile_id in rows:
+            user = User(id=student_profile_id, first_name=f"First{ student_profile_id }", last_name=f"Last{ student_profile_id }")
+            student_profile = StudentProfile(id=student_profile_id, user=user)
+            lesson_request = LessonRequest(id=lesson_booking_id, student_profile=student_profile)
+            lesson_booking = LessonBooking(id=lesson_booking_id, lesson_request=lesson_request, quantity=1)
+            transfers.append(Transfer(id=id, date=date.fromisoformat(transfer_date), balance=Decimal(fee), lesson_booking=lesson_booking))
+        return transfers
+
+    def _view_models(self, rows, students):
+        """
+        Builds the view models the way the ledger now does
+        """
+        names = { id: f"First{ id } Last{ id }" for id in range(1, students + 1) }
+        return TransactionModelHelper().view_models(rows, lambda row: Decimal(0), names)
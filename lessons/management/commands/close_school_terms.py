@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from lessons.helpers import TermClosingBalanceHelper
+from lessons.models import SchoolTerm
+
+class Command(BaseCommand):
+    """
+    Write the closing balance snapshots of school terms
+    """
+    help = "Closes every school term that has ended, so ledgers no longer rescan the transactions before it. Intended to be run daily"
+
+    def add_arguments(self, parser):
+        """
+        Allows a single term to be closed, or every closed term to be written again
+        """
+        parser.add_argument('--term', type=int, help="Close the school term with this id, even if it hasn't ended yet")
+        parser.add_argument('--rebuild', action='store_true', help="Write the snapshots of every closed term again, oldest first")
+
+    def handle(self, *args, **options):
+        """
+        Close the chosen terms
+        """
+        helper = TermClosingBalanceHelper()
+
+        if options['term']:
+            try:
+                school_terms = [SchoolTerm.objects.get(id=options['term'])]
+            except SchoolTerm.DoesNotExist:
+                raise CommandError(f"School term {options['term']} does not exist")
+            helper.close_term(school_terms[0])
+        elif options['rebuild']:
+            school_terms = list(helper.closed_terms())
+            for school_term in school_terms:
+                helper.close_term(school_term)
+        else:
+            school_terms = helper.close_ended_terms()
+
+        for school_term in school_terms:
+            print(f"Closed {school_term}")
+        print(f"{len(school_terms)} school terms closed")
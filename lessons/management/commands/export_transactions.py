@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from lessons.helpers import TransactionExportHelper
+from lessons.models import SchoolTerm
+from datetime import date
+import sys
+
+class Command(BaseCommand):
+    """
+    Write the school's transactions to a CSV or JSON lines file
+    """
+    help = "Exports every transfer and invoice with its running balance, streaming rows so memory use stays flat"
+
+    def add_arguments(self, parser):
+        """
+        Filters and output options
+        """
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help="File format of the export")
+        parser.add_argument('--term', type=int, help="Only include lessons booked within the school term with this id")
+        parser.add_argument('--from', dest='start_date', type=date.fromisoformat, help="Earliest date to include (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='end_date', type=date.fromisoformat, help="Latest date to include (YYYY-MM-DD)")
+        parser.add_argument('--output', help="File to write to, standard output is used if not provided")
+
+    def handle(self, *args, **options):
+        """
+        Stream the export to the chosen output
+        """
+        school_term = None
+        if options['term']:
+            try:
+                school_term = SchoolTerm.objects.get(id=options['term'])
+            except SchoolTerm.DoesNotExist:
+                raise CommandError(f"School term {options['term']} does not exist")
+
+        helper = TransactionExportHelper()
+        rows = helper.rows(school_term=school_term, start_date=options['start_date'], end_date=options['end_date'])
+        lines = helper.jsonl_lines(rows) if options['format'] == 'jsonl' else helper.csv_lines(rows)
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
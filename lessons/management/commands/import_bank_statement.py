@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from lessons.helpers import BankStatementImportHelper
+
+class Command(BaseCommand):
+    """
+    Register the transfers listed on a bank statement
+    """
+    help = "Imports a bank statement CSV (date, amount, reference) and reports unmatched, duplicate and overpaid lines"
+
+    def add_arguments(self, parser):
+        """
+        The statement to import and whether to register the transfers
+        """
+        parser.add_argument('statement', help="Path to the bank statement CSV")
+        parser.add_argument('--dry-run', action='store_true', help="Only report on the statement, without registering any transfers")
+
+    def handle(self, *args, **options):
+        """
+        Import the statement and print the reconciliation report
+        """
+        try:
+            with open(options['statement'], newline='', encoding='utf-8-sig') as statement:
+                report = BankStatementImportHelper().import_statement(statement, dry_run=options['dry_run'])
+        except OSError as error:
+            raise CommandError(f"Could not read {options['statement']}: {error}")
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        if options['dry_run']:
+            print(f"{len(report.imported)} transfers would be registered")
+        else:
+            print(f"{len(report.imported)} transfers registered")
+
+        for title, entries in [('Invalid', report.invalid), ('Unmatched', report.unmatched), ('Duplicate', report.duplicates), ('Overpaid', report.overpaid)]:
+            print(f"{title}: {len(entries)}")
+            for entry in entries:
+                print(f"  line {entry['line']}: {entry['date']} {entry['amount']} {entry['reference']} - {entry['reason']}")
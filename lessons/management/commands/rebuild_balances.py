@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from lessons.helpers import StudentAccountHelper, TransactionModelHelper
+
+class Command(BaseCommand):
+    """
+    Recompute every student account balance from the underlying transactions
+    """
+    help = "Recomputes every StudentAccount in bulk and reports any that had drifted"
+
+    def add_arguments(self, parser):
+        """
+        Drift can be reported without correcting it
+        """
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without correcting it")
+
+    def handle(self, *args, **options):
+        """
+        Rebuild the accounts and print every one that was wrong
+        """
+        helper = TransactionModelHelper()
+        drift = StudentAccountHelper().rebuild(dry_run=options['dry_run'])
+
+        for student_profile_id, stored_balance, correct_balance in drift:
+            if stored_balance is None:
+                print(f"Student profile {student_profile_id}: account missing, balance should be {helper.format_to_currency(correct_balance)}")
+            else:
+                print(f"Student profile {student_profile_id}: stored {helper.format_to_currency(stored_balance)}, should be {helper.format_to_currency(correct_balance)}")
+
+        if options['dry_run']:
+            print(f"{len(drift)} student accounts have drifted, no changes were made")
+        else:
+            print(f"{len(drift)} student accounts were corrected")
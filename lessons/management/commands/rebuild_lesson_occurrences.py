@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from lessons.helpers import LessonOccurrenceHelper
+
+class Command(BaseCommand):
+    """
+    Regenerate the stored lessons of every lesson booking
+    """
+    help = "Works out every lesson of every booking again and stores them as LessonOccurrence rows in bulk"
+
+    def handle(self, *args, **options):
+        """
+        Rebuild the lessons and print how many there are
+        """
+        print(f"{LessonOccurrenceHelper().rebuild()} lessons generated")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from lessons.helpers import StudentSearchHelper
+
+class Command(BaseCommand):
+    """
+    Rebuild the full-text index used to search for students
+    """
+    help = "Indexes the name and email of every user again, for databases that have the full-text search index"
+
+    def handle(self, *args, **options):
+        """
+        Rebuild the index and print how many users are in it
+        """
+        print(f"{StudentSearchHelper().rebuild()} users indexed")
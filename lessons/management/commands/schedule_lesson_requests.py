@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from lessons.helpers import LessonSchedulerHelper
+from lessons.models import SchoolTerm, User
+
+class Command(BaseCommand):
+    """
+    Book every unfulfilled lesson request into a school term
+    """
+    help = "Plans a clash free booking for every unfulfilled lesson request in a term, and books them unless it is a dry run"
+
+    def add_arguments(self, parser):
+        """
+        The term to book into, who the bookings are made by and whether to book them
+        """
+        parser.add_argument('term', type=int, help="The id of the school term to book the lessons in")
+        parser.add_argument('--admin', help="Email of the administrator the bookings are made by")
+        parser.add_argument('--dry-run', action='store_true', help="Only print the plan, without booking any lessons")
+
+    def handle(self, *args, **options):
+        """
+        Schedule the requests and print the plan
+        """
+        try:
+            school_term = SchoolTerm.objects.get(id=options['term'])
+        except SchoolTerm.DoesNotExist:
+            raise CommandError(f"School term {options['term']} does not exist")
+
+        admin_profile = None
+        if options['admin']:
+            user = User.objects.filter(email=options['admin']).select_related('admin_profile').first()
+            if user is None or not hasattr(user, 'admin_profile'):
+                raise CommandError(f"{options['admin']} is not an administrator")
+            admin_profile = user.admin_profile
+
+        plan = LessonSchedulerHelper().schedule(school_term, admin_profile, dry_run=options['dry_run'])
+
+        for lesson_booking in plan.lesson_bookings:
+            print(f"{lesson_booking.lesson_request.student_profile}: {lesson_booking.teacher}, {lesson_booking.regular_day_formatted()}s "
+                f"{lesson_booking.regular_start_time.strftime('%H:%M')} for {lesson_booking.duration} minutes, {lesson_booking.quantity} lessons"
+                + (f" of {lesson_booking.lesson_request.quantity} requested" if lesson_booking in plan.shortfalls else ""))
+        for lesson_request in plan.unscheduled:
+            print(f"{lesson_request.student_profile}: could not be scheduled on {lesson_request.availability_formatted()}")
+
+        if options['dry_run']:
+            print(f"{len(plan.lesson_bookings)} lessons would be booked, {len(plan.unscheduled)} requests could not be scheduled")
+        else:
+            print(f"{len(plan.lesson_bookings)} lessons booked, {len(plan.unscheduled)} requests could not be scheduled")
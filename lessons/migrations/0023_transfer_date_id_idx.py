@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0022_alter_lessonbooking_admin_profile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transfer',
+            index=models.Index(fields=['date', 'id'], name='transfer_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:15
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+# Price per lesson at the time of this migration (LessonBooking.LESSON_PRICE)
+LESSON_PRICE = 5
+
+
+def create_student_accounts(apps, schema_editor):
+    """
+    Give every existing student an account holding their current totals
+    """
+    StudentProfile = apps.get_model('lessons', 'StudentProfile')
+    StudentAccount = apps.get_model('lessons', 'StudentAccount')
+    LessonBooking = apps.get_model('lessons', 'LessonBooking')
+    Transfer = apps.get_model('lessons', 'Transfer')
+
+    invoiced = {
+        row['lesson_request__student_profile_id']: Decimal(row['quantity'] * LESSON_PRICE)
+        for row in LessonBooking.objects.values('lesson_request__student_profile_id').annotate(quantity=Sum('quantity')).order_by()
+    }
+    paid = {
+        row['lesson_booking__lesson_request__student_profile_id']: Decimal(str(row['paid'])).quantize(Decimal('0.01'))
+        for row in Transfer.objects.values('lesson_booking__lesson_request__student_profile_id').annotate(paid=Sum('balance')).order_by()
+    }
+
+    accounts = []
+    for student_profile_id in StudentProfile.objects.values_list('id', flat=True):
+        total_invoiced = invoiced.get(student_profile_id, Decimal(0))
+        total_paid = paid.get(student_profile_id, Decimal(0))
+        accounts.append(StudentAccount(
+            student_profile_id=student_profile_id,
+            total_invoiced=total_invoiced,
+            total_paid=total_paid,
+            balance=total_paid - total_invoiced))
+
+    StudentAccount.objects.bulk_create(accounts, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0023_transfer_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAccount',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_invoiced', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('student_profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='account', to='lessons.studentprofile')),
+            ],
+        ),
+        migrations.RunPython(create_student_accounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0024_studentaccount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessonbooking',
+            name='invoice_reference',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def backfill_invoice_references(apps, schema_editor):
+    """
+    Store the invoice number already shown on every existing booking's invoice, so existing references keep matching
+    """
+    LessonBooking = apps.get_model('lessons', 'LessonBooking')
+
+    lesson_bookings = []
+    for lesson_booking in LessonBooking.objects.filter(invoice_reference__isnull=True).select_related('lesson_request').only('id', 'lesson_request__student_profile_id').iterator():
+        lesson_booking.invoice_reference = f'{str(lesson_booking.lesson_request.student_profile_id).rjust(4, "0")}-{str(lesson_booking.id).rjust(3, "0")}'
+        lesson_bookings.append(lesson_booking)
+
+    LessonBooking.objects.bulk_update(lesson_bookings, ['invoice_reference'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0025_lessonbooking_invoice_reference'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_invoice_references, migrations.RunPython.noop),
+    ]
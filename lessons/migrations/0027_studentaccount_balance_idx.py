@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0026_backfill_invoice_reference'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentaccount',
+            index=models.Index(fields=['balance', 'id'], name='studentaccount_balance_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0027_studentaccount_balance_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermClosingBalance',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('school_term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closing_balances', to='lessons.schoolterm')),
+                ('student_profile', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='term_closing_balances', to='lessons.studentprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('school_term', 'student_profile'), name='term_closing_balance_student_unique'), models.UniqueConstraint(condition=models.Q(('student_profile__isnull', True)), fields=('school_term',), name='term_closing_balance_school_unique')],
+            },
+        ),
+    ]
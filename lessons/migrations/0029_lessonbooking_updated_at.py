@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0028_termclosingbalance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessonbooking',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
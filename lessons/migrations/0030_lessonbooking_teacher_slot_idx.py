@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0029_lessonbooking_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lessonbooking',
+            index=models.Index(fields=['teacher', 'regular_day', 'regular_start_time'], name='lessonbooking_teacher_slot_idx'),
+        ),
+    ]
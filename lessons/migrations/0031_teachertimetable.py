@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0030_lessonbooking_teacher_slot_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeacherTimetable',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('slots', models.BinaryField(default=b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00', max_length=84)),
+                ('school_term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teacher_timetables', to='lessons.schoolterm')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timetables', to='lessons.teacherprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('teacher', 'school_term'), name='teacher_timetable_unique')],
+            },
+        ),
+    ]
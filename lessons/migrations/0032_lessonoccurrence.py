@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0031_teachertimetable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonOccurrence',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('lesson_booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='lessons.lessonbooking')),
+                ('student_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_occurrences', to='lessons.studentprofile')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_occurrences', to='lessons.teacherprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'teacher'], name='lessonoccurrence_teacher_idx'), models.Index(fields=['date', 'student_profile'], name='lessonoccurrence_student_idx')],
+                'constraints': [models.UniqueConstraint(fields=('lesson_booking', 'date'), name='lesson_occurrence_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations, OperationalError
+
+
+def create_user_search(apps, schema_editor):
+    """
+    Create the full-text index of user names and emails used to search for students, and fill it from the existing users
+    Only SQLite builds with FTS5 get the index, other databases search the user table directly
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    User = apps.get_model('lessons', 'User')
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE lessons_usersearch USING fts5(first_name, last_name, email)")
+        except OperationalError:
+            # SQLite was built without FTS5
+            return
+        cursor.execute(f"INSERT INTO lessons_usersearch (rowid, first_name, last_name, email) SELECT id, first_name, last_name, email FROM { User._meta.db_table }")
+
+
+def drop_user_search(apps, schema_editor):
+    """
+    Remove the full-text index of users, if it was created
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS lessons_usersearch")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0032_lessonoccurrence'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_user_search, drop_user_search),
+    ]
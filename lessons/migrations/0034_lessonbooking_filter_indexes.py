@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0033_usersearch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lessonbooking',
+            index=models.Index(fields=['school_term', 'regular_day', 'regular_start_time'], name='lessonbooking_term_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonbooking',
+            index=models.Index(fields=['regular_day', 'regular_start_time'], name='lessonbooking_day_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonbooking',
+            index=models.Index(fields=['regular_start_time'], name='lessonbooking_start_time_idx'),
+        ),
+    ]
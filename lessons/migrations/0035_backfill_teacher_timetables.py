@@ -0,0 +1,56 @@
+from django.db import migrations
+
+# As in TeacherTimetable, which historical models don't have the methods of
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 96
+BYTES_PER_DAY = 12
+DAYS = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
+
+
+def slot_mask(start_time, duration):
+    """
+    The slots a lesson covers, as TeacherTimetable.slot_mask
+    """
+    start = (start_time.hour * 60 + start_time.minute) // SLOT_MINUTES
+    end = ((start_time.hour * 60 + start_time.minute + duration) % 1440) // SLOT_MINUTES
+    if end >= start:
+        return (1 << (end + 1)) - (1 << start)
+    return ((1 << SLOTS_PER_DAY) - (1 << start)) | ((1 << (end + 1)) - 1)
+
+
+def backfill_teacher_timetables(apps, schema_editor):
+    """
+    Make the timetable of every teacher for every term from their bookings, so they never have to be made when availability is checked
+    """
+    LessonBooking = apps.get_model('lessons', 'LessonBooking')
+    SchoolTerm = apps.get_model('lessons', 'SchoolTerm')
+    TeacherProfile = apps.get_model('lessons', 'TeacherProfile')
+    TeacherTimetable = apps.get_model('lessons', 'TeacherTimetable')
+
+    day_slots = {}
+    for teacher_id, school_term_id, day, start_time, duration in LessonBooking.objects.values_list('teacher_id', 'school_term_id', 'regular_day', 'regular_start_time', 'duration').iterator():
+        key = (teacher_id, school_term_id, day)
+        day_slots[key] = day_slots.get(key, 0) | slot_mask(start_time, duration)
+
+    existing = set(TeacherTimetable.objects.values_list('teacher_id', 'school_term_id'))
+    school_term_ids = list(SchoolTerm.objects.values_list('id', flat=True))
+    timetables = []
+    for teacher_id in TeacherProfile.objects.values_list('id', flat=True):
+        for school_term_id in school_term_ids:
+            if (teacher_id, school_term_id) in existing:
+                continue
+            slots = b''.join(day_slots.get((teacher_id, school_term_id, day), 0).to_bytes(BYTES_PER_DAY, 'little') for day in DAYS)
+            timetables.append(TeacherTimetable(teacher_id=teacher_id, school_term_id=school_term_id, slots=slots))
+
+    TeacherTimetable.objects.bulk_create(timetables, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0034_lessonbooking_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_teacher_timetables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+from datetime import time, timedelta
+from django.db import migrations
+from django.db.models.functions import Coalesce
+
+# As in LessonOccurrenceHelper, which migrations can't rely on staying the same
+WEEKDAYS = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
+
+
+def occurrence_dates(start_date, end_date, regular_day, interval, quantity):
+    """
+    The dates of the lessons of a booking, as LessonOccurrenceHelper.occurrence_dates
+    """
+    first = start_date + timedelta(days=(WEEKDAYS.index(regular_day) - start_date.weekday()) % 7)
+    dates = []
+    for number in range(quantity):
+        occurrence = first + timedelta(weeks=number * interval)
+        if occurrence > end_date:
+            break
+        dates.append(occurrence)
+    return dates
+
+
+def backfill_lesson_occurrences(apps, schema_editor):
+    """
+    Store the lessons of every existing booking, so rosters, utilization and date filters include bookings made before occurrences were stored
+    """
+    LessonBooking = apps.get_model('lessons', 'LessonBooking')
+    LessonOccurrence = apps.get_model('lessons', 'LessonOccurrence')
+
+    stored = set(LessonOccurrence.objects.values_list('lesson_booking_id', flat=True).distinct())
+    rows = (LessonBooking.objects.order_by('id')
+        .values_list('id', Coalesce('start_date', 'school_term__start_date'), Coalesce('end_date', 'school_term__end_date'),
+            'regular_day', 'interval', 'quantity', 'regular_start_time', 'duration', 'teacher_id', 'lesson_request__student_profile_id'))
+
+    occurrences = []
+    for id, start_date, end_date, regular_day, interval, quantity, start_time, duration, teacher_id, student_profile_id in rows.iterator():
+        if id in stored:
+            continue
+        # The end time is worked out as LessonBooking.end_time(), wrapping past midnight
+        minutes = (start_time.hour * 60 + start_time.minute + duration) % 1440
+        end_time = time(hour=minutes // 60, minute=minutes % 60)
+        occurrences.extend(LessonOccurrence(lesson_booking_id=id, date=occurrence, start_time=start_time, end_time=end_time,
+                teacher_id=teacher_id, student_profile_id=student_profile_id)
+            for occurrence in occurrence_dates(start_date, end_date, regular_day, interval, quantity))
+        if len(occurrences) >= 1000:
+            LessonOccurrence.objects.bulk_create(occurrences)
+            occurrences = []
+
+    LessonOccurrence.objects.bulk_create(occurrences, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0035_backfill_teacher_timetables'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_lesson_occurrences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:39
+
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    """
+    Make the single row the typeahead version is counted in
+    """
+    StudentTypeaheadVersion = apps.get_model('lessons', 'StudentTypeaheadVersion')
+    StudentTypeaheadVersion.objects.get_or_create(id=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0036_backfill_lesson_occurrences'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentTypeaheadVersion',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
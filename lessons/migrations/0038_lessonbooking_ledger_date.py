@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0037_studenttypeaheadversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessonbooking',
+            name='ledger_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lessonbooking',
+            index=models.Index(fields=['ledger_date', 'id'], name='lessonbooking_ledger_date_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+from django.db.models import F, OuterRef, Subquery
+
+
+def backfill_ledger_dates(apps, schema_editor):
+    """
+    Store the date every existing booking is invoiced on, as LessonBooking.assign_ledger_date, so they appear in the ledger
+    """
+    LessonBooking = apps.get_model('lessons', 'LessonBooking')
+    SchoolTerm = apps.get_model('lessons', 'SchoolTerm')
+
+    LessonBooking.objects.filter(start_date__isnull=False).update(ledger_date=F('start_date'))
+    LessonBooking.objects.filter(start_date__isnull=True).update(
+        ledger_date=Subquery(SchoolTerm.objects.filter(id=OuterRef('school_term_id')).values('start_date')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lessons', '0038_lessonbooking_ledger_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ledger_dates, migrations.RunPython.noop),
+    ]
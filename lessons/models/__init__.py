@@ -1,4 +1,4 @@
-from .user_models import User, UserType, AvailabilityPeriod, StudentProfile, AdminProfile, TeacherProfile
-from .lesson_models import LessonBooking, LessonRequest
+from .user_models import User, UserType, AvailabilityPeriod, StudentProfile, StudentTypeaheadVersion, AdminProfile, TeacherProfile
+from .lesson_models import LessonBooking, LessonRequest, LessonOccurrence, TeacherTimetable
 from .term_models import SchoolTerm
-from .transfer_models import Transfer
+from .transfer_models import Transfer, StudentAccount, TermClosingBalance
@@ -4,7 +4,8 @@ from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator, MaxLengthValidator
 from .user_models import AvailabilityPeriod
 from lessons.helpers import TransactionModelHelper, TimeHelper
-from datetime import timedelta
+from datetime import timedelta, time
+import math
 
 """
 Note on 'backward' properties
@@ -129,12 +130,34 @@ class LessonBooking(models.Model):
     quantity = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(25)], blank=False)
     interval = models.IntegerField(choices=INTERVAL_CHOICES, default=1, blank=False)
 
+    # Stored so that a transfer can be matched to its invoice with a single index lookup, assigned once the booking has an id
+    invoice_reference = models.CharField(max_length=32, unique=True, blank=True, null=True, editable=False)
+
+    # The date the booking is invoiced on: its start date, or its term's start when it has none
+    # Stored so ledgers can be read in date order from an index, assigned whenever the booking is saved
+    ledger_date = models.DateField(blank=True, null=True, editable=False)
+
+    # When the booking was last changed, used to tell whether anything derived from the bookings is out of date
+    updated_at = models.DateTimeField(auto_now=True)
+
     # Navigation properties
     lesson_request = models.OneToOneField('lessons.LessonRequest', on_delete=models.CASCADE, related_name="lesson_booking", blank=False)
     admin_profile = models.ForeignKey('lessons.AdminProfile', on_delete=models.SET_NULL, related_name="lesson_bookings", blank=True, null=True)
     school_term = models.ForeignKey('lessons.SchoolTerm', on_delete=models.CASCADE, related_name="lesson_bookings", blank=False, null=False)
     teacher = models.ForeignKey('lessons.TeacherProfile', on_delete=models.CASCADE, related_name="lesson_bookings", blank=False, null=False)
 
+    class Meta:
+        """
+        Clashes are looked for by teacher, weekday and time, bookings are listed by term, weekday and time, and ledgers are read by date
+        """
+        indexes = [
+            models.Index(fields=['teacher', 'regular_day', 'regular_start_time'], name='lessonbooking_teacher_slot_idx'),
+            models.Index(fields=['school_term', 'regular_day', 'regular_start_time'], name='lessonbooking_term_slot_idx'),
+            models.Index(fields=['regular_day', 'regular_start_time'], name='lessonbooking_day_time_idx'),
+            models.Index(fields=['regular_start_time'], name='lessonbooking_start_time_idx'),
+            models.Index(fields=['ledger_date', 'id'], name='lessonbooking_ledger_date_idx'),
+        ]
+
     def end_time(self):
         """
         Returns the time that the lesson ends
@@ -146,7 +169,103 @@ class LessonBooking(models.Model):
         """
         Returns the invoice number for this bookings
         """
-        return f'{str(self.lesson_request.student_profile.id).rjust(4, "0")}-{str(self.id).rjust(3, "0")}'
+        if self.invoice_reference:
+            return self.invoice_reference
+        return LessonBooking.format_invoice_number(self.lesson_request.student_profile_id, self.id)
+
+    @staticmethod
+    def clashing_times(start_time, end_time):
+        """
+        Returns a filter for bookings whose lessons overlap a time window, for use within a query
+        Works the same way as TeacherProfile.time_overlaps with end_time(): lessons that only touch still clash,
+        a lesson ends on the minute, and one that runs past midnight ends early the next morning
+        Each possible duration is given its own bounds on the start time, so no arithmetic is needed on the columns
+        """
+        start = start_time.hour * 60 + start_time.minute + (start_time.second + start_time.microsecond / 1000000) / 60
+        clashes = models.Q(pk__in=[])
+
+        for duration, label in DURATION_CHOICES:
+            # Lessons that start this late run past midnight
+            wrap = 24 * 60 - duration
+
+            # A lesson ending the same day clashes if start + duration reaches the start of the window
+            earliest = max(math.ceil(start - duration), 0)
+            if earliest < wrap:
+                clashes |= models.Q(duration=duration, regular_start_time__gte=LessonBooking._minutes_to_time(earliest),
+                    regular_start_time__lt=LessonBooking._minutes_to_time(wrap), regular_start_time__lte=end_time)
+
+            # A lesson ending the next morning clashes if start + duration - 24 hours reaches the start of the window
+            earliest = max(math.ceil(start + wrap), wrap)
+            if earliest < 24 * 60:
+                clashes |= models.Q(duration=duration, regular_start_time__gte=LessonBooking._minutes_to_time(earliest),
+                    regular_start_time__lte=end_time)
+
+        return clashes
+
+    @staticmethod
+    def _minutes_to_time(minutes):
+        """
+        Returns the time a number of minutes after midnight
+        """
+        return time(hour=minutes // 60, minute=minutes % 60)
+
+    @staticmethod
+    def format_invoice_number(student_profile_id, lesson_booking_id):
+        """
+        Formats an invoice number from the ids it is made from, so it can be built without loading the models
+        The padding is only a minimum width, the booking id keeps every number unique however large the ids become
+        """
+        return f'{str(student_profile_id).rjust(4, "0")}-{str(lesson_booking_id).rjust(3, "0")}'
+
+    @staticmethod
+    def assign_invoice_references(lesson_bookings):
+        """
+        Stores the invoice number of lesson bookings that don't yet have one
+        Used after bulk_create(), which bypasses save()
+        """
+        unassigned = [lesson_booking for lesson_booking in lesson_bookings if not lesson_booking.invoice_reference]
+        student_profile_ids = dict(LessonRequest.objects.filter(id__in=[lesson_booking.lesson_request_id for lesson_booking in unassigned]).values_list('id', 'student_profile_id'))
+
+        for lesson_booking in unassigned:
+            lesson_booking.invoice_reference = LessonBooking.format_invoice_number(student_profile_ids[lesson_booking.lesson_request_id], lesson_booking.id)
+        LessonBooking.objects.bulk_update(unassigned, ['invoice_reference'], batch_size=1000)
+
+    def clash_description(self):
+        """
+        Describes when the lessons take place, for explaining a clash
+        """
+        return (f"{ self.regular_day_formatted() }s { self.regular_start_time.strftime('%H:%M') }-{ self.end_time().strftime('%H:%M') }"
+            f" from { self.start_date_actual().strftime('%d/%m/%Y') } to { self.end_date_actual().strftime('%d/%m/%Y') }"
+            f" (invoice { self.invoice_number() })")
+
+    @staticmethod
+    def clash_message(clashes):
+        """
+        Explains why a teacher can't take a booking that clashes with the given ones
+        """
+        return ('The selected teacher is not available at the given time, as they already teach ' +
+            '; '.join(lesson_booking.clash_description() for lesson_booking in clashes))
+
+    def clashing_bookings(self):
+        """
+        Returns the teacher's other bookings that have a lesson in the same week and at the same time as this one
+        """
+        return self.teacher.clashing_bookings(self.start_date_actual(), self.end_date_actual(), self.regular_day,
+            self.regular_start_time, self.end_time(), self.interval, self.quantity, exclude_lesson_booking_id=self.id, school_term_id=self.school_term_id)
+
+    def occurrence_dates(self):
+        """
+        Returns the dates of each lesson in the booking
+        """
+        from lessons.helpers import LessonOccurrenceHelper
+        return LessonOccurrenceHelper().occurrence_dates(self.start_date_actual(), self.end_date_actual(), self.regular_day, self.interval, self.quantity)
+
+    def week_bits(self, origin_week):
+        """
+        Returns the weeks the booking has lessons in as a bitset counted from the origin week
+        """
+        from lessons.helpers import LessonOccurrenceHelper
+        return LessonOccurrenceHelper().week_bits(self.start_date_actual(), self.end_date_actual(), self.regular_day, self.interval, self.quantity, origin_week)
 
     def start_date_actual(self):
         """
@@ -166,6 +285,26 @@ class LessonBooking(models.Model):
         else:
             return self.school_term.end_date
 
+    def assign_ledger_date(self):
+        """
+        Stores the date the booking is invoiced on
+        Used before bulk_create(), which bypasses save()
+        """
+        self.ledger_date = self.start_date_actual()
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the booking, assigning its invoice number the first time it is saved
+        """
+        self.assign_ledger_date()
+        if kwargs.get('update_fields'):
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'ledger_date'}
+        super().save(*args, **kwargs)
+
+        if not self.invoice_reference:
+            self.invoice_reference = LessonBooking.format_invoice_number(self.lesson_request.student_profile_id, self.id)
+            LessonBooking.objects.filter(pk=self.pk).update(invoice_reference=self.invoice_reference)
+
     def calculate_total_price(self):
         """
         Calculates the price of booking the lesson schedule, accounting for quantity
@@ -199,3 +338,99 @@ class LessonBooking(models.Model):
         Returns the day in formatted form.
         """
         return self.regular_day[:1].upper() + self.regular_day[1:].lower()
+
+class LessonOccurrence(models.Model):
+    """
+    One concrete lesson of a booking, on the date it takes place
+    Generated from the booking whenever it is saved, so lessons on a date can be found with an index rather than by expanding every booking
+    The teacher and student are copied from the booking so rosters don't need to join through it
+    """
+
+    id = models.AutoField(primary_key=True)
+    date = models.DateField(blank=False)
+    start_time = models.TimeField(blank=False)
+    end_time = models.TimeField(blank=False)
+
+    lesson_booking = models.ForeignKey('lessons.LessonBooking', on_delete=models.CASCADE, related_name="occurrences", blank=False)
+    teacher = models.ForeignKey('lessons.TeacherProfile', on_delete=models.CASCADE, related_name="lesson_occurrences", blank=False)
+    student_profile = models.ForeignKey('lessons.StudentProfile', on_delete=models.CASCADE, related_name="lesson_occurrences", blank=False)
+
+    class Meta:
+        """
+        Lessons are looked up by date, for a teacher or for a student
+        """
+        indexes = [
+            models.Index(fields=['date', 'teacher'], name='lessonoccurrence_teacher_idx'),
+            models.Index(fields=['date', 'student_profile'], name='lessonoccurrence_student_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['lesson_booking', 'date'], name='lesson_occurrence_unique'),
+        ]
+
+class TeacherTimetable(models.Model):
+    """
+    The fifteen minute slots of the week that a teacher has a lesson in during a school term
+    Each day is a bit array of 96 slots, so whether a time is free is answered without looking at the bookings
+    A slot is marked if a lesson starts, runs or ends in it, as lessons that only touch still clash
+    The weeks lessons are in are not recorded, so a marked slot may still be free in a given week
+    """
+    SLOT_MINUTES = 15
+    SLOTS_PER_DAY = 96
+    BYTES_PER_DAY = 12
+    DAYS = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
+
+    id = models.AutoField(primary_key=True)
+    teacher = models.ForeignKey('lessons.TeacherProfile', on_delete=models.CASCADE, related_name="timetables", blank=False, null=False)
+    school_term = models.ForeignKey('lessons.SchoolTerm', on_delete=models.CASCADE, related_name="teacher_timetables", blank=False, null=False)
+    # Seven days of 96 bits, Monday first
+    slots = models.BinaryField(max_length=84, default=bytes(84))
+
+    class Meta:
+        """
+        One timetable per teacher per term
+        """
+        constraints = [
+            models.UniqueConstraint(fields=['teacher', 'school_term'], name='teacher_timetable_unique'),
+        ]
+
+    @staticmethod
+    def slot_mask(start_time, duration):
+        """
+        Returns the slots a lesson covers as a 96 bit integer, from the slot it starts in to the slot it ends in
+        Lessons that run past midnight cover the end of the day and the start of it, like LessonBooking.end_time()
+        """
+        start = (start_time.hour * 60 + start_time.minute) // TeacherTimetable.SLOT_MINUTES
+        end = ((start_time.hour * 60 + start_time.minute + duration) % 1440) // TeacherTimetable.SLOT_MINUTES
+        if end >= start:
+            return (1 << (end + 1)) - (1 << start)
+        return ((1 << TeacherTimetable.SLOTS_PER_DAY) - (1 << start)) | ((1 << (end + 1)) - 1)
+
+    def day_slots(self, day):
+        """
+        Returns the slots taken on a weekday as a 96 bit integer
+        """
+        offset = TeacherTimetable.DAYS.index(day) * TeacherTimetable.BYTES_PER_DAY
+        return int.from_bytes(bytes(self.slots)[offset:offset + TeacherTimetable.BYTES_PER_DAY], 'little')
+
+    def set_day_slots(self, day, day_slots):
+        """
+        Replaces the slots taken on a weekday
+        """
+        offset = TeacherTimetable.DAYS.index(day) * TeacherTimetable.BYTES_PER_DAY
+        slots = bytearray(self.slots)
+        slots[offset:offset + TeacherTimetable.BYTES_PER_DAY] = day_slots.to_bytes(TeacherTimetable.BYTES_PER_DAY, 'little')
+        self.slots = bytes(slots)
+
+    def is_free(self, day, start_time, end_time):
+        """
+        Returns whether no lesson in the term is on a weekday between two times
+        One mask and one bitwise and, however many bookings the teacher has
+        """
+        duration = (end_time.hour * 60 + end_time.minute - start_time.hour * 60 - start_time.minute) % 1440
+        return not self.day_slots(day) & TeacherTimetable.slot_mask(start_time, duration)
+
+    def slots_taken(self):
+        """
+        Returns the number of slots in the week that have a lesson
+        """
+        return bin(int.from_bytes(bytes(self.slots), 'little')).count('1')
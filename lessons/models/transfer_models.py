@@ -14,3 +14,58 @@ class Transfer(models.Model):
 
     # What is the transfer for?
     lesson_booking = models.ForeignKey('lessons.LessonBooking', on_delete=models.CASCADE, related_name="transfers", blank=False)
+
+    class Meta:
+        """
+        Ledger pages are read in date order
+        """
+        indexes = [
+            models.Index(fields=['date', 'id'], name='transfer_date_id_idx'),
+        ]
+
+class StudentAccount(models.Model):
+    """
+    Holds the running totals of a student's ledger so balances don't have to be recomputed from every transaction
+    Kept up to date by the signals in lessons.signals whenever a transfer or lesson booking changes
+    """
+
+    id = models.AutoField(primary_key=True)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_invoiced = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    # Whose account is this?
+    student_profile = models.OneToOneField('lessons.StudentProfile', on_delete=models.CASCADE, related_name="account", blank=False)
+
+    class Meta:
+        """
+        Students in arrears are found and ordered by their balance
+        """
+        indexes = [
+            models.Index(fields=['balance', 'id'], name='studentaccount_balance_idx'),
+        ]
+
+class TermClosingBalance(models.Model):
+    """
+    Holds the balance of a student's ledger at the end of a school term that has been closed
+    A row without a student holds the balance of the whole school and marks the term as closed
+    Kept up to date by the signals in lessons.signals when a transaction lands in a closed term
+    """
+
+    id = models.AutoField(primary_key=True)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    # Which term is this the closing balance of?
+    school_term = models.ForeignKey('lessons.SchoolTerm', on_delete=models.CASCADE, related_name="closing_balances", blank=False)
+
+    # Whose balance is this? Empty for the whole school
+    student_profile = models.ForeignKey('lessons.StudentProfile', on_delete=models.CASCADE, related_name="term_closing_balances", blank=True, null=True)
+
+    class Meta:
+        """
+        A term has at most one closing balance per student and one for the school
+        """
+        constraints = [
+            models.UniqueConstraint(fields=['school_term', 'student_profile'], name='term_closing_balance_student_unique'),
+            models.UniqueConstraint(fields=['school_term'], condition=models.Q(student_profile__isnull=True), name='term_closing_balance_school_unique'),
+        ]
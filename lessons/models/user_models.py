@@ -4,7 +4,7 @@ from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator, MaxLengthValidator
 from lessons.models import *
 from datetime import timedelta, time, datetime
-from lessons.helpers import TimeHelper
+from lessons.helpers import TimeHelper, LessonOccurrenceHelper
 
 """
 Note on 'backward' properties
@@ -102,6 +102,15 @@ class StudentProfile(models.Model):
         """
         return self.children.all().count() != 0
 
+class StudentTypeaheadVersion(models.Model):
+    """
+    Counts the changes to students and their names and emails, so every process can tell when its typeahead index is out of date
+    There is a single row, written in the same transaction as the change it counts, so changes that are rolled back aren't counted
+    """
+
+    id = models.AutoField(primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
 class AdminProfile(models.Model):
     """
     Represents an admin with much wider privileges and the ability to book lessons.
@@ -154,4 +163,33 @@ class TeacherProfile(models.Model):
             if self.overlaps(start_date, end_date, lesson_booking.start_date_actual(), lesson_booking.end_date_actual()) and lesson_booking.regular_day == day and time_conflict:
                 return False
             
-        return True
\ No newline at end of file
+        return True
+
+    def clashing_bookings(self, start_date, end_date, day, start_time, end_time, interval, quantity, exclude_lesson_booking_id=None, school_term_id=None):
+        """
+        Returns the teacher's bookings that have a lesson in the same week and at the same time as a new booking
+        If the term is given and the teacher's timetable for it has nothing at that time, the bookings aren't looked at
+        Otherwise candidates on the weekday, between the times and dates, are found with a single query bounded by the teacher, weekday and start time index,
+        so it doesn't grow with the teacher's history. Those on different intervals that never meet, such as alternating fortnights, are then left out
+        Bookings without their own dates use those of their term
+        """
+        from django.db.models.functions import Coalesce
+        from lessons.models import LessonBooking, TeacherTimetable
+
+        if school_term_id is not None:
+            timetable = TeacherTimetable.objects.filter(teacher_id=self.id, school_term_id=school_term_id).first()
+            if timetable is not None and timetable.is_free(day, start_time, end_time):
+                return []
+
+        lesson_bookings = (self.lesson_bookings
+            .annotate(start_date_or_term=Coalesce('start_date', 'school_term__start_date'), end_date_or_term=Coalesce('end_date', 'school_term__end_date'))
+            .filter(LessonBooking.clashing_times(start_time, end_time), regular_day=day, start_date_or_term__lte=end_date, end_date_or_term__gte=start_date)
+            .select_related('school_term', 'lesson_request')
+            .order_by('regular_start_time', 'id'))
+        if exclude_lesson_booking_id is not None:
+            lesson_bookings = lesson_bookings.exclude(id=exclude_lesson_booking_id)
+
+        helper = LessonOccurrenceHelper()
+        origin_week = helper.week_of(start_date)
+        bits = helper.week_bits(start_date, end_date, day, interval, quantity, origin_week)
+        return [lesson_booking for lesson_booking in lesson_bookings if lesson_booking.week_bits(origin_week) & bits]
\ No newline at end of file
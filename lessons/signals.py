@@ -0,0 +1,196 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils import timezone
+from datetime import date, datetime
+from lessons.models import User, StudentProfile, TeacherProfile, StudentAccount, Transfer, LessonBooking, LessonRequest, SchoolTerm, TermClosingBalance
+from lessons.helpers import StudentAccountHelper, TermClosingBalanceHelper, TeacherTimetableHelper, LessonOccurrenceHelper, StudentSearchHelper, StudentTypeaheadIndex
+
+"""
+Signal receivers that keep denormalised data in step with the models it is derived from
+Docs on signals: https://docs.djangoproject.com/en/4.1/topics/signals/
+"""
+
+@receiver(post_save, sender=StudentProfile)
+def create_student_account(sender, instance, created, **kwargs):
+    """
+    Every student profile is given an empty account when it is created
+    """
+    if created and not kwargs.get('raw'):
+        StudentAccount.objects.get_or_create(student_profile=instance)
+
+@receiver(post_save, sender=Transfer)
+@receiver(post_delete, sender=Transfer)
+def refresh_account_for_transfer(sender, instance, **kwargs):
+    """
+    Recompute the paying student's account when a transfer is made, changed or removed
+    """
+    if kwargs.get('raw'):
+        return
+
+    student_profile_id = LessonRequest.objects.filter(lesson_booking__id=instance.lesson_booking_id).values_list('student_profile_id', flat=True).first()
+    if student_profile_id:
+        StudentAccountHelper().refresh(student_profile_id)
+        _refresh_closing_balances(student_profile_id, _earliest_ledger_date(instance, instance.date))
+
+@receiver(post_save, sender=LessonBooking)
+@receiver(post_delete, sender=LessonBooking)
+def refresh_account_for_lesson_booking(sender, instance, **kwargs):
+    """
+    Recompute the invoiced student's account when a lesson booking is made, changed or removed
+    """
+    if kwargs.get('raw'):
+        return
+
+    student_profile_id = LessonRequest.objects.filter(id=instance.lesson_request_id).values_list('student_profile_id', flat=True).first()
+    if student_profile_id:
+        StudentAccountHelper().refresh(student_profile_id)
+        _refresh_closing_balances(student_profile_id, _earliest_ledger_date(instance, instance.ledger_date or date.min))
+
+@receiver(pre_save, sender=Transfer)
+def remember_transfer_date(sender, instance, **kwargs):
+    """
+    Keep the date a transfer had before it is changed, as moving it out of a closed term also affects that term
+    """
+    if instance.pk and not kwargs.get('raw'):
+        instance._ledger_date_before_save = Transfer.objects.filter(pk=instance.pk).values_list('date', flat=True).first()
+
+@receiver(pre_save, sender=LessonBooking)
+def remember_lesson_booking_date(sender, instance, **kwargs):
+    """
+    Keep the date a lesson booking was invoiced on before it is changed, as moving it out of a closed term also affects that term,
+    and the teacher, term and day it was on, whose availability also changes
+    """
+    if instance.pk and not kwargs.get('raw'):
+        before = LessonBooking.objects.filter(pk=instance.pk).values_list('ledger_date', 'teacher_id', 'school_term_id', 'regular_day').first()
+        if before:
+            (instance._ledger_date_before_save, instance._teacher_id_before_save,
+                instance._school_term_id_before_save, instance._regular_day_before_save) = before
+
+@receiver(post_save, sender=LessonBooking)
+@receiver(post_delete, sender=LessonBooking)
+def refresh_teacher_timetable(sender, instance, **kwargs):
+    """
+    Recompute the day of the teacher's timetable the booking is on, and the day it was on before if it was moved
+    """
+    if kwargs.get('raw'):
+        return
+
+    helper = TeacherTimetableHelper()
+    helper.rebuild(instance.teacher_id, instance.school_term_id, [instance.regular_day])
+
+    before = (getattr(instance, '_teacher_id_before_save', None), getattr(instance, '_school_term_id_before_save', None), getattr(instance, '_regular_day_before_save', None))
+    if before[0] is not None and before != (instance.teacher_id, instance.school_term_id, instance.regular_day):
+        helper.rebuild(before[0], before[1], [before[2]])
+
+@receiver(post_save, sender=TeacherProfile)
+@receiver(post_save, sender=SchoolTerm)
+def create_teacher_timetables(sender, instance, created, **kwargs):
+    """
+    Give a new teacher a timetable for every term, and a new term one for every teacher, so that checking availability never has to make them
+    """
+    if not created or kwargs.get('raw'):
+        return
+
+    if sender is TeacherProfile:
+        TeacherTimetableHelper().create_timetables(teacher_id=instance.id)
+    else:
+        TeacherTimetableHelper().create_timetables(school_term_id=instance.id)
+
+@receiver(post_save, sender=LessonBooking)
+def regenerate_lesson_occurrences(sender, instance, **kwargs):
+    """
+    Replace the stored lessons of a booking when it is made or changed; they are deleted along with it
+    """
+    if not kwargs.get('raw'):
+        LessonOccurrenceHelper().regenerate([instance.id])
+
+@receiver(pre_save, sender=SchoolTerm)
+def reopen_terms_for_school_term(sender, instance, **kwargs):
+    """
+    Changing the dates of a term moves transactions between terms, so closed terms from the earliest affected date are reopened
+    They are closed again the next time close_school_terms is run
+    """
+    instance._dates_changed = False
+    if not instance.pk or kwargs.get('raw'):
+        return
+
+    before = SchoolTerm.objects.filter(pk=instance.pk).values_list('start_date', 'end_date').first()
+    if before and before != (instance.start_date, instance.end_date):
+        instance._dates_changed = True
+        TermClosingBalance.objects.filter(school_term__end_date__gte=min(before[0], instance.start_date)).delete()
+
+@receiver(post_save, sender=SchoolTerm)
+def touch_lesson_bookings_for_school_term(sender, instance, **kwargs):
+    """
+    Bookings without their own dates take them from their term, so they are marked as changed when the term's dates are,
+    and their ledger dates and lessons are worked out again
+    """
+    if getattr(instance, '_dates_changed', False):
+        LessonBooking.objects.filter(school_term=instance).update(updated_at=timezone.now())
+        LessonBooking.objects.filter(school_term=instance, start_date__isnull=True).update(ledger_date=instance.start_date)
+        LessonOccurrenceHelper().regenerate(LessonBooking.objects.filter(Q(start_date__isnull=True) | Q(end_date__isnull=True), school_term=instance).values_list('id', flat=True))
+
+@receiver(post_save, sender=User)
+def index_user_for_search(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the search index in step with a user's name and email, skipping saves that change neither, such as logging in
+    """
+    if kwargs.get('raw'):
+        return
+    if update_fields is not None and not set(update_fields) & {'first_name', 'last_name', 'email'}:
+        return
+    StudentSearchHelper().index(instance)
+
+@receiver(post_save, sender=User)
+def refresh_student_typeahead_for_user(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the typeahead index in step with a student's name and email
+    """
+    if kwargs.get('raw'):
+        return
+    if update_fields is not None and not set(update_fields) & {'first_name', 'last_name', 'email'}:
+        return
+    StudentTypeaheadIndex.user_changed(instance)
+
+@receiver(post_save, sender=StudentProfile)
+def add_student_to_typeahead(sender, instance, created, **kwargs):
+    """
+    Students can be looked up as soon as their profile is made
+    """
+    if created and not kwargs.get('raw'):
+        StudentTypeaheadIndex.student_changed(instance.id, instance.user)
+
+@receiver(post_delete, sender=StudentProfile)
+def remove_student_from_typeahead(sender, instance, **kwargs):
+    """
+    Drop a deleted student from the typeahead index
+    """
+    StudentTypeaheadIndex.student_removed(instance.id)
+
+@receiver(post_delete, sender=User)
+def remove_user_from_search(sender, instance, **kwargs):
+    """
+    Drop a deleted user from the search index
+    """
+    StudentSearchHelper().remove(instance.id)
+
+def _refresh_closing_balances(student_profile_id, from_date):
+    """
+    Recompute the closed term snapshots a change to a student's ledger affects, once the change is committed
+    Waiting for the commit means cascading deletes have finished before the snapshots are rewritten
+    """
+    transaction.on_commit(lambda: TermClosingBalanceHelper().refresh(student_profile_id, from_date))
+
+def _earliest_ledger_date(instance, ledger_date):
+    """
+    Returns the earliest date a transaction has been on the ledger at, before or after its latest change
+    """
+    if isinstance(ledger_date, datetime):
+        ledger_date = ledger_date.date()
+
+    before = getattr(instance, '_ledger_date_before_save', None)
+    if before is not None and before < ledger_date:
+        return before
+    return ledger_date
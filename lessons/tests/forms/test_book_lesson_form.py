@@ -121,6 +121,34 @@ class RequestLessonFormTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermH
         form = BookLessonForm(self.admin_user, self.lesson_request, data=self.form_input)
         self.assertFalse(form.is_valid())
 
+    def test_teacher_can_not_be_double_booked(self):
+        self._assign_lesson_request_to_user(self.student_user)
+        other_lesson_request = self.student_user.student_profile.lesson_requests.last()
+        self._assign_lesson_booking_to_lesson_request(other_lesson_request)
+        lesson_booking = LessonBooking.objects.get(lesson_request=other_lesson_request)
+
+        form = BookLessonForm(self.admin_user, self.lesson_request, data=self.form_input)
+        self.assertFalse(form.is_valid())
+        self.assertIn(lesson_booking.invoice_number(), form.errors['teacher'][0])
+
+    def test_teacher_can_teach_alternate_fortnights(self):
+        self._assign_lesson_request_to_user(self.student_user)
+        other_lesson_request = self.student_user.student_profile.lesson_requests.last()
+        self._assign_lesson_booking_to_lesson_request(other_lesson_request)
+        lesson_booking = LessonBooking.objects.get(lesson_request=other_lesson_request)
+        lesson_booking.interval = 2
+        lesson_booking.save()
+
+        first_lesson = lesson_booking.occurrence_dates()[0]
+        self.form_input['start_date'] = (first_lesson + timedelta(days=7)).strftime("%Y-%m-%d")
+        self.form_input['interval'] = '2'
+        form = BookLessonForm(self.admin_user, self.lesson_request, data=self.form_input)
+        self.assertNotIn('teacher', form.errors)
+
+        self.form_input['start_date'] = first_lesson.strftime("%Y-%m-%d")
+        form = BookLessonForm(self.admin_user, self.lesson_request, data=self.form_input)
+        self.assertIn(lesson_booking.invoice_number(), form.errors['teacher'][0])
+
     def test_form_must_save_correctly(self):
         form = BookLessonForm(self.admin_user, self.lesson_request, data=self.form_input)
 
@@ -0,0 +1,58 @@
+from django.test import TestCase
+from lessons.forms.lesson_forms import *
+from lessons.tests.helpers import *
+from django import forms
+
+class FilterLessonBookingsFormTestCase(TestCase, LoginHelper, SchoolTermHelper):
+    """
+    Contains the test cases for the lesson booking filters
+    """
+
+    def setUp(self):
+        """
+        Simulate the form input
+        """
+        self._create_teacher_user()
+        self._create_school_term()
+        self.form_input = {
+            'school_term': self.school_term.id,
+            'teacher': self.teacher_user.teacher_profile.id,
+            'regular_day': 'MONDAY',
+            'from_date': '2022-01-01',
+            'until_date': '2022-01-30',
+            'sort': 'newest',
+        }
+
+    def test_valid_form(self):
+        form = FilterLessonBookingsForm(data=self.form_input)
+        self.assertTrue(form.is_valid())
+
+    def test_empty_form_is_valid(self):
+        form = FilterLessonBookingsForm(data={})
+        self.assertTrue(form.is_valid())
+        self.assertIsNone(form.cleaned_data['teacher'])
+
+    def test_form_has_necessary_fields(self):
+        form = FilterLessonBookingsForm()
+        self.assertTrue(isinstance(form.fields['school_term'], forms.ModelChoiceField))
+        self.assertTrue(isinstance(form.fields['teacher'], forms.ModelChoiceField))
+        self.assertTrue(isinstance(form.fields['from_date'], forms.DateField))
+        self.assertTrue(isinstance(form.fields['until_date'], forms.DateField))
+        self.assertIn('regular_day', form.fields)
+        self.assertEqual([choice[0] for choice in form.fields['sort'].choices], list(LessonSearchHelper.LESSON_BOOKING_SORTS))
+
+    def test_teacher_filter_can_be_hidden(self):
+        form = FilterLessonBookingsForm(data=self.form_input, show_teacher=False)
+        self.assertNotIn('teacher', form.fields)
+        self.assertTrue(form.is_valid())
+
+    def test_date_range_cannot_end_before_it_starts(self):
+        self.form_input['until_date'] = '2021-12-31'
+        form = FilterLessonBookingsForm(data=self.form_input)
+        self.assertFalse(form.is_valid())
+        self.assertIn('until_date', form.errors)
+
+    def test_unknown_sort_is_invalid(self):
+        self.form_input['sort'] = 'by_price'
+        form = FilterLessonBookingsForm(data=self.form_input)
+        self.assertFalse(form.is_valid())
@@ -86,3 +86,22 @@ class RegisterTransferFormTestCase(TestCase, LoginHelper, LessonHelper, SchoolTe
         self.assertEqual(transfer.date.strftime("%Y-%m-%d"), '2022-01-01')
         self.assertEqual(transfer.balance, 250)
         self.assertEqual(transfer.lesson_booking.id, self.lesson_booking.id)
+
+    def test_invoice_ref_matched_past_booking_id_999(self):
+        lesson_booking = LessonBooking.objects.get(id=self.lesson_booking.id)
+        self.lesson_booking.delete()
+
+        # Re-create the booking with a large id
+        lesson_booking.id = 123456
+        lesson_booking.invoice_reference = None
+        lesson_booking.save()
+
+        self.form_input['invoice_ref_no'] = lesson_booking.invoice_number()
+        form = RegisterTransferForm(data=self.form_input)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['invoice_ref_no'].id, 123456)
+
+    def test_invoice_ref_lookup_is_a_single_query(self):
+        form = RegisterTransferForm(data=self.form_input)
+        with self.assertNumQueries(1):
+            form.is_valid()
@@ -0,0 +1,21 @@
+from django.test import TestCase
+from django.core.management import call_command
+from io import StringIO
+from contextlib import redirect_stdout
+from lessons.models import User, LessonBooking, Transfer
+
+class BenchmarkLedgerCommandTestCase(TestCase):
+    """
+    Contains the test cases for the ledger benchmark
+    """
+
+    def test_benchmark_times_every_size_and_leaves_nothing_behind(self):
+        output = StringIO()
+        with redirect_stdout(output):
+            call_command('benchmark_ledger', '--sizes', '40', '20')
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:3]], ['40', '80'])
+        self.assertEqual(User.objects.count(), 0)
+        self.assertEqual(LessonBooking.objects.count(), 0)
+        self.assertEqual(Transfer.objects.count(), 0)
@@ -0,0 +1,70 @@
+from django.test import TestCase
+from datetime import timedelta, date, time
+from lessons.helpers import *
+from lessons.tests.helpers import *
+import random
+
+class FreeSlotHelperTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for finding free slots for a lesson request
+    """
+
+    def setUp(self):
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_secondary_teacher_user()
+        self._create_school_term()
+        self.school_term.refresh_from_db()
+        self._assign_lesson_request_to_user(self.student_user)
+        self.lesson_request = self.student_user.student_profile.lesson_requests.first()
+
+    def _book_random_lessons(self, count):
+        """
+        Books random lessons with both teachers, for other students' requests
+        """
+        teachers = [self.teacher_user.teacher_profile, self.teacher_user_2.teacher_profile]
+        for _ in range(count):
+            lesson_request = LessonRequest.objects.create(interval=1, quantity=4, duration=60, availability='MONDAY', student_profile=self.student_user.student_profile)
+            start_date = self.school_term.start_date + timedelta(days=random.randint(0, 60))
+            LessonBooking.objects.create(school_term=self.school_term, start_date=start_date, end_date=start_date + timedelta(days=random.randint(7, 30)),
+                regular_start_time=time(hour=random.randint(8, 19), minute=random.choice([0, 10, 15, 30, 45])), regular_day=random.choice(['MONDAY', 'TUESDAY']),
+                duration=random.choice([15, 30, 45, 60]), interval=random.choice([1, 2]), quantity=random.randint(1, 5),
+                teacher=random.choice(teachers), admin_profile=self.admin_user.admin_profile, lesson_request=lesson_request)
+
+    """
+    Test cases
+    """
+
+    def test_free_slots_agree_with_clashing_bookings(self):
+        random.seed(14)
+        self._book_random_lessons(40)
+        self.lesson_request.interval = 2
+        self.lesson_request.duration = 45
+        self.lesson_request.save()
+
+        start_date = max(self.school_term.start_date, date.today())
+        slots = {(slot['teacher'].id, slot['day'], slot['start_time']) for slot in FreeSlotHelper().free_slots(self.lesson_request, self.school_term)}
+
+        for teacher in TeacherProfile.objects.all():
+            for day in ['MONDAY', 'TUESDAY']:
+                for start in range(FreeSlotHelper.DAY_START, FreeSlotHelper.DAY_END - 45 + 1, FreeSlotHelper.SLOT_MINUTES):
+                    start_time = time(hour=start // 60, minute=start % 60)
+                    available = not teacher.clashing_bookings(start_date, self.school_term.end_date, day, start_time, TimeHelper().add_minutes_to_time(start_time, 45),
+                        2, self.lesson_request.quantity)
+                    self.assertEqual((teacher.id, day, start_time) in slots, available)
+
+    def test_query_count_does_not_grow_with_teachers(self):
+        self._book_random_lessons(10)
+        FreeSlotHelper().free_slots(self.lesson_request, self.school_term)
+        with self.assertNumQueries(3):
+            FreeSlotHelper().free_slots(self.lesson_request, self.school_term)
+
+    def test_bookings_are_not_read_for_teachers_with_free_days(self):
+        FreeSlotHelper().free_slots(self.lesson_request, self.school_term)
+        with self.assertNumQueries(2):
+            slots = FreeSlotHelper().free_slots(self.lesson_request, self.school_term)
+        self.assertTrue(slots)
+
+    def test_no_slots_after_the_term_has_ended(self):
+        self.assertEqual(FreeSlotHelper().free_slots(self.lesson_request, self.school_term, today=self.school_term.end_date + timedelta(days=1)), [])
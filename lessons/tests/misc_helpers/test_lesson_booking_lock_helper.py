@@ -0,0 +1,123 @@
+from django.test import TestCase, TransactionTestCase
+from django.core.exceptions import ValidationError
+from django.db import connection
+from datetime import time
+from lessons.helpers import *
+from lessons.tests.helpers import *
+from lessons.models import LessonOccurrence
+import threading
+
+class LessonBookingLockHelperTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for saving bookings with their teacher locked
+    """
+
+    def setUp(self):
+        """
+        One teacher who already teaches on Mondays at 8:00, and an unfulfilled Monday request
+        """
+        self._create_student_user()
+        self._create_secondary_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_school_term()
+        self.school_term.refresh_from_db()
+
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self.lesson_booking = LessonBooking.objects.get()
+        self.lesson_booking.regular_start_time = time(hour=8)
+        self.lesson_booking.save()
+
+        self.lesson_request = LessonRequest.objects.create(interval=1, quantity=2, duration=60, availability='MONDAY', student_profile=self.student_user_2.student_profile)
+
+    def _new_lesson_booking(self, start_time):
+        return LessonBooking(lesson_request=self.lesson_request, teacher=self.teacher_user.teacher_profile, school_term=self.school_term,
+            start_date=self.lesson_booking.start_date, end_date=self.lesson_booking.end_date, regular_day='MONDAY',
+            regular_start_time=start_time, interval=1, quantity=2, duration=60)
+
+    """
+    Test cases
+    """
+
+    def test_booking_without_clash_is_saved(self):
+        lesson_booking = LessonBookingLockHelper().save(self._new_lesson_booking(time(hour=10)))
+        self.assertIsNotNone(lesson_booking.id)
+        self.assertEqual(LessonBooking.objects.count(), 2)
+
+    def test_clashing_booking_is_not_saved(self):
+        with self.assertRaises(ValidationError) as context:
+            LessonBookingLockHelper().save(self._new_lesson_booking(time(hour=8, minute=30)))
+        self.assertIn('already teach', context.exception.messages[0])
+        self.assertIn(self.lesson_booking.invoice_reference, context.exception.messages[0])
+        self.assertEqual(LessonBooking.objects.count(), 1)
+
+    def test_booking_does_not_clash_with_itself(self):
+        self.lesson_booking.regular_start_time = time(hour=8, minute=30)
+        LessonBookingLockHelper().save(self.lesson_booking)
+        self.lesson_booking.refresh_from_db()
+        self.assertEqual(self.lesson_booking.regular_start_time, time(hour=8, minute=30))
+
+    def test_lock_teachers_keeps_teachers_unchanged(self):
+        with LessonBookingLockHelper().lock_teachers([self.teacher_user.teacher_profile.id]):
+            pass
+        self.assertEqual(TeacherProfile.objects.get().id, self.teacher_user.teacher_profile.id)
+
+    def test_lock_teachers_rolls_back_the_body_on_error(self):
+        with self.assertRaises(ValidationError):
+            with LessonBookingLockHelper().lock_teachers([self.teacher_user.teacher_profile.id]):
+                self._new_lesson_booking(time(hour=10)).save()
+                raise ValidationError('Clash found')
+        self.assertEqual(LessonBooking.objects.count(), 1)
+
+class LessonBookingLockHelperConcurrencyTestCase(TransactionTestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Several admins booking the same teacher at the same time
+    """
+
+    THREADS = 8
+
+    def setUp(self):
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_school_term()
+        self.school_term.refresh_from_db()
+
+        self.lesson_requests = [LessonRequest.objects.create(interval=1, quantity=2, duration=60, availability='MONDAY',
+            student_profile=self.student_user.student_profile) for _ in range(self.THREADS)]
+
+    def _book(self, lesson_request, barrier, results):
+        try:
+            lesson_booking = LessonBooking(lesson_request=lesson_request, teacher_id=self.teacher_user.teacher_profile.id, school_term_id=self.school_term.id,
+                start_date=self.school_term.start_date, end_date=self.school_term.end_date, regular_day='MONDAY',
+                regular_start_time=time(hour=9), interval=1, quantity=2, duration=60)
+            barrier.wait()
+            try:
+                LessonBookingLockHelper().save(lesson_booking)
+                results.append(True)
+            except ValidationError as error:
+                results.append(error.messages[0])
+        finally:
+            connection.close()
+
+    """
+    Test cases
+    """
+
+    def test_only_one_of_many_simultaneous_bookings_of_a_slot_is_saved(self):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+        threads = [threading.Thread(target=self._book, args=(lesson_request, barrier, results)) for lesson_request in self.lesson_requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.THREADS)
+        self.assertEqual(results.count(True), 1)
+        for result in results:
+            if result is not True:
+                self.assertTrue('already teach' in result or result == LessonBookingLockHelper.BUSY_MESSAGE)
+        self.assertEqual(LessonBooking.objects.count(), 1)
+        self.assertEqual(LessonOccurrence.objects.count(), 2)
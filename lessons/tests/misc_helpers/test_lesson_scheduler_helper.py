@@ -0,0 +1,186 @@
+from django.test import TestCase, TransactionTestCase
+from django.core.exceptions import ValidationError
+from django.db import connection
+from datetime import timedelta, date, time
+from decimal import Decimal
+from lessons.helpers import *
+from lessons.tests.helpers import *
+from lessons.models import StudentAccount
+from unittest.mock import patch
+import random
+import threading
+
+class LessonSchedulerHelperTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for booking every unfulfilled lesson request at once
+    """
+
+    def setUp(self):
+        """
+        Two teachers, one of whom already teaches on Mondays at 8:00, and two unfulfilled Monday requests
+        """
+        self._create_student_user()
+        self._create_secondary_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_secondary_teacher_user()
+        self._create_school_term()
+        self.school_term.refresh_from_db()
+
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self.lesson_booking = LessonBooking.objects.get()
+        self.lesson_booking.regular_start_time = time(hour=8)
+        self.lesson_booking.save()
+
+        self.lesson_requests = [
+            LessonRequest.objects.create(interval=1, quantity=2, duration=60, availability='MONDAY', student_profile=self.student_user.student_profile),
+            LessonRequest.objects.create(interval=1, quantity=2, duration=60, availability='MONDAY', student_profile=self.student_user_2.student_profile),
+        ]
+        self.today = self.school_term.start_date
+
+    """
+    Test cases
+    """
+
+    def test_every_request_is_planned_without_clashes(self):
+        plan = LessonSchedulerHelper().plan(self.school_term, today=self.today)
+        self.assertEqual(plan.unscheduled, [])
+        self.assertEqual({lesson_booking.lesson_request for lesson_booking in plan.lesson_bookings}, set(self.lesson_requests))
+
+        for lesson_booking in plan.lesson_bookings:
+            self.assertEqual(lesson_booking.regular_day, 'MONDAY')
+            self.assertEqual(lesson_booking.clashing_bookings(), [])
+
+    def test_load_is_balanced_across_teachers(self):
+        plan = LessonSchedulerHelper().plan(self.school_term, today=self.today)
+        teachers = [lesson_booking.teacher for lesson_booking in plan.lesson_bookings]
+        # The second teacher has no lessons yet so is given the first request, then both have the same load
+        self.assertEqual(set(teachers), {self.teacher_user.teacher_profile, self.teacher_user_2.teacher_profile})
+
+    def test_planned_lessons_do_not_clash_with_each_other(self):
+        random.seed(15)
+        for _ in range(60):
+            LessonRequest.objects.create(interval=random.choice([1, 2]), quantity=random.randint(1, 8), duration=random.choice([15, 30, 45, 60]),
+                availability=','.join(random.sample(['MONDAY', 'TUESDAY', 'WEDNESDAY'], random.randint(1, 2))), student_profile=self.student_user_2.student_profile)
+
+        plan = LessonSchedulerHelper().schedule(self.school_term, self.admin_user.admin_profile, today=self.today)
+        self.assertEqual(len(plan.lesson_bookings) + len(plan.unscheduled), 62)
+
+        for lesson_booking in LessonBooking.objects.all():
+            self.assertEqual(lesson_booking.clashing_bookings(), [])
+
+    def test_quantity_is_limited_to_the_lessons_left_in_term(self):
+        self.lesson_requests[0].quantity = 25
+        self.lesson_requests[0].save()
+        plan = LessonSchedulerHelper().plan(self.school_term, today=self.today)
+
+        lesson_booking = next(lesson_booking for lesson_booking in plan.lesson_bookings if lesson_booking.lesson_request == self.lesson_requests[0])
+        self.assertEqual(lesson_booking.quantity, len(lesson_booking.occurrence_dates()))
+        self.assertLessEqual(lesson_booking.quantity, self.school_term.max_amount_of_lessons(1, lesson_booking.start_date))
+        self.assertEqual(plan.shortfalls, [lesson_booking])
+
+    def test_bookings_with_every_requested_lesson_are_not_shortfalls(self):
+        plan = LessonSchedulerHelper().plan(self.school_term, today=self.today)
+        self.assertEqual(plan.shortfalls, [])
+
+    def test_dry_run_books_nothing(self):
+        before_count = LessonBooking.objects.count()
+        plan = LessonSchedulerHelper().schedule(self.school_term, self.admin_user.admin_profile, dry_run=True, today=self.today)
+        self.assertEqual(len(plan.lesson_bookings), 2)
+        self.assertEqual(LessonBooking.objects.count(), before_count)
+
+    def test_schedule_books_and_invoices_the_plan(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            LessonSchedulerHelper().schedule(self.school_term, self.admin_user.admin_profile, today=self.today)
+
+        self.assertEqual(LessonBooking.objects.count(), 3)
+        for lesson_booking in LessonBooking.objects.filter(lesson_request__in=self.lesson_requests):
+            self.assertEqual(lesson_booking.invoice_reference, lesson_booking.invoice_number())
+            self.assertEqual(lesson_booking.admin_profile, self.admin_user.admin_profile)
+            self.assertEqual(lesson_booking.ledger_date, lesson_booking.start_date)
+            self.assertEqual(list(lesson_booking.occurrences.order_by('date').values_list('date', flat=True)), lesson_booking.occurrence_dates())
+
+        self.assertEqual(StudentAccount.objects.get(student_profile=self.student_user_2.student_profile).balance, Decimal('-10.00'))
+        self.assertEqual(StudentAccount.objects.get(student_profile=self.student_user.student_profile).balance, Decimal('-20.00'))
+
+    def test_nothing_is_planned_after_the_term_has_ended(self):
+        plan = LessonSchedulerHelper().plan(self.school_term, today=self.school_term.end_date + timedelta(days=1))
+        self.assertEqual(plan.lesson_bookings, [])
+        self.assertEqual(len(plan.unscheduled), 2)
+
+class LessonSchedulerHelperConcurrencyTestCase(TransactionTestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    An admin booking a lesson through the form while the scheduler is booking the term
+    """
+
+    def setUp(self):
+        """
+        One teacher, and two unfulfilled Monday requests: one for the scheduler and one for the form
+        """
+        self._create_student_user()
+        self._create_secondary_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_school_term()
+        self.school_term.refresh_from_db()
+
+        self.scheduled_request = LessonRequest.objects.create(interval=1, quantity=2, duration=60, availability='MONDAY', student_profile=self.student_user.student_profile)
+        self.form_request = LessonRequest.objects.create(interval=1, quantity=2, duration=60, availability='MONDAY', student_profile=self.student_user_2.student_profile)
+        self.results = []
+
+    def _book(self, lesson_booking):
+        try:
+            try:
+                LessonBookingLockHelper().save(lesson_booking)
+                self.results.append(True)
+            except ValidationError as error:
+                self.results.append(error.messages[0])
+        finally:
+            connection.close()
+
+    def _plan_then_book_the_same_slot(self, helper, school_term, today=None):
+        """
+        Plans as usual, then has another admin book the first planned slot before the plan is committed
+        """
+        self.calls.append('plan')
+        plan = self.plan(helper, school_term, today)
+        planned = next(lesson_booking for lesson_booking in plan.lesson_bookings if lesson_booking.lesson_request_id == self.scheduled_request.id)
+        lesson_booking = LessonBooking(lesson_request_id=self.form_request.id, teacher_id=planned.teacher_id, school_term_id=school_term.id,
+            start_date=planned.start_date, end_date=planned.end_date, regular_day=planned.regular_day,
+            regular_start_time=planned.regular_start_time, interval=1, quantity=2, duration=60)
+        thread = threading.Thread(target=self._book, args=(lesson_booking,))
+        thread.start()
+        # Gives the other admin the chance to commit, which they only get if the teacher isn't locked
+        thread.join(timeout=1)
+        self.threads.append(thread)
+        # The form's request is planned as well, so it is taken out to leave only the clash being tested
+        plan.lesson_bookings = [lesson_booking for lesson_booking in plan.lesson_bookings if lesson_booking.lesson_request_id != self.form_request.id]
+        return plan
+
+    """
+    Test cases
+    """
+
+    def test_booking_made_while_planning_is_not_double_booked(self):
+        self.threads = []
+        self.calls = []
+        self.plan = LessonSchedulerHelper.plan
+        lock_teachers = LessonBookingLockHelper.lock_teachers
+
+        def record_lock(helper, teacher_ids):
+            self.calls.append('lock')
+            return lock_teachers(helper, teacher_ids)
+
+        with patch.object(LessonSchedulerHelper, 'plan', autospec=True, side_effect=self._plan_then_book_the_same_slot), \
+                patch.object(LessonBookingLockHelper, 'lock_teachers', autospec=True, side_effect=record_lock):
+            LessonSchedulerHelper().schedule(self.school_term, self.admin_user.admin_profile, today=self.school_term.start_date)
+        for thread in self.threads:
+            thread.join()
+
+        # The teachers are locked before the plan is worked out, not only before it is saved
+        self.assertEqual(self.calls[:2], ['lock', 'plan'])
+        self.assertEqual(len(self.results), 1)
+        self.assertNotEqual(self.results[0], True)
+        for lesson_booking in LessonBooking.objects.all():
+            self.assertEqual(lesson_booking.clashing_bookings(), [])
@@ -0,0 +1,100 @@
+from django.test import TestCase
+from datetime import timedelta
+from lessons.helpers import *
+from lessons.tests.helpers import *
+
+class LessonSearchHelperTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for searching lesson bookings and lesson requests by student in the database
+    """
+
+    def setUp(self):
+        """
+        Jane and John Doe have a request each, Jane's is booked with the first teacher and John's second request with the second teacher,
+        while John's first request is unfulfilled
+        """
+        self._create_student_user()
+        self._create_secondary_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_secondary_teacher_user()
+        self._create_school_term()
+
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_request_to_user(self.student_user_2)
+        self._assign_lesson_request_to_user(self.student_user_2)
+        self.jane_request, self.john_unfulfilled_request, self.john_request = LessonRequest.objects.order_by('id')
+        self._assign_lesson_booking_to_lesson_request(self.jane_request)
+        self._assign_lesson_booking_to_lesson_request(self.john_request, custom_teacher=self.teacher_user_2)
+        self.helper = LessonSearchHelper()
+
+    """
+    Test cases
+    """
+
+    def test_lesson_bookings_match_full_name(self):
+        lesson_bookings = self.helper.lesson_bookings('  john DOE ')
+        self.assertEqual([lesson_booking.lesson_request for lesson_booking in lesson_bookings], [self.john_request])
+
+    def test_lesson_bookings_match_email(self):
+        lesson_bookings = self.helper.lesson_bookings('STUDENT@example')
+        self.assertEqual([lesson_booking.lesson_request for lesson_booking in lesson_bookings], [self.jane_request])
+
+    def test_lesson_bookings_without_search_returns_all(self):
+        self.assertEqual(self.helper.lesson_bookings().count(), 2)
+        self.assertEqual(self.helper.lesson_bookings('').count(), 2)
+
+    def test_lesson_bookings_can_be_limited_to_a_teacher(self):
+        self.assertEqual(self.helper.lesson_bookings('doe', teacher=self.teacher_user_2.teacher_profile).get().lesson_request, self.john_request)
+        self.assertEqual(self.helper.lesson_bookings('jane', teacher=self.teacher_user_2.teacher_profile).count(), 0)
+
+    def test_lesson_bookings_are_shown_in_one_query(self):
+        with self.assertNumQueries(1):
+            for lesson_booking in self.helper.lesson_bookings('doe'):
+                str(lesson_booking.teacher)
+                lesson_booking.lesson_request.student_profile.user.full_name()
+                lesson_booking.school_term.label
+
+    def test_lesson_requests_match_full_name_and_email(self):
+        self.assertEqual(set(self.helper.lesson_requests('john doe')), {self.john_request, self.john_unfulfilled_request})
+        self.assertEqual(list(self.helper.lesson_requests('student@')), [self.jane_request])
+        self.assertEqual(list(self.helper.lesson_requests('nobody')), [])
+
+    def test_lesson_requests_list_unfulfilled_first(self):
+        self.assertEqual(list(self.helper.lesson_requests()), [self.john_unfulfilled_request, self.jane_request, self.john_request])
+
+    def test_lesson_requests_are_shown_in_one_query(self):
+        with self.assertNumQueries(1):
+            for lesson_request in self.helper.lesson_requests('doe'):
+                lesson_request.status()
+                lesson_request.student_profile.user.full_name()
+
+    def test_lesson_bookings_filtered_by_teacher_term_and_day(self):
+        lesson_bookings = self.helper.lesson_bookings(filters={'teacher': self.teacher_user_2.teacher_profile, 'school_term': self.school_term, 'regular_day': 'MONDAY'})
+        self.assertEqual([lesson_booking.lesson_request for lesson_booking in lesson_bookings], [self.john_request])
+        self.assertEqual(self.helper.lesson_bookings(filters={'regular_day': 'TUESDAY'}).count(), 0)
+
+    def test_empty_filters_are_ignored(self):
+        self.assertEqual(self.helper.lesson_bookings(filters={'teacher': None, 'regular_day': '', 'from_date': None}).count(), 2)
+
+    def test_lesson_bookings_filtered_by_lessons_within_dates(self):
+        jane_booking = self.jane_request.lesson_booking
+        first_lesson = jane_booking.occurrence_dates()[0]
+        john_booking = self.john_request.lesson_booking
+        john_booking.start_date = first_lesson + timedelta(days=7)
+        john_booking.save()
+
+        lesson_bookings = self.helper.lesson_bookings(filters={'from_date': first_lesson, 'until_date': first_lesson})
+        self.assertEqual(list(lesson_bookings), [jane_booking])
+        lesson_bookings = self.helper.lesson_bookings(filters={'from_date': first_lesson + timedelta(days=1)})
+        self.assertEqual(set(lesson_bookings), {jane_booking, john_booking})
+        self.assertEqual(self.helper.lesson_bookings(filters={'until_date': first_lesson - timedelta(days=1)}).count(), 0)
+
+    def test_every_sort_ends_in_the_id(self):
+        for label, keyset in LessonSearchHelper.LESSON_BOOKING_SORTS.values():
+            self.assertEqual(keyset[-1].lstrip('-'), 'id')
+
+    def test_unknown_sort_uses_default(self):
+        self.assertEqual(self.helper.lesson_booking_keyset('nonsense'), ['id'])
+        self.assertEqual(self.helper.lesson_booking_keyset(None), ['id'])
+        self.assertEqual(self.helper.lesson_booking_keyset('newest'), ['-id'])
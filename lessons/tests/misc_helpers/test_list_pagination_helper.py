@@ -0,0 +1,100 @@
+from django.test import TestCase, RequestFactory
+from django.http import QueryDict
+from datetime import date, timedelta
+from unittest.mock import patch
+from lessons.helpers import *
+from lessons.tests.helpers import *
+from lessons.models import SchoolTerm
+
+class ListPaginationHelperTestCase(TestCase):
+    """
+    Contains the test cases for splitting list views into pages
+    """
+
+    def setUp(self):
+        """
+        Seven terms a week apart, created out of order, two of which start on the same day
+        """
+        self.helper = ListPaginationHelper()
+        self.factory = RequestFactory()
+        first = date(2022, 9, 5)
+        for number, offset in enumerate([3, 0, 5, 1, 6, 4, 4]):
+            start_date = first + timedelta(weeks=offset)
+            SchoolTerm.objects.create(label=f'Term {number}', start_date=start_date, end_date=start_date + timedelta(days=5))
+        self.terms = list(SchoolTerm.objects.order_by('start_date', 'id'))
+
+    def _pages(self, parameters, keyset):
+        """
+        Follows the next page links from the first page, returning the rows of each page
+        """
+        pages = []
+        query = parameters
+        while query is not None:
+            page = self.helper.paginate(self.factory.get('/terms/', QueryDict(query)), SchoolTerm.objects.all(), keyset)
+            pages.append(page.items)
+            query = page.next_query
+        return pages
+
+    """
+    Test cases
+    """
+
+    def test_keyset_pages_cover_every_row_once_in_order(self):
+        pages = self._pages('page_size=3', ['start_date', 'id'])
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.terms)
+
+    def test_descending_keyset_pages(self):
+        pages = self._pages('page_size=2', ['-start_date', '-id'])
+        self.assertEqual(sum(pages, []), list(reversed(self.terms)))
+
+    def test_numbered_pages_keep_queryset_order(self):
+        pages = self._pages('page_size=3', None)
+        self.assertEqual(sum(pages, []), list(SchoolTerm.objects.all()))
+
+    def test_first_page_has_no_first_page_link(self):
+        page = self.helper.paginate(self.factory.get('/terms/', {'page_size': 3}), SchoolTerm.objects.all(), ['id'])
+        self.assertIsNone(page.first_query)
+        self.assertIn('after=', page.next_query)
+
+    def test_later_pages_link_back_to_the_first_keeping_other_parameters(self):
+        first_page = self.helper.paginate(self.factory.get('/terms/', {'page_size': 3, 'search_term': 'term'}), SchoolTerm.objects.all(), ['id'])
+        page = self.helper.paginate(self.factory.get('/terms/?' + first_page.next_query), SchoolTerm.objects.all(), ['id'])
+        self.assertEqual(QueryDict(page.first_query), QueryDict('page_size=3&search_term=term'))
+
+    def test_last_page_has_no_next_page_link(self):
+        page = self.helper.paginate(self.factory.get('/terms/'), SchoolTerm.objects.all(), ['id'])
+        self.assertEqual(len(page.items), 7)
+        self.assertIsNone(page.next_query)
+
+    def test_page_size_is_limited(self):
+        self.assertEqual(self.helper.page_size(self.factory.get('/', {'page_size': 10000})), ListPaginationHelper.MAX_PAGE_SIZE)
+        self.assertEqual(self.helper.page_size(self.factory.get('/', {'page_size': 0})), ListPaginationHelper.DEFAULT_PAGE_SIZE)
+        self.assertEqual(self.helper.page_size(self.factory.get('/', {'page_size': 'all'})), ListPaginationHelper.DEFAULT_PAGE_SIZE)
+
+    def test_invalid_cursor_shows_first_page(self):
+        page = self.helper.paginate(self.factory.get('/terms/', {'after': 'not a cursor'}), SchoolTerm.objects.all(), ['id'])
+        self.assertEqual(page.items, list(SchoolTerm.objects.order_by('id')))
+        self.assertIsNone(page.first_query)
+
+    def test_cursor_round_trips_dates(self):
+        fields = self.helper._fields(SchoolTerm.objects.all(), ['start_date', '-id'])
+        cursor = self.helper.encode_cursor([date(2022, 9, 5), 3])
+        self.assertEqual(self.helper.decode_cursor(cursor, fields), [date(2022, 9, 5), 3])
+        self.assertIsNone(self.helper.decode_cursor(cursor, fields + fields[:1]))
+
+    def test_cursor_with_values_of_the_wrong_type_shows_first_page(self):
+        for values in [['notadate', 3], ['2022-09-05', 'x'], [None, 3], [[], {}]]:
+            request = self.factory.get('/terms/', {'after': self.helper.encode_cursor(values)})
+            page = self.helper.paginate(request, SchoolTerm.objects.all(), ['start_date', 'id'])
+            self.assertEqual(page.items, self.terms)
+            self.assertIsNone(page.first_query)
+
+    def test_page_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.helper.paginate(self.factory.get('/terms/', {'page_size': 3}), SchoolTerm.objects.all(), ['start_date', 'id'])
+
+    def test_count_stops_at_limit(self):
+        self.assertEqual(self.helper.count(SchoolTerm.objects.all()), 7)
+        with patch.object(ListPaginationHelper, 'COUNT_LIMIT', 5):
+            self.assertEqual(self.helper.count(SchoolTerm.objects.all()), 'more than 5')
@@ -0,0 +1,82 @@
+from django.test import TestCase
+from unittest.mock import patch
+from lessons.helpers import *
+from lessons.tests.helpers import *
+from lessons.models import User, StudentProfile
+
+class StudentSearchHelperTestCase(TestCase, LoginHelper):
+    """
+    Contains the test cases for searching students through the full-text index of users
+    """
+
+    def setUp(self):
+        self._create_student_user()
+        self._create_secondary_student_user()
+        self._create_child_user_for_student_user()
+        self._create_teacher_user()
+        self.helper = StudentSearchHelper()
+
+    def _search(self, search_term):
+        return [student_profile.user for student_profile in self.helper.search(search_term)]
+
+    """
+    Test cases
+    """
+
+    def test_index_is_available_on_sqlite(self):
+        self.assertTrue(self.helper.available())
+
+    def test_match_expression_makes_a_prefix_phrase_of_each_part(self):
+        self.assertEqual(self.helper.match_expression('Jane  student_2@exa'), '"jane"* "student 2 exa"*')
+
+    def test_match_expression_ignores_punctuation(self):
+        self.assertEqual(self.helper.match_expression('" * - ()'), '')
+        self.assertEqual(list(self.helper.search('" * - ()')), [])
+
+    def test_search_matches_word_prefixes(self):
+        self.assertEqual(self._search('ja'), [self.student_user])
+        self.assertEqual(set(self._search('do')), {self.student_user, self.student_user_2, self.student_user_child})
+
+    def test_search_matches_every_part(self):
+        self.assertEqual(self._search('john doe'), [self.student_user_2])
+        self.assertEqual(self._search('john smith'), [])
+
+    def test_search_matches_email(self):
+        self.assertEqual(self._search('student_2@example.com'), [self.student_user_2])
+        self.assertEqual(self._search('studentchild@'), [self.student_user_child])
+
+    def test_search_only_returns_students(self):
+        self.assertEqual(self._search(self.teacher_user.email), [])
+
+    def test_better_matches_are_ranked_first(self):
+        self.student_user_2.first_name = 'Doe'
+        self.student_user_2.save()
+        # Matches both of the names of the second student, but only the last name of the others
+        self.assertEqual(self._search('doe')[0], self.student_user_2)
+
+    def test_search_is_one_query(self):
+        with self.assertNumQueries(1):
+            list(self.helper.search('doe'))
+
+    def test_changing_a_user_updates_the_index(self):
+        self.student_user.first_name = 'Janet'
+        self.student_user.save()
+        self.assertEqual(self._search('janet'), [self.student_user])
+
+        self.student_user.last_name = 'Roe'
+        self.student_user.save(update_fields=['last_name'])
+        self.assertEqual(self._search('roe'), [self.student_user])
+
+    def test_deleting_a_user_removes_them_from_the_index(self):
+        self.student_user_2.delete()
+        self.assertEqual(self._search('john'), [])
+
+    def test_rebuild_indexes_every_user(self):
+        self.assertEqual(self.helper.rebuild(), User.objects.count())
+        self.assertEqual(self._search('john'), [self.student_user_2])
+
+    def test_search_without_index_matches_names_and_email(self):
+        with patch.object(StudentSearchHelper, 'available', return_value=False):
+            self.assertEqual(self._search('JOHN doe'), [self.student_user_2])
+            self.assertEqual(self._search('student_2@'), [self.student_user_2])
+            self.assertEqual(self._search('john smith'), [])
@@ -0,0 +1,104 @@
+from django.test import TestCase
+from django.db import transaction
+from lessons.helpers import *
+from lessons.tests.helpers import *
+from lessons.models import StudentTypeaheadVersion
+
+class StudentTypeaheadIndexTestCase(TestCase, LoginHelper):
+    """
+    Contains the test cases for looking up students by the start of their name or email
+    """
+
+    def setUp(self):
+        # Each test's changes are rolled back, so an index built by an earlier test can't be told apart by its version
+        StudentTypeaheadIndex._index = None
+        self._create_student_user()
+        self._create_secondary_student_user()
+        self._create_child_user_for_student_user()
+        self._create_teacher_user()
+
+    def _lookup(self, prefix, limit=StudentTypeaheadIndex.DEFAULT_LIMIT):
+        return [student[2] for student in StudentTypeaheadIndex.current().lookup(prefix, limit)]
+
+    """
+    Test cases
+    """
+
+    def test_keys_are_names_full_name_and_email(self):
+        self.assertEqual(StudentTypeaheadIndex.keys_for('Jane', 'Doe', 'Jane@Example.com'), ['doe', 'jane', 'jane doe', 'jane@example.com'])
+
+    def test_lookup_matches_prefix_of_any_key(self):
+        self.assertEqual(self._lookup('JA'), ['Jane Doe'])
+        self.assertEqual(self._lookup('jane d'), ['Jane Doe'])
+        self.assertEqual(self._lookup('student_2'), ['John Doe'])
+        self.assertEqual(set(self._lookup('doe')), {'Jane Doe', 'John Doe', 'Child Doe'})
+
+    def test_lookup_returns_each_student_once(self):
+        # Every student has an email starting with "student"
+        self.assertEqual(len(self._lookup('student')), 3)
+
+    def test_lookup_only_returns_students(self):
+        self.assertEqual(self._lookup(self.teacher_user.email), [])
+
+    def test_lookup_respects_limit(self):
+        self.assertEqual(len(self._lookup('doe', limit=2)), 2)
+
+    def test_empty_prefix_finds_nobody(self):
+        self.assertEqual(self._lookup('  '), [])
+
+    def test_lookup_after_index_is_built_only_reads_the_version(self):
+        StudentTypeaheadIndex.current()
+        with self.assertNumQueries(1):
+            self._lookup('jo')
+
+    def test_new_student_is_added(self):
+        StudentTypeaheadIndex.current()
+        self._create_secondary_teacher_user()
+        user = User.objects.create_user('zoe@example.com', first_name='Zoe', last_name='Zed', email='zoe@example.com', password='Password123', type=UserType.STUDENT)
+        with self.captureOnCommitCallbacks(execute=True):
+            StudentProfile.objects.create(user=user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self._lookup('zoe'), ['Zoe Zed'])
+
+    def test_renamed_student_is_updated(self):
+        StudentTypeaheadIndex.current()
+        self.student_user.first_name = 'Janet'
+        self.student_user.last_name = 'Roe'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student_user.save()
+        with self.assertNumQueries(2):
+            self.assertEqual(self._lookup('janet r'), ['Janet Roe'])
+            self.assertEqual(self._lookup('jane doe'), [])
+
+    def test_deleted_student_is_removed(self):
+        StudentTypeaheadIndex.current()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student_user_2.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(self._lookup('john'), [])
+
+    def test_rolled_back_change_is_not_applied(self):
+        index = StudentTypeaheadIndex.current()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.student_user.first_name = 'Janet'
+                    self.student_user.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertIs(StudentTypeaheadIndex.current(), index)
+        self.assertEqual(self._lookup('janet'), [])
+        self.assertEqual(self._lookup('jane'), ['Jane Doe'])
+
+    def test_renaming_someone_who_is_not_a_student_is_not_counted(self):
+        version = StudentTypeaheadIndex.current().version
+        self.teacher_user.first_name = 'Tina'
+        self.teacher_user.save()
+        self.assertEqual(StudentTypeaheadVersion.objects.get().version, version)
+
+    def test_index_is_rebuilt_when_another_process_changes_a_student(self):
+        index = StudentTypeaheadIndex.current()
+        StudentTypeaheadVersion.objects.update(version=index.version + 1)
+        self.assertIsNot(StudentTypeaheadIndex.current(), index)
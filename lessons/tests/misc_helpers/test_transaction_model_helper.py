@@ -1,6 +1,7 @@
 from django.test import TestCase
 from datetime import datetime, timedelta
 from django.db import transaction
+from django.core import signing
 from django.contrib import messages
 from lessons.view_models import TransactionViewModel
 from lessons.helpers import *
@@ -34,14 +35,10 @@ class TransactionModelHelperTestCase(TestCase, LoginHelper, LessonHelper, School
         self.transfer.lesson_booking = self.lesson_booking
         self.transfer.save()
 
-        self.student_helper = StudentProfileModelHelper()
         self.transaction_helper = TransactionModelHelper()
 
         self.student_profile = self.student_user.student_profile
 
-        self.transfers = list(map(lambda pr_transfer: TransactionViewModel(transfer=pr_transfer), self.student_helper.transfers_for_student(self.student_profile)))
-        self.lesson_bookings = list(map(lambda pr_booking: TransactionViewModel(lesson_booking=pr_booking), self.student_helper.lesson_bookings_for_student(self.student_profile)))
-
     """
     Test cases
     """
@@ -51,19 +48,127 @@ class TransactionModelHelperTestCase(TestCase, LoginHelper, LessonHelper, School
         balance = 250
         self.assertEqual(self.transaction_helper.format_to_currency(balance), "250.00 GBP")
 
-    def test_balance_at_returns_right_balance_at_a_given_time(self):
+    def test_ledger_for_student_is_newest_first_with_closing_balances(self):
+
+        ledger, next_cursor = self.transaction_helper.ledger_page(self.student_profile)
+        self.assertIsNone(next_cursor)
+        dates = [transaction.date for transaction in ledger]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+        # Booking and today's transfer share a date, newest first puts the payment above the invoice
+        self.assertTrue(ledger[0].is_payment)
+        self.assertFalse(ledger[1].is_payment)
+
+        # Both receive the closing balance of that day
+        self.assertEqual([transaction.balance for transaction in ledger], [Decimal(490), Decimal(490), Decimal(250)])
+
+    def test_ledger_for_school_includes_every_student(self):
+
+        self._create_secondary_student_user()
+        self._assign_lesson_request_to_user(self.student_user_2)
+        self._assign_lesson_booking_to_lesson_request(self.student_user_2.student_profile.lesson_requests.first())
+
+        self.assertEqual(len(self.transaction_helper.ledger_page(self.student_profile)[0]), 3)
+        ledger = self.transaction_helper.ledger_page()[0]
+        self.assertEqual(len(ledger), 4)
+
+        # Newest balance accounts for both students' invoices
+        self.assertEqual(ledger[0].balance, Decimal(480))
+
+    def _walk_ledger(self, student_profile, page_size):
+        """
+        Follows the cursors from the first page of a ledger to the last, returning every transaction
+        """
+        transactions = []
+        before = None
+        while True:
+            page, next_cursor = self.transaction_helper.ledger_page(student_profile, before, page_size=page_size)
+            transactions.extend(page)
+            if next_cursor is None:
+                return transactions
+            before = self.transaction_helper.decode_ledger_cursor(next_cursor, student_profile)
+
+    def test_ledger_pages_match_full_ledger(self):
+
+        self._create_transfer(self.lesson_booking)
+        expected = self.transaction_helper.ledger_page(self.student_profile)[0]
+
+        # Walk the ledger one transaction at a time, so pages split the transactions of a day
+        transactions = self._walk_ledger(self.student_profile, 1)
+
+        self.assertEqual(
+            [(transaction.reference, transaction.id, transaction.balance) for transaction in transactions],
+            [(transaction.reference, transaction.id, transaction.balance) for transaction in expected])
+
+    def test_school_ledger_pages_match_full_ledger(self):
+
+        self._create_secondary_student_user()
+        self._assign_lesson_request_to_user(self.student_user_2)
+        self._assign_lesson_booking_to_lesson_request(self.student_user_2.student_profile.lesson_requests.first())
+        expected = self.transaction_helper.ledger_page()[0]
+
+        transactions = self._walk_ledger(None, 2)
+
+        self.assertEqual(
+            [(transaction.reference, transaction.id, transaction.balance) for transaction in transactions],
+            [(transaction.reference, transaction.id, transaction.balance) for transaction in expected])
+
+    def test_later_pages_do_not_sum_older_transactions(self):
+
+        next_cursor = self.transaction_helper.ledger_page(self.student_profile, page_size=1)[1]
+        before = self.transaction_helper.decode_ledger_cursor(next_cursor, self.student_profile)
+
+        # The page itself and the names of its students
+        with self.assertNumQueries(2):
+            page = self.transaction_helper.ledger_page(self.student_profile, before, page_size=1)[0]
+        self.assertEqual(page[0].balance, Decimal(490))
+
+    def test_ledger_uses_term_start_for_bookings_without_a_start_date(self):
+
+        self.school_term.refresh_from_db()
+        self.lesson_booking.start_date = None
+        self.lesson_booking.save()
+        self.assertEqual(self.lesson_booking.ledger_date, self.school_term.start_date)
+
+        ledger = self.transaction_helper.ledger_page(self.student_profile)[0]
+        invoice = next(transaction for transaction in ledger if not transaction.is_payment)
+        self.assertEqual(invoice.date, self.school_term.start_date)
+
+    def test_ledger_date_follows_the_term_start(self):
+
+        self.school_term.refresh_from_db()
+        self.lesson_booking.start_date = None
+        self.lesson_booking.save()
+        self.school_term.start_date -= timedelta(days=7)
+        self.school_term.save()
+
+        self.lesson_booking.refresh_from_db()
+        self.assertEqual(self.lesson_booking.ledger_date, self.school_term.start_date)
+
+    def test_current_balance_is_aggregate_of_all_transactions(self):
+
+        self.assertEqual(self.transaction_helper.current_balance(self.student_profile), Decimal(490))
+
+    def test_current_balance_is_none_without_transactions(self):
+
+        self._create_secondary_student_user()
+        self.assertIsNone(self.transaction_helper.current_balance(self.student_user_2.student_profile))
+
+    def test_invalid_ledger_cursor_is_ignored(self):
 
-        # Check balance after first transfer
-        self.assertEqual(self.transaction_helper.balance_at(self.transfers, self.transfers[1].date), Decimal(250))
+        self.assertIsNone(self.transaction_helper.decode_ledger_cursor('not-a-cursor'))
+        self.assertIsNone(self.transaction_helper.decode_ledger_cursor(None))
 
-        # Check balance after second transfer
-        self.assertEqual(self.transaction_helper.balance_at(self.transfers, self.transfers[0].date), Decimal(500))
+    def test_altered_ledger_cursor_is_ignored(self):
 
-    def test_assign_balances_assigns_right_balance_to_right_transaction(self):
+        next_cursor = self.transaction_helper.ledger_page(self.student_profile, page_size=1)[1]
+        self.assertIsNotNone(self.transaction_helper.decode_ledger_cursor(next_cursor, self.student_profile))
+        # The same cursor with a higher balance, not signed by the ledger
+        values = signing.Signer(salt=TransactionModelHelper.LEDGER_CURSOR_SALT).unsign_object(next_cursor)
+        values[4] = '999.00'
+        self.assertIsNone(self.transaction_helper.decode_ledger_cursor(signing.Signer().sign_object(values), self.student_profile))
 
-        transactions = self.transaction_helper.assign_balances(self.transfers + self.lesson_bookings)
-        # Transaction of 250 GBP done before a booking
-        self.assertEqual(transactions[1].balance, Decimal(250))
+    def test_ledger_cursor_of_another_ledger_is_ignored(self):
 
-        # Transaction of 250 GBP done after a booking of 10 GBP
-        self.assertEqual(transactions[0].balance, Decimal(490))
+        next_cursor = self.transaction_helper.ledger_page(self.student_profile, page_size=1)[1]
+        self.assertIsNone(self.transaction_helper.decode_ledger_cursor(next_cursor))
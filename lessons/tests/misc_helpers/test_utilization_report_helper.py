@@ -0,0 +1,79 @@
+from django.test import TestCase, RequestFactory
+from django.core.cache import cache
+from datetime import date, timedelta, time
+from lessons.helpers import *
+from lessons.tests.helpers import *
+
+class UtilizationReportHelperTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for the teacher utilization report
+    """
+
+    def setUp(self):
+        """
+        A teacher with two Monday lessons from 9:30 to 10:30
+        """
+        cache.clear()
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_school_term()
+        self.school_term.refresh_from_db()
+        self._create_teacher_user()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self.lesson_booking = LessonBooking.objects.get()
+        self.lesson_booking.regular_start_time = time(hour=9, minute=30)
+        self.lesson_booking.save()
+
+        self.teacher_id = self.teacher_user.teacher_profile.id
+        self.helper = UtilizationReportHelper()
+
+    """
+    Test cases
+    """
+
+    def test_lessons_are_split_over_the_hours_they_run_in(self):
+        hours = self.helper.booked_minutes(self.school_term)[self.teacher_id]['MONDAY']
+        self.assertEqual(hours[9], 60)
+        self.assertEqual(hours[10], 60)
+        self.assertEqual(sum(hours), 120)
+
+    def test_lessons_past_midnight_are_counted_at_both_ends_of_the_day(self):
+        self.lesson_booking.regular_start_time = time(hour=23, minute=30)
+        self.lesson_booking.save()
+        hours = self.helper.booked_minutes(self.school_term)[self.teacher_id]['MONDAY']
+        self.assertEqual(hours[23], 60)
+        self.assertEqual(hours[0], 60)
+
+    def test_report_is_cached(self):
+        self.helper.booked_minutes(self.school_term)
+        with self.assertNumQueries(1):
+            self.helper.booked_minutes(self.school_term)
+
+    def test_cache_is_invalidated_when_booking_changes(self):
+        self.helper.booked_minutes(self.school_term)
+        self.lesson_booking.duration = 30
+        self.lesson_booking.save()
+        self.assertEqual(sum(self.helper.booked_minutes(self.school_term)[self.teacher_id]['MONDAY']), 60)
+
+    def test_cache_is_invalidated_when_booking_deleted(self):
+        self.helper.booked_minutes(self.school_term)
+        self.lesson_booking.delete()
+        self.assertEqual(self.helper.booked_minutes(self.school_term), {})
+
+    def test_weeks_per_day(self):
+        # 1st to 15th September 2022 has three Thursdays and two of every other day
+        school_term = SchoolTerm(start_date=date(2022, 9, 1), end_date=date(2022, 9, 15))
+        weeks = self.helper.weeks_per_day(school_term)
+        self.assertEqual(weeks['THURSDAY'], 3)
+        self.assertEqual(weeks['MONDAY'], 2)
+        self.assertEqual(sum(weeks.values()), 15)
+
+    def test_percentages_use_capacity(self):
+        page, hours = self.helper.page(RequestFactory().get('/'), self.school_term, capacity=30)
+        monday = page.items[0].utilization_days[0]
+        cell = monday['cells'][hours.index(9)]
+        weeks = self.helper.weeks_per_day(self.school_term)['MONDAY']
+        self.assertEqual(cell['minutes'], 60)
+        self.assertEqual(cell['percent'], round(60 * 100 / (30 * weeks)))
+        self.assertEqual(page.items[0].utilization_minutes, 120)
@@ -121,3 +121,25 @@ class LessonBookingModelTestCase(TestCase, LoginHelper, LessonHelper, SchoolTerm
     def test_quantity_cannot_be_26(self):
         self.lesson_booking.quantity = 0
         self._assert_model_is_invalid()
+
+    def test_invoice_reference_assigned_on_create(self):
+        self.lesson_booking.save()
+        expected = f"{str(self.student_user.student_profile.id).rjust(4, '0')}-{str(self.lesson_booking.id).rjust(3, '0')}"
+
+        self.assertEqual(self.lesson_booking.invoice_reference, expected)
+        self.assertEqual(LessonBooking.objects.get(id=self.lesson_booking.id).invoice_reference, expected)
+
+    def test_invoice_reference_unchanged_on_update(self):
+        self.lesson_booking.save()
+        reference = self.lesson_booking.invoice_reference
+
+        self.lesson_booking.quantity = 3
+        self.lesson_booking.save()
+        self.assertEqual(LessonBooking.objects.get(id=self.lesson_booking.id).invoice_reference, reference)
+
+    def test_invoice_reference_stays_unique_past_booking_id_999(self):
+        self.lesson_booking.id = 1000
+        self.lesson_booking.save()
+
+        self.assertTrue(self.lesson_booking.invoice_reference.endswith('-1000'))
+        self.assertEqual(LessonBooking.objects.filter(invoice_reference=self.lesson_booking.invoice_number()).count(), 1)
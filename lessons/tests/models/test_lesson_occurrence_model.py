@@ -0,0 +1,90 @@
+from django.test import TestCase
+from django.core.management import call_command
+from io import StringIO
+from contextlib import redirect_stdout
+from datetime import date, timedelta, time
+from lessons.tests.helpers import *
+from lessons.helpers import LessonOccurrenceHelper
+from lessons.models import LessonOccurrence
+
+class LessonOccurrenceModelTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for the stored lessons of bookings
+    """
+
+    def setUp(self):
+        """
+        A booking of two weekly Monday lessons at 9:00
+        """
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_school_term()
+        self._create_teacher_user()
+        self._create_secondary_teacher_user()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self.lesson_booking = LessonBooking.objects.get()
+        self.lesson_booking.regular_start_time = time(hour=9)
+        self.lesson_booking.save()
+        self.helper = LessonOccurrenceHelper()
+
+    def _dates(self):
+        """
+        Returns the dates of the stored lessons of the booking
+        """
+        return list(self.lesson_booking.occurrences.order_by('date').values_list('date', flat=True))
+
+    """
+    Test cases
+    """
+
+    def test_lessons_are_generated_when_booking_is_made(self):
+        self.assertEqual(self._dates(), self.lesson_booking.occurrence_dates())
+        self.assertEqual(len(self._dates()), 2)
+
+        occurrence = self.lesson_booking.occurrences.first()
+        self.assertEqual(occurrence.date.weekday(), 0)
+        self.assertEqual(occurrence.start_time, time(hour=9))
+        self.assertEqual(occurrence.end_time, time(hour=10))
+        self.assertEqual(occurrence.teacher, self.teacher_user.teacher_profile)
+        self.assertEqual(occurrence.student_profile, self.student_user.student_profile)
+
+    def test_lessons_are_regenerated_when_booking_changes(self):
+        self.lesson_booking.regular_day = 'WEDNESDAY'
+        self.lesson_booking.interval = 2
+        self.lesson_booking.teacher = self.teacher_user_2.teacher_profile
+        self.lesson_booking.save()
+
+        self.lesson_booking.refresh_from_db()
+        self.assertEqual(self._dates(), self.lesson_booking.occurrence_dates())
+        self.assertTrue(all(occurrence_date.weekday() == 2 for occurrence_date in self._dates()))
+        self.assertFalse(LessonOccurrence.objects.filter(teacher=self.teacher_user.teacher_profile).exists())
+
+    def test_lessons_are_deleted_with_booking(self):
+        self.lesson_booking.delete()
+        self.assertEqual(LessonOccurrence.objects.count(), 0)
+
+    def test_lessons_follow_term_dates_when_booking_has_none(self):
+        self.lesson_booking.start_date = None
+        self.lesson_booking.end_date = None
+        self.lesson_booking.save()
+
+        self.school_term.start_date = date.today() + timedelta(days=7)
+        self.school_term.save()
+        self.lesson_booking.refresh_from_db()
+        self.assertEqual(self._dates(), self.lesson_booking.occurrence_dates())
+        self.assertGreaterEqual(self._dates()[0], date.today() + timedelta(days=7))
+
+    def test_roster_lists_lessons_on_a_date(self):
+        first_lesson = self._dates()[0]
+        self.assertEqual([occurrence.lesson_booking for occurrence in self.helper.roster(first_lesson, teacher_id=self.teacher_user.teacher_profile.id)], [self.lesson_booking])
+        self.assertEqual(list(self.helper.roster(first_lesson, teacher_id=self.teacher_user_2.teacher_profile.id)), [])
+        self.assertEqual(list(self.helper.roster(first_lesson + timedelta(days=1), student_profile_id=self.student_user.student_profile.id)), [])
+
+    def test_rebuild_command_regenerates_every_lesson(self):
+        LessonOccurrence.objects.all().delete()
+        output = StringIO()
+        with redirect_stdout(output):
+            call_command('rebuild_lesson_occurrences')
+        self.assertIn('2 lessons generated', output.getvalue())
+        self.assertEqual(self._dates(), self.lesson_booking.occurrence_dates())
@@ -0,0 +1,103 @@
+from django.test import TestCase
+from django.core.management import call_command
+from decimal import Decimal
+from io import StringIO
+from contextlib import redirect_stdout
+from lessons.tests.helpers import *
+from lessons.helpers import StudentAccountHelper
+from lessons.models import StudentAccount
+
+class StudentAccountModelTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper, TransferHelper):
+    """
+    Contains the test cases for the materialised student account balances
+    """
+
+    def setUp(self):
+        """
+        Simulate a student with a lesson booking
+        """
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_school_term()
+        self._create_teacher_user()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self.lesson_booking = self.admin_user.admin_profile.lesson_bookings.first()
+
+    def _account(self):
+        """
+        Returns the student's account as currently stored
+        """
+        return StudentAccount.objects.get(student_profile=self.student_user.student_profile)
+
+    """
+    Test cases
+    """
+
+    def test_account_created_with_student_profile(self):
+        self._create_secondary_student_user()
+        account = StudentAccount.objects.get(student_profile=self.student_user_2.student_profile)
+        self.assertEqual(account.balance, 0)
+
+    def test_lesson_booking_is_invoiced(self):
+        account = self._account()
+        self.assertEqual(account.total_invoiced, Decimal(10))
+        self.assertEqual(account.total_paid, Decimal(0))
+        self.assertEqual(account.balance, Decimal(-10))
+
+    def test_transfer_is_paid(self):
+        self._create_transfer(self.lesson_booking)
+        account = self._account()
+        self.assertEqual(account.total_paid, Decimal(250))
+        self.assertEqual(account.balance, Decimal(240))
+
+    def test_updated_transfer_is_reflected(self):
+        self._create_transfer(self.lesson_booking)
+        self.transfer.balance = 20
+        self.transfer.save()
+        self.assertEqual(self._account().balance, Decimal(10))
+
+    def test_updated_lesson_booking_is_reflected(self):
+        self.lesson_booking.quantity = 5
+        self.lesson_booking.save()
+        self.assertEqual(self._account().total_invoiced, Decimal(25))
+
+    def test_deleted_transfer_is_reflected(self):
+        self._create_transfer(self.lesson_booking)
+        self.transfer.delete()
+        self.assertEqual(self._account().balance, Decimal(-10))
+
+    def test_deleted_lesson_booking_removes_invoice_and_its_transfers(self):
+        self._create_transfer(self.lesson_booking)
+        self.lesson_booking.delete()
+        account = self._account()
+        self.assertEqual(account.total_invoiced, Decimal(0))
+        self.assertEqual(account.total_paid, Decimal(0))
+
+    def test_deleting_student_deletes_account(self):
+        self._create_transfer(self.lesson_booking)
+        self.student_user.delete()
+        self.assertEqual(StudentAccount.objects.count(), 0)
+
+    def test_rebuild_reports_and_corrects_drift(self):
+        StudentAccount.objects.filter(student_profile=self.student_user.student_profile).update(balance=99)
+
+        drift = StudentAccountHelper().rebuild()
+        self.assertEqual(drift, [(self.student_user.student_profile.id, Decimal(99), Decimal(-10))])
+        self.assertEqual(self._account().balance, Decimal(-10))
+        self.assertEqual(StudentAccountHelper().rebuild(), [])
+
+    def test_rebuild_creates_missing_accounts(self):
+        StudentAccount.objects.all().delete()
+        StudentAccountHelper().rebuild()
+        self.assertEqual(self._account().balance, Decimal(-10))
+
+    def test_rebuild_balances_command_dry_run_makes_no_changes(self):
+        StudentAccount.objects.filter(student_profile=self.student_user.student_profile).update(balance=99)
+
+        output = StringIO()
+        with redirect_stdout(output):
+            call_command('rebuild_balances', '--dry-run')
+
+        self.assertIn('1 student accounts have drifted', output.getvalue())
+        self.assertEqual(self._account().balance, Decimal(99))
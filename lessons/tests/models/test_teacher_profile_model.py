@@ -3,7 +3,9 @@ from django.core.exceptions import ValidationError
 from lessons.models.term_models import SchoolTerm
 from datetime import datetime, timedelta, time
 from lessons.tests.helpers import SchoolTermHelper, LoginHelper, LessonHelper
-from ..models import User, UserType, LessonBooking
+from ..models import User, UserType, LessonBooking, LessonRequest
+from lessons.helpers import TimeHelper, LessonOccurrenceHelper
+import random
 
 
 class TeacherModelTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
@@ -113,4 +115,63 @@ class TeacherModelTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper
         time_start_2 = time(hour=13)
         time_end_2 = time(hour=17)
 
-        self.assertTrue(self.teacher_user.teacher_profile.time_overlaps(time_start_1, time_end_1, time_start_2, time_end_2))
\ No newline at end of file
+        self.assertTrue(self.teacher_user.teacher_profile.time_overlaps(time_start_1, time_end_1, time_start_2, time_end_2))
+
+    def test_clashing_bookings_are_returned(self):
+        self.lesson_booking.regular_start_time = time(hour=9)
+        self.lesson_booking.save()
+        teacher_profile = self.teacher_user.teacher_profile
+        start_date = self.lesson_booking.start_date_actual()
+
+        self.assertEqual(teacher_profile.clashing_bookings(start_date, start_date + timedelta(days=7), 'MONDAY', time(hour=9, minute=15), time(hour=10), 1, 1), [self.lesson_booking])
+        self.assertEqual(teacher_profile.clashing_bookings(start_date, start_date + timedelta(days=7), 'TUESDAY', time(hour=9, minute=15), time(hour=10), 1, 1), [])
+        self.assertEqual(teacher_profile.clashing_bookings(start_date, start_date + timedelta(days=7), 'MONDAY', time(hour=9), time(hour=10), 1, 1,
+            exclude_lesson_booking_id=self.lesson_booking.id), [])
+
+    def test_clashing_bookings_fall_back_to_term_dates(self):
+        self.lesson_booking.start_date = None
+        self.lesson_booking.end_date = None
+        self.lesson_booking.save()
+        teacher_profile = self.teacher_user.teacher_profile
+        first_lesson = self.lesson_booking.occurrence_dates()[0]
+        term_end = self.school_term.end_date
+
+        start_time = self.lesson_booking.regular_start_time
+        self.assertEqual(len(teacher_profile.clashing_bookings(first_lesson, first_lesson, 'MONDAY', start_time, start_time, 1, 1)), 1)
+        self.assertEqual(len(teacher_profile.clashing_bookings(term_end + timedelta(days=1), term_end + timedelta(days=8), 'MONDAY', start_time, start_time, 1, 1)), 0)
+
+    def test_clashing_bookings_agree_with_is_available(self):
+        """
+        Random bookings, including ones that run past midnight, clash in the database exactly when they do in Python
+        and they have a lesson on the same date
+        """
+        random.seed(12)
+        teacher_profile = self.teacher_user.teacher_profile
+        student_profile = self.student_user.student_profile
+        today = datetime.now().date()
+
+        lesson_requests = LessonRequest.objects.bulk_create([
+            LessonRequest(interval=1, quantity=2, duration=60, availability='MONDAY', student_profile=student_profile) for _ in range(80)])
+        LessonBooking.objects.bulk_create([
+            LessonBooking(
+                lesson_request=lesson_request, teacher=teacher_profile, school_term=self.school_term, quantity=random.randint(1, 13), interval=random.choice([1, 2]),
+                start_date=today + timedelta(days=random.randint(0, 40)), end_date=today + timedelta(days=random.randint(41, 90)),
+                regular_day=random.choice(['MONDAY', 'TUESDAY']), duration=random.choice([15, 30, 45, 60]),
+                regular_start_time=time(hour=random.choice([8, 12, 22, 23]), minute=random.randint(0, 59), second=random.choice([0, 30])))
+            for lesson_request in lesson_requests])
+        lesson_bookings = list(teacher_profile.lesson_bookings.all())
+
+        for _ in range(150):
+            start_date = today + timedelta(days=random.randint(0, 90))
+            end_date = start_date + timedelta(days=random.randint(0, 20))
+            start_time = time(hour=random.choice([0, 8, 12, 22, 23]), minute=random.randint(0, 59), second=random.choice([0, 30]))
+            end_time = TimeHelper().add_minutes_to_time(start_time, random.choice([15, 30, 45, 60]))
+            day = random.choice(['MONDAY', 'TUESDAY'])
+            interval = random.choice([1, 2])
+            dates = set(LessonOccurrenceHelper().occurrence_dates(start_date, end_date, day, interval, 3))
+
+            expected = [lesson_booking.id for lesson_booking in lesson_bookings
+                if not teacher_profile.is_available([lesson_booking], start_date, end_date, day, start_time, end_time)
+                and dates & set(lesson_booking.occurrence_dates())]
+            found = [lesson_booking.id for lesson_booking in teacher_profile.clashing_bookings(start_date, end_date, day, start_time, end_time, interval, 3)]
+            self.assertEqual(sorted(found), sorted(expected))
@@ -0,0 +1,115 @@
+from django.test import TestCase
+from datetime import date, timedelta, time
+from lessons.tests.helpers import *
+from lessons.helpers import TeacherTimetableHelper
+from lessons.models import TeacherTimetable, SchoolTerm
+
+class TeacherTimetableModelTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for the weekly slot timetables of teachers
+    """
+
+    def setUp(self):
+        """
+        A teacher with a Monday lesson from 9:00 to 10:00
+        """
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_school_term()
+        self._create_teacher_user()
+        self._create_secondary_teacher_user()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self.lesson_booking = self.admin_user.admin_profile.lesson_bookings.first()
+        self.lesson_booking.regular_start_time = time(hour=9)
+        self.lesson_booking.save()
+
+        self.teacher_profile = self.teacher_user.teacher_profile
+        self.helper = TeacherTimetableHelper()
+
+    def _timetable(self, teacher_user=None):
+        """
+        Returns the stored timetable of a teacher for the term
+        """
+        teacher_profile = (teacher_user or self.teacher_user).teacher_profile
+        return self.helper.timetables_for(self.school_term.id, [teacher_profile.id])[teacher_profile.id]
+
+    """
+    Test cases
+    """
+
+    def test_slot_mask_covers_start_to_end(self):
+        self.assertEqual(TeacherTimetable.slot_mask(time(hour=0), 30), 0b111)
+        self.assertEqual(TeacherTimetable.slot_mask(time(hour=0, minute=10), 15), 0b11)
+
+    def test_slot_mask_wraps_past_midnight(self):
+        mask = TeacherTimetable.slot_mask(time(hour=23, minute=45), 30)
+        self.assertEqual(mask, (1 << 95) | 0b11)
+
+    def test_booked_time_is_not_free(self):
+        timetable = self._timetable()
+        self.assertFalse(timetable.is_free('MONDAY', time(hour=9, minute=30), time(hour=9, minute=45)))
+        self.assertTrue(timetable.is_free('TUESDAY', time(hour=9), time(hour=10)))
+        self.assertTrue(timetable.is_free('MONDAY', time(hour=10, minute=15), time(hour=11)))
+
+    def test_touching_times_are_not_free(self):
+        timetable = self._timetable()
+        self.assertFalse(timetable.is_free('MONDAY', time(hour=10), time(hour=11)))
+        self.assertFalse(timetable.is_free('MONDAY', time(hour=8), time(hour=9)))
+
+    def test_timetable_is_updated_when_booking_moves(self):
+        self._timetable()
+        self.lesson_booking.regular_day = 'TUESDAY'
+        self.lesson_booking.teacher = self.teacher_user_2.teacher_profile
+        self.lesson_booking.save()
+
+        self.assertEqual(self._timetable().slots_taken(), 0)
+        timetable = self._timetable(self.teacher_user_2)
+        self.assertFalse(timetable.is_free('TUESDAY', time(hour=9), time(hour=10)))
+        self.assertEqual(timetable.day_slots('MONDAY'), 0)
+
+    def test_timetable_is_updated_when_booking_deleted(self):
+        self._timetable()
+        self.lesson_booking.delete()
+        self.assertEqual(self._timetable().slots_taken(), 0)
+
+    def test_only_changed_day_is_rebuilt(self):
+        timetable = self._timetable()
+        # A day that was wrongly stored as busy stays that way, as only Monday is recomputed when the booking changes
+        timetable.set_day_slots('FRIDAY', 1)
+        timetable.save()
+        self.lesson_booking.duration = 30
+        self.lesson_booking.save()
+
+        timetable = self._timetable()
+        self.assertEqual(timetable.day_slots('FRIDAY'), 1)
+        self.assertTrue(timetable.is_free('MONDAY', time(hour=9, minute=45), time(hour=10)))
+
+    def test_deleting_teacher_deletes_timetable(self):
+        self._timetable()
+        self.teacher_user.delete()
+        self.assertFalse(TeacherTimetable.objects.filter(teacher_id=self.teacher_profile.id).exists())
+
+    def test_new_teachers_and_terms_are_given_timetables(self):
+        self.assertEqual(TeacherTimetable.objects.filter(school_term=self.school_term).count(), 2)
+        SchoolTerm.objects.create(label='Next term', start_date=date.today() + timedelta(days=100), end_date=date.today() + timedelta(days=150))
+        self.assertEqual(TeacherTimetable.objects.filter(teacher=self.teacher_profile).count(), 2)
+        self.assertEqual(TeacherTimetable.objects.filter(slots=bytes(84)).count(), 3)
+
+    def test_reading_timetables_makes_none(self):
+        TeacherTimetable.objects.filter(teacher=self.teacher_user_2.teacher_profile).delete()
+        self.assertEqual(list(self.helper.timetables_for(self.school_term.id, [self.teacher_user_2.teacher_profile.id])), [])
+        self.assertFalse(TeacherTimetable.objects.filter(teacher=self.teacher_user_2.teacher_profile).exists())
+
+    def test_missing_timetable_is_made_when_booking_changes(self):
+        TeacherTimetable.objects.all().delete()
+        self.lesson_booking.save()
+        self.assertFalse(self._timetable().is_free('MONDAY', time(hour=9), time(hour=10)))
+
+    def test_clashing_bookings_uses_timetable(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.teacher_profile.clashing_bookings(date.today(), date.today() + timedelta(days=7), 'TUESDAY', time(hour=9), time(hour=10), 1, 1,
+                school_term_id=self.school_term.id), [])
+        start_date = self.lesson_booking.start_date_actual()
+        self.assertEqual(self.teacher_profile.clashing_bookings(start_date, start_date + timedelta(days=7), 'MONDAY', time(hour=9), time(hour=10), 1, 1,
+            school_term_id=self.school_term.id), [self.lesson_booking])
@@ -0,0 +1,120 @@
+from django.test import TestCase
+from django.core.management import call_command
+from decimal import Decimal
+from io import StringIO
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from lessons.tests.helpers import *
+from lessons.helpers import TermClosingBalanceHelper, TransactionModelHelper
+from lessons.models import TermClosingBalance
+
+class TermClosingBalanceModelTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper, TransferHelper):
+    """
+    Contains the test cases for the closing balance snapshots of school terms
+    """
+
+    def setUp(self):
+        """
+        A term that has ended with one transfer in it, and the current term with a booking and a transfer
+        """
+        self.past_term = SchoolTerm.objects.create(label="Past term", start_date=date.today() - timedelta(days=190), end_date=date.today() - timedelta(days=100))
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_school_term()
+        self._create_teacher_user()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self.lesson_booking = self.admin_user.admin_profile.lesson_bookings.first()
+        self._create_transfer(self.lesson_booking)
+        self.student_profile = self.student_user.student_profile
+
+        Transfer.objects.create(date=date.today() - timedelta(days=150), balance=7, lesson_booking=self.lesson_booking)
+        self.helper = TermClosingBalanceHelper()
+
+    def _snapshot(self, student_profile):
+        """
+        Returns the stored closing balance of the past term
+        """
+        return TermClosingBalance.objects.get(school_term=self.past_term, student_profile=student_profile).balance
+
+    """
+    Test cases
+    """
+
+    def test_only_ended_terms_are_closed(self):
+        closed = self.helper.close_ended_terms()
+        self.assertEqual(closed, [self.past_term])
+        self.assertEqual(list(self.helper.closed_terms()), [self.past_term])
+
+    def test_closing_writes_student_and_school_balances(self):
+        self.helper.close_ended_terms()
+        self.assertEqual(self._snapshot(self.student_profile), Decimal('7.00'))
+        self.assertEqual(self._snapshot(None), Decimal('7.00'))
+
+    def test_closing_again_does_not_duplicate_snapshots(self):
+        self.helper.close_term(self.past_term)
+        self.helper.close_term(self.past_term)
+        self.assertEqual(TermClosingBalance.objects.count(), 2)
+
+    def test_opening_balance_is_the_same_with_snapshots(self):
+        transaction_helper = TransactionModelHelper()
+        before = transaction_helper.opening_balance(self.student_profile, date.today() + timedelta(days=1))
+        school_before = transaction_helper.opening_balance(None, date.today() + timedelta(days=1))
+
+        self.helper.close_ended_terms()
+
+        self.assertEqual(transaction_helper.opening_balance(self.student_profile, date.today() + timedelta(days=1)), before)
+        self.assertEqual(transaction_helper.opening_balance(None, date.today() + timedelta(days=1)), school_before)
+
+    def test_opening_balance_starts_from_snapshot(self):
+        self.helper.close_ended_terms()
+        # A snapshot that disagrees with the transactions shows that they are no longer summed
+        TermClosingBalance.objects.filter(school_term=self.past_term, student_profile=self.student_profile).update(balance=100)
+        self.assertEqual(TransactionModelHelper().opening_balance(self.student_profile, date.today()), Decimal('100.00'))
+
+    def test_ledger_balances_are_the_same_with_snapshots(self):
+        transaction_helper = TransactionModelHelper()
+        before = [transaction.balance for transaction in transaction_helper.ledger_page(self.student_profile, page_size=1)[0]]
+
+        self.helper.close_ended_terms()
+
+        after = [transaction.balance for transaction in transaction_helper.ledger_page(self.student_profile, page_size=1)[0]]
+        self.assertEqual(after, before)
+
+    def test_back_dated_transfer_updates_closed_term(self):
+        self.helper.close_ended_terms()
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer = Transfer.objects.create(date=date.today() - timedelta(days=120), balance=3, lesson_booking=self.lesson_booking)
+        self.assertEqual(self._snapshot(self.student_profile), Decimal('10.00'))
+        self.assertEqual(self._snapshot(None), Decimal('10.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer.delete()
+        self.assertEqual(self._snapshot(self.student_profile), Decimal('7.00'))
+
+    def test_transfer_moved_out_of_closed_term_updates_it(self):
+        self.helper.close_ended_terms()
+        transfer = Transfer.objects.get(balance=7)
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer.date = date.today()
+            transfer.save()
+        self.assertEqual(self._snapshot(self.student_profile), Decimal('0.00'))
+
+    def test_changing_term_dates_reopens_it(self):
+        self.helper.close_ended_terms()
+        self.past_term.end_date = self.past_term.end_date - timedelta(days=1)
+        self.past_term.save()
+        self.assertFalse(self.helper.closed_terms().exists())
+
+    def test_close_school_terms_command(self):
+        output = StringIO()
+        with redirect_stdout(output):
+            call_command('close_school_terms')
+        self.assertIn('1 school terms closed', output.getvalue())
+        self.assertEqual(self._snapshot(None), Decimal('7.00'))
+
+    def test_deleting_student_updates_school_snapshot(self):
+        self.helper.close_ended_terms()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student_user.delete()
+        self.assertEqual(self._snapshot(None), Decimal('0.00'))
@@ -2,6 +2,7 @@ from django.test import TestCase
 from django.core.exceptions import ValidationError
 from lessons.models.transfer_models import Transfer
 from datetime import datetime, timedelta
+from decimal import Decimal
 from lessons.tests.helpers import *
 from lessons.helpers import *
 from lessons.view_models import *
@@ -69,11 +70,32 @@ class TransactionViewModelTestCase(TestCase, LoginHelper, LessonHelper, SchoolTe
 
     def test_formatted_balance_returns_right_format(self):
 
-        transaction_helper = TransactionModelHelper()
         transfer = TransactionViewModel(transfer=self.transfer)
         booking = TransactionViewModel(lesson_booking=self.lesson_booking)
-        transactions = transaction_helper.assign_balances([transfer, booking])
+        transfer.balance = booking.balance = Decimal(690)
 
         # Formatted fee for transafer transactions view
         self.assertEqual(transfer.formatted_balance, "690.00 GBP")
         self.assertEqual(booking.formatted_balance, "690.00 GBP")
+
+    def test_ledger_values_transactions_view_has_necessary_fields(self):
+        values = (0, self.lesson_booking.id, self.lesson_booking.start_date_actual(), Decimal('-10.00'), self.lesson_booking.id, self.lesson_booking.invoice_number(), self.student_user.student_profile.id)
+        transaction = TransactionViewModel(ledger_values=values, balance=Decimal('-10.00'), student_name="John Doe")
+
+        self.assertFalse(transaction.is_payment)
+        self.assertEqual(transaction.reference, self.lesson_booking.invoice_number())
+        self.assertEqual(transaction.student_name, "John Doe")
+        self.assertEqual(transaction.formatted_balance, "-10.00 GBP")
+
+    def test_transactions_view_has_no_instance_dictionary(self):
+        self.assertFalse(hasattr(self.transfer_transactions_view, '__dict__'))
+
+    def test_view_models_share_student_names(self):
+        transaction_helper = TransactionModelHelper()
+        rows = [(1, id, '2022-01-01', 5, self.lesson_booking.id, None, self.student_user.student_profile.id) for id in range(3)]
+        with self.assertNumQueries(1):
+            transactions = transaction_helper.view_models(rows, lambda row: Decimal(0))
+
+        self.assertEqual(transactions[0].student_name, self.student_user.full_name())
+        self.assertIs(transactions[0].student_name, transactions[2].student_name)
+        self.assertIs(transactions[0].date, transactions[1].date)
@@ -0,0 +1,112 @@
+from django.test import TestCase
+from django.urls import reverse
+from datetime import time
+from unittest.mock import patch
+from lessons.helpers import CalendarFeedHelper
+from ..helpers import *
+
+class CalendarFeedViewTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for the iCalendar feeds of teachers and students
+    """
+
+    def setUp(self):
+        """
+        A student with a booking of two weekly Monday lessons at 9:00
+        """
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_school_term()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self.lesson_booking = LessonBooking.objects.get()
+        self.lesson_booking.regular_start_time = time(hour=9)
+        self.lesson_booking.save()
+
+        helper = CalendarFeedHelper()
+        self.teacher_url = reverse('calendar_feed', kwargs={'token': helper.token_for('teacher', self.teacher_user.teacher_profile.id)})
+        self.student_url = reverse('calendar_feed', kwargs={'token': helper.token_for('student', self.student_user.student_profile.id)})
+
+    def _content(self, response):
+        """
+        Returns the streamed body of a response
+        """
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    """
+    Test cases
+    """
+
+    def test_calendar_feed_url(self):
+        self.assertTrue(self.teacher_url.startswith('/calendar/'))
+        self.assertTrue(self.teacher_url.endswith('.ics'))
+
+    def test_teacher_feed_has_recurring_lessons(self):
+        response = self.client.get(self.teacher_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+
+        content = self._content(response)
+        first_lesson = self.lesson_booking.occurrence_dates()[0]
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn(f'DTSTART:{first_lesson.strftime("%Y%m%d")}T090000\r\n', content)
+        self.assertIn('RRULE:FREQ=WEEKLY;INTERVAL=1;COUNT=2;BYDAY=MO\r\n', content)
+        self.assertIn('DURATION:PT60M\r\n', content)
+        self.assertIn(f'SUMMARY:Lesson with {self.student_user.full_name()}\r\n', content)
+        self.assertTrue(content.endswith('END:VCALENDAR\r\n'))
+
+    def test_student_feed_has_their_lessons(self):
+        content = self._content(self.client.get(self.student_url))
+        self.assertIn(f'UID:lesson-booking-{self.lesson_booking.id}@msms', content)
+        self.assertIn(self.teacher_user.full_name(), content)
+
+    def test_feed_is_not_found_for_invalid_token(self):
+        response = self.client.get(self.teacher_url.replace('.ics', 'x.ics'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_token_is_the_same_every_time(self):
+        with patch('time.time', return_value=0):
+            token = CalendarFeedHelper().token_for('teacher', self.teacher_user.teacher_profile.id)
+        self.assertIn(token, self.teacher_url)
+
+    def test_feed_is_not_found_for_deleted_teacher(self):
+        self.teacher_user.delete()
+        response = self.client.get(self.teacher_url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_unchanged_feed_is_not_sent_again(self):
+        response = self.client.get(self.teacher_url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(self.teacher_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed_feed_is_sent_again(self):
+        etag = self.client.get(self.teacher_url)['ETag']
+        self.lesson_booking.regular_start_time = time(hour=10)
+        self.lesson_booking.save()
+
+        response = self.client.get(self.teacher_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('T100000', self._content(response))
+
+    def test_removed_booking_changes_feed(self):
+        etag = self.client.get(self.teacher_url)['ETag']
+        self.lesson_booking.delete()
+
+        response = self.client.get(self.teacher_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('BEGIN:VEVENT', self._content(response))
+
+    def test_dashboard_shows_feed_address(self):
+        self._log_in_as_teacher()
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'http://testserver' + self.teacher_url)
+
+    def test_long_lines_are_folded(self):
+        line = CalendarFeedHelper()._fold('SUMMARY:' + 'a' * 200)
+        self.assertTrue(all(len(part) <= 75 for part in line.split('\r\n')))
+        self.assertEqual(line.replace('\r\n ', ''), 'SUMMARY:' + 'a' * 200)
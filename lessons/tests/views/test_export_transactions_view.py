@@ -0,0 +1,120 @@
+from django.test import TestCase
+from lessons.forms.user_forms import *
+from django.urls import reverse
+from ..helpers import *
+from django.core.management import call_command
+from lessons.helpers import TransactionExportHelper
+from contextlib import redirect_stdout
+from io import StringIO
+import json
+from datetime import date
+
+class ExportTransactionsViewTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper, TransferHelper):
+    """
+    Contains the test cases for the export transactions view
+    """
+
+    def setUp(self):
+        """
+        Two students each with a booking and a transfer, plus an older transfer
+        """
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_secondary_student_user()
+        self._create_school_term()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self.lesson_booking = self.admin_user.admin_profile.lesson_bookings.first()
+        self._create_transfer(self.lesson_booking)
+        self._assign_lesson_request_to_user(self.student_user_2)
+        self._assign_lesson_booking_to_lesson_request(self.student_user_2.student_profile.lesson_requests.first())
+        self._create_transfer(self.admin_user.admin_profile.lesson_bookings.last())
+
+        self.old_transfer = Transfer.objects.create(date=date(2020, 1, 1), balance=100, lesson_booking=self.lesson_booking)
+
+        self.url = reverse('export_transactions')
+
+    def _export(self, **params):
+        """
+        Returns the decoded body of an export
+        """
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    """
+    Test cases
+    """
+
+    def test_export_transactions_url(self):
+        self.assertEqual(self.url, '/transactions-export/')
+
+    def test_view_restricted_for_guest(self):
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_login(response)
+
+    def test_view_restricted_for_student(self):
+        self._log_in_as_student()
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_dashboard(response=response, dashboard_type=UserType.STUDENT)
+
+    def test_get_export_form(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'templates/transfer/export_transactions.html')
+        self.assertTrue(isinstance(response.context['form'], ExportTransactionsForm))
+
+    def test_export_csv_has_running_balance(self):
+        self._log_in_as_admin()
+        lines = self._export(format='csv').strip().split('\r\n')
+
+        self.assertEqual(lines[0], ','.join(TransactionExportHelper.COLUMNS))
+        self.assertEqual(len(lines), 6)
+
+        # Oldest transfer comes first, today's invoices come before today's payments
+        self.assertTrue(lines[1].startswith('2020-01-01,Payment,'))
+        self.assertEqual(lines[-1].split(',')[-1], '580.00')
+        self.assertIn(self.lesson_booking.invoice_number(), lines[2])
+        self.assertIn('Jane Doe', lines[2])
+
+    def test_export_jsonl(self):
+        self._log_in_as_admin()
+        rows = [json.loads(line) for line in self._export(format='jsonl').splitlines()]
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual([row['type'] for row in rows], ['Payment', 'Invoice', 'Invoice', 'Payment', 'Payment'])
+        self.assertEqual(rows[1]['running_balance'], '90.00')
+
+    def test_export_filtered_by_date_keeps_opening_balance(self):
+        self._log_in_as_admin()
+        rows = [json.loads(line) for line in self._export(format='jsonl', start_date=date.today().isoformat()).splitlines()]
+
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['running_balance'], '90.00')
+
+    def test_export_filtered_by_term(self):
+        self._log_in_as_admin()
+        self._create_school_next_term()
+        rows = self._export(format='jsonl', school_term=self.school_term.id).splitlines()
+
+        self.assertEqual(rows, [])
+
+    def test_invalid_date_range_shows_form(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url, {'format': 'csv', 'start_date': '2022-02-01', 'end_date': '2022-01-01'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'templates/transfer/export_transactions.html')
+        self.assertFalse(response.streaming)
+
+    def test_export_transactions_command(self):
+        output = StringIO()
+        with redirect_stdout(output):
+            call_command('export_transactions', '--format', 'jsonl', '--to', '2020-12-31')
+
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['amount'], '100.00')
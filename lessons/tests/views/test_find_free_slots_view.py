@@ -0,0 +1,86 @@
+from django.test import TestCase
+from django.urls import reverse
+from datetime import time
+from ..helpers import *
+
+class FindFreeSlotsViewTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for the free slot finder
+    """
+
+    def setUp(self):
+        """
+        A teacher who teaches another student on Mondays at 9:00, and a request for Monday or Tuesday lessons
+        """
+        self._create_student_user()
+        self._create_secondary_student_user()
+        self._create_admin_user()
+        self._create_director_user()
+        self._create_teacher_user()
+        self._create_secondary_teacher_user()
+        self._create_school_term()
+
+        self._assign_lesson_request_to_user(self.student_user_2)
+        self._assign_lesson_booking_to_lesson_request(self.student_user_2.student_profile.lesson_requests.first())
+        lesson_booking = LessonBooking.objects.get(lesson_request__student_profile=self.student_user_2.student_profile)
+        lesson_booking.regular_start_time = time(hour=9)
+        lesson_booking.start_date = self.school_term.start_date
+        lesson_booking.end_date = self.school_term.end_date
+        lesson_booking.quantity = 12
+        lesson_booking.save()
+
+        self._assign_lesson_request_to_user(self.student_user)
+        self.lesson_request = self.student_user.student_profile.lesson_requests.first()
+        self.url = reverse('find_free_slots', kwargs={'id': self.lesson_request.id})
+
+    def _slots(self, response, teacher_user):
+        """
+        Returns the (day, start time) slots in the response for a teacher
+        """
+        return {(slot['day'], slot['start_time']) for slot in response.json()['slots'] if slot['teacher'] == teacher_user.teacher_profile.id}
+
+    """
+    Test cases
+    """
+
+    def test_find_free_slots_url(self):
+        self.assertEqual(self.url, f'/lesson-requests/book/{self.lesson_request.id}/free-slots/')
+
+    def test_view_restricted_for_guest(self):
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_login(response)
+
+    def test_view_restricted_for_student(self):
+        self._log_in_as_student()
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_dashboard(response=response, dashboard_type=UserType.STUDENT)
+
+    def test_booked_teacher_is_not_offered_clashing_slots(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url, {'school_term': self.school_term.id})
+        self.assertEqual(response.status_code, 200)
+
+        slots = self._slots(response, self.teacher_user)
+        self.assertNotIn(('MONDAY', '09:00'), slots)
+        self.assertNotIn(('MONDAY', '08:00'), slots)
+        self.assertNotIn(('MONDAY', '10:00'), slots)
+        self.assertIn(('MONDAY', '10:15'), slots)
+        self.assertIn(('TUESDAY', '09:00'), slots)
+        self.assertIn(('MONDAY', '09:00'), self._slots(response, self.teacher_user_2))
+
+    def test_slots_are_only_on_available_days(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url)
+        days = {slot['day'] for slot in response.json()['slots']}
+        self.assertEqual(days, {'MONDAY', 'TUESDAY'})
+
+    def test_fulfilled_request_is_not_found(self):
+        self._log_in_as_admin()
+        url = reverse('find_free_slots', kwargs={'id': self.student_user_2.student_profile.lesson_requests.first().id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_school_term_is_not_found(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url, {'school_term': 'abc'})
+        self.assertEqual(response.status_code, 404)
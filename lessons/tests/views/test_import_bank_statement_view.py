@@ -0,0 +1,217 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from contextlib import redirect_stdout
+from io import StringIO
+from datetime import date, timedelta
+from decimal import Decimal
+from lessons.helpers import BankStatementImportHelper
+from lessons.models import StudentAccount
+from ..helpers import *
+import tempfile
+import os
+import csv
+
+class ImportBankStatementViewTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper, TransferHelper):
+    """
+    Contains the test cases for importing bank statements
+    """
+
+    def setUp(self):
+        """
+        Two students with one booking each, the first of which has a transfer registered against it
+        """
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_secondary_student_user()
+        self._create_school_term()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self._assign_lesson_request_to_user(self.student_user_2)
+        self._assign_lesson_booking_to_lesson_request(self.student_user_2.student_profile.lesson_requests.first())
+        self.lesson_booking = LessonBooking.objects.get(lesson_request__student_profile=self.student_user.student_profile)
+        self.lesson_booking_2 = LessonBooking.objects.get(lesson_request__student_profile=self.student_user_2.student_profile)
+        self._create_transfer(self.lesson_booking)
+
+        self.url = reverse('import_bank_statement')
+        self.yesterday = date.today() - timedelta(days=1)
+
+    def _statement(self, *rows):
+        """
+        Returns the lines of a bank statement CSV with the given (date, amount, reference) rows
+        """
+        return ['date,amount,reference\n'] + [f'{row[0]},{row[1]},{row[2]}\n' for row in rows]
+
+    def _upload(self, lines, dry_run=False):
+        """
+        Posts the statement to the import view
+        """
+        statement = SimpleUploadedFile('statement.csv', ''.join(lines).encode(), content_type='text/csv')
+        data = {'statement': statement}
+        if dry_run:
+            data['dry_run'] = 'on'
+        return self.client.post(self.url, data)
+
+    """
+    Test cases
+    """
+
+    def test_valid_lines_are_registered(self):
+        report = BankStatementImportHelper().import_statement(self._statement(
+            (self.yesterday.isoformat(), '5.00', self.lesson_booking_2.invoice_number()),
+            (date.today().strftime('%d/%m/%Y'), '5', self.lesson_booking_2.invoice_number()),
+        ))
+        self.assertEqual(len(report.imported), 2)
+        self.assertFalse(report.has_problems())
+        self.assertEqual(Transfer.objects.filter(lesson_booking=self.lesson_booking_2, date=self.yesterday).get().balance, Decimal('5.00'))
+        self.assertEqual(Transfer.objects.filter(lesson_booking=self.lesson_booking_2, date=date.today()).get().balance, Decimal('5.00'))
+
+    def test_invoice_references_are_resolved_in_batches(self):
+        rows = [(self.yesterday.isoformat(), '1', self.lesson_booking_2.invoice_number()) for _ in range(5)]
+        rows = [(self.yesterday - timedelta(days=index), amount, reference) for index, (_, amount, reference) in enumerate(rows)]
+        # One query each for the invoices, their transfers and the insert, four to refresh the account,
+        # one to check for closed terms, and the savepoints
+        with self.assertNumQueries(12):
+            report = BankStatementImportHelper().import_statement(self._statement(*rows))
+        self.assertEqual(len(report.imported), 5)
+
+    def test_accounts_are_refreshed_after_import(self):
+        BankStatementImportHelper().import_statement(self._statement(
+            (self.yesterday.isoformat(), '4', self.lesson_booking_2.invoice_number()),
+        ))
+        self.assertEqual(StudentAccount.objects.get(student_profile=self.student_user_2.student_profile).balance, Decimal('-6.00'))
+
+    def test_invalid_lines_use_transfer_form_rules(self):
+        report = BankStatementImportHelper().import_statement(self._statement(
+            ((date.today() + timedelta(days=1)).isoformat(), '10', self.lesson_booking_2.invoice_number()),
+            (self.yesterday.isoformat(), '0', self.lesson_booking_2.invoice_number()),
+            (self.yesterday.isoformat(), '-5', self.lesson_booking_2.invoice_number()),
+            ('yesterday', '10', self.lesson_booking_2.invoice_number()),
+        ))
+        self.assertEqual([entry['line'] for entry in report.invalid], [2, 3, 4, 5])
+        self.assertEqual(report.invalid[0]['reason'], 'The transfer date must not be in the future')
+        self.assertEqual(len(report.imported), 0)
+        self.assertFalse(Transfer.objects.filter(lesson_booking=self.lesson_booking_2).exists())
+
+    def test_unmatched_lines_are_reported(self):
+        report = BankStatementImportHelper().import_statement(self._statement(
+            (self.yesterday.isoformat(), '10', '9999-999'),
+        ))
+        self.assertEqual(report.unmatched[0]['reference'], '9999-999')
+        self.assertEqual(Transfer.objects.count(), 1)
+
+    def test_duplicate_lines_are_reported_and_skipped(self):
+        report = BankStatementImportHelper().import_statement(self._statement(
+            (date.today().isoformat(), '250', self.lesson_booking.invoice_number()),
+            (self.yesterday.isoformat(), '3', self.lesson_booking_2.invoice_number()),
+            (self.yesterday.isoformat(), '3', self.lesson_booking_2.invoice_number()),
+        ))
+        self.assertEqual(len(report.duplicates), 2)
+        self.assertEqual(report.duplicates[1]['reason'], 'Repeats line 3 of the statement')
+        self.assertEqual(Transfer.objects.count(), 2)
+
+    def test_overpaid_lines_are_registered_and_reported(self):
+        report = BankStatementImportHelper().import_statement(self._statement(
+            (self.yesterday.isoformat(), '6', self.lesson_booking_2.invoice_number()),
+            (self.yesterday.isoformat(), '6.50', self.lesson_booking_2.invoice_number()),
+        ))
+        self.assertEqual([entry['line'] for entry in report.overpaid], [3])
+        self.assertEqual(len(report.imported), 2)
+
+    def test_dry_run_registers_nothing(self):
+        report = BankStatementImportHelper().import_statement(self._statement(
+            (self.yesterday.isoformat(), '10', self.lesson_booking_2.invoice_number()),
+        ), dry_run=True)
+        self.assertEqual(len(report.imported), 1)
+        self.assertEqual(Transfer.objects.count(), 1)
+
+    def test_missing_columns_are_rejected(self):
+        with self.assertRaises(ValueError):
+            BankStatementImportHelper().import_statement(['date,reference\n', '2022-01-01,0001-001\n'])
+
+    def test_malformed_statement_is_rejected(self):
+        lines = self._statement((self.yesterday.isoformat(), '10', 'x' * (csv.field_size_limit() + 1)))
+        with self.assertRaisesMessage(ValueError, 'The statement could not be read as CSV'):
+            BankStatementImportHelper().import_statement(lines)
+        self.assertEqual(Transfer.objects.count(), 1)
+
+    def test_get_import_view_as_admin(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'templates/transfer/import_bank_statement.html')
+
+    def test_import_bank_statement_url(self):
+        self.assertEqual(self.url, '/transactions-import/')
+
+    def test_view_restricted_for_guest(self):
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_login(response)
+
+    def test_view_restricted_for_student(self):
+        self._log_in_as_student()
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_dashboard(response=response, dashboard_type=UserType.STUDENT)
+
+    def test_upload_registers_transfers_and_shows_report(self):
+        self._log_in_as_admin()
+        response = self._upload(self._statement(
+            (self.yesterday.isoformat(), '10', self.lesson_booking_2.invoice_number()),
+            (self.yesterday.isoformat(), '10', '9999-999'),
+        ))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Transfer.objects.count(), 2)
+        self.assertEqual(len(response.context['report'].unmatched), 1)
+        self.assertContains(response, '9999-999')
+
+    def test_upload_dry_run(self):
+        self._log_in_as_admin()
+        response = self._upload(self._statement((self.yesterday.isoformat(), '10', self.lesson_booking_2.invoice_number())), dry_run=True)
+        self.assertEqual(len(response.context['report'].imported), 1)
+        self.assertEqual(Transfer.objects.count(), 1)
+
+    def test_upload_with_missing_columns_shows_error(self):
+        self._log_in_as_admin()
+        response = self._upload(['when,amount\n'])
+        self.assertIsNone(response.context['report'])
+        self.assertTrue(response.context['form'].errors['statement'])
+
+    def test_upload_of_malformed_statement_shows_error(self):
+        self._log_in_as_admin()
+        response = self._upload(self._statement((self.yesterday.isoformat(), '10', 'x' * (csv.field_size_limit() + 1))))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['report'])
+        self.assertIn('The statement could not be read as CSV', response.context['form'].errors['statement'][0])
+
+    def test_command_imports_statement(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as statement:
+            statement.writelines(self._statement(
+                (self.yesterday.isoformat(), '10', self.lesson_booking_2.invoice_number()),
+                (self.yesterday.isoformat(), '10', '9999-999'),
+            ))
+        try:
+            output = StringIO()
+            with redirect_stdout(output):
+                call_command('import_bank_statement', statement.name)
+        finally:
+            os.remove(statement.name)
+
+        self.assertIn('1 transfers registered', output.getvalue())
+        self.assertIn('Unmatched: 1', output.getvalue())
+        self.assertEqual(Transfer.objects.count(), 2)
+
+    def test_command_with_missing_file(self):
+        with self.assertRaises(CommandError):
+            call_command('import_bank_statement', '/nonexistent/statement.csv')
+
+    def test_command_with_malformed_statement(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as statement:
+            statement.writelines(self._statement((self.yesterday.isoformat(), '10', 'x' * (csv.field_size_limit() + 1))))
+        try:
+            with self.assertRaisesMessage(CommandError, 'The statement could not be read as CSV'):
+                call_command('import_bank_statement', statement.name)
+        finally:
+            os.remove(statement.name)
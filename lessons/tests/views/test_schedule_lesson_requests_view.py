@@ -0,0 +1,73 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib import messages
+from ..helpers import *
+
+class ScheduleLessonRequestsViewTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for booking every unfulfilled lesson request at once
+    """
+
+    def setUp(self):
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_school_term()
+        self._assign_lesson_request_to_user(self.student_user)
+
+        self.url = reverse('schedule_lesson_requests')
+        self.form_input = {'school_term': self.school_term.id, 'dry_run': 'on'}
+
+    """
+    Test cases
+    """
+
+    def test_schedule_lesson_requests_url(self):
+        self.assertEqual(self.url, '/lesson-requests/schedule/')
+
+    def test_view_restricted_for_guest(self):
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_login(response)
+
+    def test_view_restricted_for_student(self):
+        self._log_in_as_student()
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_dashboard(response=response, dashboard_type=UserType.STUDENT)
+
+    def test_get_schedule_lesson_requests(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'templates/lesson/schedule_lesson_requests.html')
+        self.assertIsNone(response.context['plan'])
+
+    def test_dry_run_shows_plan(self):
+        self._log_in_as_admin()
+        before_count = LessonBooking.objects.count()
+        response = self.client.post(self.url, self.form_input)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['plan'].lesson_bookings), 1)
+        self.assertContains(response, self.teacher_user.full_name())
+        self.assertEqual(LessonBooking.objects.count(), before_count)
+
+    def test_plan_shows_bookings_with_fewer_lessons_than_requested(self):
+        self._log_in_as_admin()
+        lesson_request = self.student_user.student_profile.lesson_requests.first()
+        lesson_request.quantity = 100
+        lesson_request.save()
+        response = self.client.post(self.url, self.form_input)
+        lesson_booking = response.context['plan'].lesson_bookings[0]
+        self.assertEqual(response.context['plan'].shortfalls, [lesson_booking])
+        self.assertContains(response, f'{lesson_booking.quantity} of 100 requested')
+        messages_list = list(response.context['messages'])
+        self.assertEqual(messages_list[-1].level, messages.WARNING)
+
+    def test_schedule_books_lessons(self):
+        self._log_in_as_admin()
+        self.form_input['dry_run'] = ''
+        response = self.client.post(self.url, self.form_input)
+        self.assertEqual(response.status_code, 200)
+
+        lesson_booking = LessonBooking.objects.get()
+        self.assertEqual(lesson_booking.lesson_request, self.student_user.student_profile.lesson_requests.first())
+        self.assertEqual(lesson_booking.admin_profile, self.admin_user.admin_profile)
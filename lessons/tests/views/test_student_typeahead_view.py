@@ -0,0 +1,69 @@
+from django.test import TestCase
+from django.urls import reverse
+from lessons.helpers import StudentTypeaheadIndex
+from ..helpers import *
+
+class StudentTypeaheadViewTestCase(TestCase, LoginHelper):
+    """
+    Contains the test cases for the student typeahead
+    """
+
+    def setUp(self):
+        StudentTypeaheadIndex._index = None
+        self.url = reverse('student_typeahead')
+        self._create_student_user()
+        self._create_secondary_student_user()
+        self._create_admin_user()
+        self._create_director_user()
+
+    """
+    Test cases
+    """
+
+    def test_student_typeahead_url(self):
+        self.assertEqual(self.url, '/students/typeahead/')
+
+    def test_view_restricted_for_guest(self):
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_login(response)
+
+    def test_view_restricted_for_student(self):
+        self._log_in_as_student()
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_dashboard(response=response, dashboard_type=UserType.STUDENT)
+
+    def test_admin_gets_matching_students(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url, {'q': 'jo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'students': [{
+            'id': self.student_user_2.student_profile.id,
+            'user': self.student_user_2.id,
+            'name': 'John Doe',
+            'email': 'student_2@example.com',
+        }]})
+
+    def test_director_can_use_typeahead(self):
+        self._log_in_as_director()
+        response = self.client.get(self.url, {'q': 'doe'})
+        self.assertEqual(len(response.json()['students']), 2)
+
+    def test_limit_is_applied(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url, {'q': 'doe', 'limit': '1'})
+        self.assertEqual(len(response.json()['students']), 1)
+
+    def test_invalid_limit_uses_default(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url, {'q': 'doe', 'limit': 'lots'})
+        self.assertEqual(len(response.json()['students']), 2)
+
+    def test_missing_query_returns_nobody(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url)
+        self.assertEqual(response.json(), {'students': []})
+
+    def test_post_is_not_allowed(self):
+        self._log_in_as_admin()
+        response = self.client.post(self.url, {'q': 'doe'})
+        self.assertEqual(response.status_code, 405)
@@ -3,6 +3,11 @@ from lessons.forms.user_forms import *
 from django.urls import reverse
 from ..helpers import *
 from django.contrib import messages
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+from lessons.helpers import TransactionModelHelper
+from decimal import Decimal
 
 class ViewAllTransactionsViewTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper, TransferHelper):
     """
@@ -90,3 +95,43 @@ class ViewAllTransactionsViewTestCase(TestCase, LoginHelper, LessonHelper, Schoo
 
         response = self.client.get(self.url, follow=True)
         self.assert_redirected_to_dashboard(response=response, dashboard_type=UserType.TEACHER)
+
+    def test_number_of_queries_does_not_grow_with_transactions(self):
+        self._log_in_as_admin()
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        queries_before = len(context.captured_queries)
+
+        # Add several more transfers to the school ledger
+        for i in range(5):
+            self._create_transfer(self.lesson_booking)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(response.context['transactions']), 9)
+        self.assertEqual(len(context.captured_queries), queries_before)
+
+    def test_sender_is_displayed_for_each_transaction(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url)
+
+        names = [transaction.student_name for transaction in response.context['transactions']]
+        self.assertEqual(sorted(names), sorted([self.student_user.full_name()] * 2 + [self.student_user_2.full_name()] * 2))
+
+    def test_transactions_are_paginated(self):
+        self._log_in_as_admin()
+
+        with patch.object(TransactionModelHelper, 'TRANSACTIONS_PER_PAGE', 3):
+            response = self.client.get(self.url)
+            self.assertEqual(len(response.context['transactions']), 3)
+            self.assertIsNotNone(response.context['next_cursor'])
+            self.assertContains(response, f"?before={ response.context['next_cursor'] }")
+
+            response = self.client.get(self.url, {'before': response.context['next_cursor']})
+            self.assertEqual(len(response.context['transactions']), 1)
+            self.assertIsNone(response.context['next_cursor'])
+
+        # Balance in the header is for the whole school, whichever page is shown
+        self.assertEqual(response.context['current_balance'], Decimal(480))
@@ -0,0 +1,119 @@
+from django.test import TestCase
+from django.urls import reverse
+from decimal import Decimal
+from lessons.helpers import ArrearsReportHelper
+from ..helpers import *
+
+class ViewArrearsViewTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper, TransferHelper):
+    """
+    Contains the test cases for the arrears report
+    """
+
+    def setUp(self):
+        """
+        One student who has paid for their booking and one who hasn't paid anything
+        """
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_director_user()
+        self._create_teacher_user()
+        self._create_secondary_student_user()
+        self._create_school_term()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+        self._create_transfer(LessonBooking.objects.get(lesson_request__student_profile=self.student_user.student_profile))
+        self._assign_lesson_request_to_user(self.student_user_2)
+        self._assign_lesson_booking_to_lesson_request(self.student_user_2.student_profile.lesson_requests.first())
+        self.unpaid_lesson_booking = LessonBooking.objects.get(lesson_request__student_profile=self.student_user_2.student_profile)
+
+        self.url = reverse('view_arrears')
+
+    """
+    Test cases
+    """
+
+    def test_view_arrears_url(self):
+        self.assertEqual(self.url, '/arrears/')
+
+    def test_view_restricted_for_guest(self):
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_login(response)
+
+    def test_view_restricted_for_admin(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_dashboard(response=response, dashboard_type=UserType.ADMIN)
+
+    def test_only_students_with_negative_balance_are_listed(self):
+        self._log_in_as_director()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'templates/director/view_arrears.html')
+
+        accounts = list(response.context['accounts'])
+        self.assertEqual([account.student_profile_id for account in accounts], [self.student_user_2.student_profile.id])
+        self.assertEqual(accounts[0].balance, Decimal('-10.00'))
+
+    def test_oldest_unpaid_invoice_is_shown(self):
+        self._log_in_as_director()
+        response = self.client.get(self.url)
+        invoice = response.context['accounts'][0].oldest_unpaid_invoice
+        self.assertEqual(invoice['invoice_reference'], self.unpaid_lesson_booking.invoice_number())
+        self.assertEqual(invoice['school_term__label'], self.school_term.label)
+        self.assertContains(response, self.unpaid_lesson_booking.invoice_number())
+
+    def test_partly_paid_invoice_is_still_unpaid(self):
+        Transfer.objects.create(date=self.unpaid_lesson_booking.start_date, balance=4, lesson_booking=self.unpaid_lesson_booking)
+        oldest = ArrearsReportHelper().oldest_unpaid_invoices([self.student_user_2.student_profile.id])
+        self.assertEqual(oldest[self.student_user_2.student_profile.id]['paid'], Decimal('4'))
+
+    def test_fully_paid_invoices_are_not_unpaid(self):
+        oldest = ArrearsReportHelper().oldest_unpaid_invoices([self.student_user.student_profile.id])
+        self.assertEqual(oldest, {})
+
+    def test_sort_by_amount_lists_most_owed_first(self):
+        Transfer.objects.all().delete()
+        helper = ArrearsReportHelper()
+        student_profile_ids = [account.student_profile_id for account in helper.students_in_arrears('amount')]
+        self.assertEqual(len(student_profile_ids), 2)
+
+        Transfer.objects.create(date=self.unpaid_lesson_booking.start_date, balance=4, lesson_booking=self.unpaid_lesson_booking)
+        student_profile_ids = [account.student_profile_id for account in helper.students_in_arrears('amount')]
+        self.assertEqual(student_profile_ids, [self.student_user.student_profile.id, self.student_user_2.student_profile.id])
+
+    def test_sort_by_name(self):
+        Transfer.objects.all().delete()
+        accounts = ArrearsReportHelper().students_in_arrears('name')
+        names = [(account.student_profile.user.last_name, account.student_profile.user.first_name) for account in accounts]
+        self.assertEqual(names, sorted(names))
+
+    def test_unknown_sort_falls_back_to_amount(self):
+        self._log_in_as_director()
+        response = self.client.get(self.url, {'sort': 'password'})
+        self.assertEqual(response.context['sort'], 'amount')
+
+    def test_report_is_paginated(self):
+        Transfer.objects.all().delete()
+        self._log_in_as_director()
+        first = self.client.get(self.url, {'page_size': 1}).context['page']
+        self.assertIsNotNone(first.next_query)
+        second = self.client.get(self.url + '?' + first.next_query).context['page']
+        self.assertIsNone(second.next_query)
+        self.assertNotEqual(first.items[0].student_profile_id, second.items[0].student_profile_id)
+
+    def test_pages_keep_the_sort_order(self):
+        Transfer.objects.all().delete()
+        Transfer.objects.create(date=self.unpaid_lesson_booking.start_date, balance=4, lesson_booking=self.unpaid_lesson_booking)
+        self._log_in_as_director()
+        first = self.client.get(self.url, {'sort': 'amount', 'page_size': 1}).context['page']
+        self.assertIn('sort=amount', first.next_query)
+        second = self.client.get(self.url + '?' + first.next_query).context['page']
+        self.assertEqual([first.items[0].student_profile_id, second.items[0].student_profile_id],
+            [self.student_user.student_profile.id, self.student_user_2.student_profile.id])
+
+    def test_query_count_does_not_grow_with_page(self):
+        self._log_in_as_director()
+        self.client.get(self.url)
+        # Session and user, then the page of accounts and the unpaid invoices, without counting the accounts
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
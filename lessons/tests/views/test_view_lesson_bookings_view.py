@@ -245,3 +245,29 @@ class ViewLessonBookingsViewTestCase(TestCase, LoginHelper, LessonHelper, School
         # Should display 0 user
         lesson_bookings_displayed = response.context['lesson_bookings']
         self.assertEqual(len(lesson_bookings_displayed), 0)
+
+    def test_admin_can_filter_by_teacher_and_sort(self):
+        self._log_in_as_admin()
+
+        response = self.client.get(self.url, {'teacher': self.teacher_user_2.teacher_profile.id, 'regular_day': 'MONDAY'})
+        lesson_bookings_displayed = response.context['lesson_bookings']
+        self.assertEqual(len(lesson_bookings_displayed), 1)
+        self.assertEqual(lesson_bookings_displayed[0].teacher, self.teacher_user_2.teacher_profile)
+
+        response = self.client.get(self.url, {'sort': 'newest'})
+        ids = [lesson_booking.id for lesson_booking in response.context['lesson_bookings']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_invalid_filters_are_shown_and_ignored(self):
+        self._log_in_as_admin()
+
+        response = self.client.get(self.url, {'from_date': '2022-02-01', 'until_date': '2022-01-01'})
+        self.assertEqual(len(response.context['lesson_bookings']), 2)
+        self.assertContains(response, 'The end of the date range cannot be before its start')
+
+    def test_teacher_is_not_offered_the_teacher_filter(self):
+        self._log_in_as_teacher()
+
+        response = self.client.get(self.url, {'regular_day': 'TUESDAY'})
+        self.assertNotIn('teacher', response.context['filter_form'].fields)
+        self.assertEqual(len(response.context['lesson_bookings']), 0)
@@ -1,10 +1,11 @@
 from django.test import TestCase
 from lessons.forms.user_forms import *
 from django.urls import reverse
-from ..helpers import LoginHelper, LessonHelper
+from ..helpers import LoginHelper, LessonHelper, SchoolTermHelper
 from django.contrib import messages
+from lessons.helpers import ListPaginationHelper
 
-class ViewLessonRequestsViewTestCase(TestCase, LoginHelper, LessonHelper):
+class ViewLessonRequestsViewTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
     """
     Contains the test cases for the view lesson requests view
     """
@@ -266,3 +267,46 @@ class ViewLessonRequestsViewTestCase(TestCase, LoginHelper, LessonHelper):
         # Should display 0 user
         lesson_requests_displayed = response.context['lesson_requests']
         self.assertEqual(len(lesson_requests_displayed), 0)
+
+    def test_lesson_requests_are_paged_unfulfilled_first(self):
+        self._create_student_user()
+        self._create_secondary_student_user()
+        self._create_admin_user()
+        self._create_teacher_user()
+        self._create_school_term()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_request_to_user(self.student_user_2)
+        self._assign_lesson_request_to_user(self.student_user)
+        fulfilled_request = self.student_user_2.student_profile.lesson_requests.first()
+        self._assign_lesson_booking_to_lesson_request(fulfilled_request)
+
+        self._log_in_as_admin()
+
+        shown = []
+        response = self.client.get(self.url, {'page_size': 2, 'search_term': 'doe'})
+        shown.extend(response.context['lesson_requests'])
+        self.assertEqual(len(shown), 2)
+        self.assertIsNone(response.context['page'].first_query)
+        self.assertContains(response, 'Next page')
+
+        response = self.client.get(self.url + '?' + response.context['page'].next_query)
+        shown.extend(response.context['lesson_requests'])
+        self.assertNotContains(response, 'Next page')
+        self.assertContains(response, 'First page')
+
+        # Every request is shown once, with the fulfilled one last, and the search is still reported
+        self.assertEqual(len(shown), 3)
+        self.assertEqual(shown[-1], fulfilled_request)
+        self.assertEqual(str(list(response.context['messages'])[0]), 'Found 3 lesson requests that matched your search term.')
+
+    def test_changed_page_link_shows_the_first_page(self):
+        self._create_student_user()
+        self._create_admin_user()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._log_in_as_admin()
+
+        for values in [['x', 1], [False, 'x']]:
+            response = self.client.get(self.url, {'after': ListPaginationHelper().encode_cursor(values)})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['lesson_requests']), 1)
+            self.assertIsNone(response.context['page'].first_query)
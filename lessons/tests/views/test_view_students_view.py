@@ -164,3 +164,16 @@ class ViewStudentsViewTestCase(TestCase, LoginHelper):
         # Should display 0 student
         students_displayed = response.context['students']
         self.assertEqual(len(students_displayed), 0)
+
+    def test_search_results_are_paged(self):
+        self._log_in_as_admin()
+
+        response = self.client.get(self.url, {'search_term': 'doe', 'page_size': 1})
+        self.assertEqual(len(response.context['students']), 1)
+        first_student = response.context['students'][0]
+        self.assertEqual(str(list(response.context['messages'])[0]), 'Found 2 students that matched your search term.')
+
+        response = self.client.get(self.url + '?' + response.context['page'].next_query)
+        self.assertEqual(len(response.context['students']), 1)
+        self.assertNotEqual(response.context['students'][0], first_student)
+        self.assertIsNone(response.context['page'].next_query)
@@ -0,0 +1,66 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.core.cache import cache
+from ..helpers import *
+
+class ViewUtilizationViewTestCase(TestCase, LoginHelper, LessonHelper, SchoolTermHelper):
+    """
+    Contains the test cases for the teacher utilization report
+    """
+
+    def setUp(self):
+        cache.clear()
+        self._create_student_user()
+        self._create_admin_user()
+        self._create_director_user()
+        self._create_teacher_user()
+        self._create_school_term()
+        self._assign_lesson_request_to_user(self.student_user)
+        self._assign_lesson_booking_to_lesson_request(self.student_user.student_profile.lesson_requests.first())
+
+        self.url = reverse('view_utilization')
+
+    """
+    Test cases
+    """
+
+    def test_view_utilization_url(self):
+        self.assertEqual(self.url, '/teachers/utilization/')
+
+    def test_view_restricted_for_guest(self):
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_login(response)
+
+    def test_view_restricted_for_admin(self):
+        self._log_in_as_admin()
+        response = self.client.get(self.url, follow=True)
+        self.assert_redirected_to_dashboard(response=response, dashboard_type=UserType.ADMIN)
+
+    def test_get_view_utilization(self):
+        self._log_in_as_director()
+        response = self.client.get(self.url, {'term': self.school_term.id, 'capacity': '45'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'templates/director/view_utilization.html')
+        self.assertEqual(response.context['capacity'], 45)
+        self.assertEqual(response.context['school_term'], self.school_term)
+        self.assertEqual(list(response.context['teachers'])[0].utilization_minutes, 120)
+        self.assertContains(response, self.teacher_user.full_name())
+
+    def test_invalid_capacity_uses_default(self):
+        self._log_in_as_director()
+        response = self.client.get(self.url, {'capacity': '500'})
+        self.assertEqual(response.context['capacity'], 60)
+
+    def test_report_is_paginated_keeping_term_and_capacity(self):
+        self._create_secondary_teacher_user()
+        self._log_in_as_director()
+        response = self.client.get(self.url, {'term': self.school_term.id, 'capacity': '45', 'page_size': 1})
+        page = response.context['page']
+        self.assertEqual(len(page.items), 1)
+        self.assertContains(response, page.next_query.replace('&', '&amp;'))
+
+        response = self.client.get(self.url + '?' + page.next_query)
+        self.assertEqual(response.context['capacity'], 45)
+        self.assertEqual(len(response.context['page'].items), 1)
+        self.assertNotEqual(response.context['page'].items[0], page.items[0])
+        self.assertIsNone(response.context['page'].next_query)
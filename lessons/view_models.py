@@ -5,39 +5,66 @@ class TransactionViewModel:
     Used to display transaction within templates
     Acts as an interface for transfers and invoices
     """
+    # Ledgers can hold a great many transactions, so instances are kept free of a __dict__
+    __slots__ = ('id', 'date', 'fee', 'balance', 'reference', 'is_payment', 'lesson_booking_id', 'lesson_booking', 'student', 'student_name')
+
+    # The order of the values a ledger row is made of
+    LEDGER_COLUMNS = ('is_payment', 'id', 'date', 'fee', 'lesson_booking_id', 'invoice_reference', 'student_profile_id')
+
     def __init__(self, **kwargs):
         """
-        Check to see if transaction is being created from transfer or invoices
+        Check to see if transaction is being created from transfer, invoices or a row of the ledger
         """
         if 'transfer' in kwargs:
             transfer = kwargs.get('transfer')
 
+            self.id = transfer.id
             self.date = transfer.date
             self.fee = transfer.balance
             self.reference = "Payment"
+            self.is_payment = True
+            self.lesson_booking_id = transfer.lesson_booking_id
             self.student = transfer.lesson_booking.lesson_request.student_profile
+            self.student_name = self.student.user.full_name()
 
         if 'lesson_booking' in kwargs:
             lesson_booking = kwargs.get('lesson_booking')
 
+            self.id = lesson_booking.id
             self.date = lesson_booking.start_date_actual()
             self.fee = lesson_booking.calculate_total_price() * -1
             self.reference = lesson_booking.invoice_number()
+            self.is_payment = False
             self.lesson_booking = lesson_booking
+            self.lesson_booking_id = lesson_booking.id
             self.student = lesson_booking.lesson_request.student_profile
+            self.student_name = self.student.user.full_name()
+
+        if 'ledger_values' in kwargs:
+            # Values are expected to be converted already, and the student's name to be shared between their rows
+            is_payment, self.id, self.date, self.fee, self.lesson_booking_id, invoice_reference, _ = kwargs.get('ledger_values')
+
+            self.balance = kwargs.get('balance')
+            self.is_payment = bool(is_payment)
+            self.student_name = kwargs.get('student_name')
+
+            if self.is_payment:
+                self.reference = "Payment"
+            else:
+                self.reference = invoice_reference
 
     @property
     def formatted_fee(self):
         """
         Returns fee as formatted: e.g. 1.00 GBP
+        Only worked out when a template displays it
         """
-        helper = TransactionModelHelper()
-        return helper.format_to_currency(self.fee)
+        return TransactionModelHelper.format_to_currency(self.fee)
 
     @property
     def formatted_balance(self):
         """
         Returns balance as formatted: e.g. 1.00 GBP
+        Only worked out when a template displays it
         """
-        helper = TransactionModelHelper()
-        return helper.format_to_currency(self.balance)
+        return TransactionModelHelper.format_to_currency(self.balance)
@@ -2,14 +2,16 @@ from django.shortcuts import render, redirect
 from lessons.forms.lesson_forms import *
 from lessons.forms.user_forms import *
 from django.db import transaction
+from django.core.exceptions import ValidationError
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from lessons.models.user_models import User, UserType
 from django.views.decorators.http import require_POST, require_GET
 from lessons.decorators import *
-from django.http import HttpResponse
-from lessons.helpers import SchoolTermModelHelper
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
+from django.views.decorators.http import condition
+from lessons.helpers import SchoolTermModelHelper, FreeSlotHelper, LessonSchedulerHelper, CalendarFeedHelper, LessonSearchHelper, ListPaginationHelper
 
 """
 Generic (no specifc type) - Login required
@@ -105,10 +107,14 @@ def book_lesson(request, id):
         if (request.method == 'POST'):
             form = BookLessonForm(request.user, lesson_request, request.POST)
             if form.is_valid():
-                form.save()
-                messages.add_message(request, messages.SUCCESS,
-                    "The lesson has been successfully booked.")
-                return redirect('view_lesson_requests')
+                try:
+                    form.save()
+                    messages.add_message(request, messages.SUCCESS,
+                        "The lesson has been successfully booked.")
+                    return redirect('view_lesson_requests')
+                except ValidationError as error:
+                    # The teacher was booked by someone else while the form was being submitted
+                    form.add_error('teacher', error)
         else:
             helper = SchoolTermModelHelper()
 
@@ -127,6 +133,65 @@ def book_lesson(request, id):
 
     return redirect('view_lesson_requests')
 
+@login_required
+@user_types_permitted(['ADMIN', 'DIRECTOR'])
+def schedule_lesson_requests(request):
+    """
+    Plans a booking for every unfulfilled lesson request in a term, and books them once the plan has been reviewed
+    """
+    plan = None
+    if request.method == 'POST':
+        form = ScheduleLessonRequestsForm(request.POST)
+        if form.is_valid():
+            dry_run = form.cleaned_data.get('dry_run')
+            admin_profile = AdminProfile.objects.filter(user=request.user).first()
+            plan = LessonSchedulerHelper().schedule(form.cleaned_data.get('school_term'), admin_profile, dry_run=dry_run)
+            if dry_run:
+                messages.add_message(request, messages.INFO, f"{len(plan.lesson_bookings)} lessons would be booked")
+            else:
+                messages.add_message(request, messages.SUCCESS, f"{len(plan.lesson_bookings)} lessons booked")
+            if plan.shortfalls:
+                messages.add_message(request, messages.WARNING,
+                    f"{len(plan.shortfalls)} bookings have fewer lessons than requested, as the term ends before the rest")
+    else:
+        form = ScheduleLessonRequestsForm(initial={'school_term': SchoolTermModelHelper().default_term_for_bookings()})
+
+    return render(request, 'templates/lesson/schedule_lesson_requests.html', {'form': form, 'plan': plan})
+
+@login_required
+@user_types_permitted(['ADMIN', 'DIRECTOR'])
+@require_GET
+def find_free_slots(request, id):
+    """
+    Returns, as JSON, every teacher, day and start time that an unfulfilled lesson request could be booked at
+    The term can be chosen with the school_term parameter, otherwise the default term for bookings is used
+    """
+    lesson_request = LessonRequest.objects.filter(id=id, lesson_booking__isnull=True).first()
+    if lesson_request is None:
+        return JsonResponse({'error': 'The lesson request was either not found or has already been fulfilled.'}, status=404)
+
+    school_term_id = request.GET.get('school_term')
+    if school_term_id:
+        school_term = SchoolTerm.objects.filter(id=school_term_id).first() if school_term_id.isdigit() else None
+    else:
+        school_term = SchoolTermModelHelper().default_term_for_bookings()
+    if school_term is None:
+        return JsonResponse({'error': 'The school term was not found.'}, status=404)
+
+    slots = FreeSlotHelper().free_slots(lesson_request, school_term)
+    return JsonResponse({
+        'lesson_request': lesson_request.id,
+        'school_term': school_term.id,
+        'duration': lesson_request.duration,
+        'interval': lesson_request.interval,
+        'slots': [{
+            'teacher': slot['teacher'].id,
+            'teacher_name': str(slot['teacher']),
+            'day': slot['day'],
+            'start_time': slot['start_time'].strftime('%H:%M'),
+        } for slot in slots],
+    })
+
 @login_required
 def view_lesson_bookings(request):
     """
@@ -150,52 +215,46 @@ def view_lesson_bookings(request):
     elif request.user.type == UserType.ADMIN or request.user.type == UserType.DIRECTOR:
         # Users that possess an AdminProfile can view all lesson_bookings
         search_term = request.GET.get('search_term')
+        helper = ListPaginationHelper()
+        search_helper = LessonSearchHelper()
+        filter_form = FilterLessonBookingsForm(request.GET)
+        # Filters that don't make sense are shown as errors on the form and otherwise ignored
+        filters = filter_form.cleaned_data if filter_form.is_valid() else {}
+        lesson_bookings = search_helper.lesson_bookings(search_term, filters=filters)
+        page = helper.paginate(request, lesson_bookings, keyset=search_helper.lesson_booking_keyset(filters.get('sort')))
+
+        if search_term:
+            results_found = helper.count(lesson_bookings)
+            if results_found == 0:
+                messages.add_message(request, messages.ERROR,
+                        "No lesson bookings with students matching your search term were found.")
+            else:
+                messages.add_message(request, messages.INFO,
+                        f"Found {results_found} lesson bookings that matched your search term.")
 
-        if (search_term):
-            search_term = search_term.lower().strip(' ')
-
-            # Do query outside of django quering language as it uses derrived fields that cannot be operated on via SQL
-            lesson_bookings = list(filter(lambda lesson_booking: search_term in lesson_booking.lesson_request.student_profile.user.full_name().lower() or search_term in lesson_booking.lesson_request.student_profile.user.email.lower(),
-                LessonBooking.objects.all()))
-        else:
-            lesson_bookings = LessonBooking.objects.all()
-
-        results_found = len(lesson_bookings)
-        if results_found == 0 and search_term:
-            # sort lesson bookings by date they start
-            lesson_bookings.sort(key=lambda booking: booking.start_date_actual(), reverse=True)
-            messages.add_message(request, messages.ERROR,
-                    "No lesson bookings with students matching your search term were found.")
-        elif search_term:
-            messages.add_message(request, messages.INFO,
-                    f"Found {results_found} lesson bookings that matched your search term.")
-
-        return render(request, 'templates/lesson/view_lesson_bookings_extended.html', {'lesson_bookings': lesson_bookings, 'teacher': False})
+        return render(request, 'templates/lesson/view_lesson_bookings_extended.html', {'lesson_bookings': page.items, 'page': page, 'filter_form': filter_form, 'teacher': False})
 
     else:
         # Users that possess a Teacher profile can view their lesson_bookings
         search_term = request.GET.get('search_term')
+        helper = ListPaginationHelper()
+        search_helper = LessonSearchHelper()
+        filter_form = FilterLessonBookingsForm(request.GET, show_teacher=False)
+        # Filters that don't make sense are shown as errors on the form and otherwise ignored
+        filters = filter_form.cleaned_data if filter_form.is_valid() else {}
+        lesson_bookings = search_helper.lesson_bookings(search_term, teacher=request.user.teacher_profile, filters=filters)
+        page = helper.paginate(request, lesson_bookings, keyset=search_helper.lesson_booking_keyset(filters.get('sort')))
+
+        if search_term:
+            results_found = helper.count(lesson_bookings)
+            if results_found == 0:
+                messages.add_message(request, messages.ERROR,
+                        "No lesson bookings within your timetable matching your search term were found.")
+            else:
+                messages.add_message(request, messages.INFO,
+                        f"Found {results_found} lesson bookings that matched your search term in your timetable.")
 
-        if (search_term):
-            search_term = search_term.lower().strip(' ')
-
-            # Do query outside of django quering language as it uses derrived fields that cannot be operated on via SQL
-            lesson_bookings = list(filter(lambda lesson_booking: search_term in lesson_booking.lesson_request.student_profile.user.full_name().lower() or search_term in lesson_booking.lesson_request.student_profile.user.email.lower(),
-                LessonBooking.objects.filter(teacher=request.user.teacher_profile)))
-        else:
-            lesson_bookings = LessonBooking.objects.filter(teacher=request.user.teacher_profile)
-
-        results_found = len(lesson_bookings)
-        if results_found == 0 and search_term:
-            # sort lesson bookings by date they start
-            lesson_bookings.sort(key=lambda booking: booking.start_date_actual(), reverse=True)
-            messages.add_message(request, messages.ERROR,
-                    "No lesson bookings within your timetable matching your search term were found.")
-        elif search_term:
-            messages.add_message(request, messages.INFO,
-                    f"Found {results_found} lesson bookings that matched your search term in your timetable.")
-
-        return render(request, 'templates/lesson/view_lesson_bookings_extended.html', {'lesson_bookings': lesson_bookings, 'teacher': True})
+        return render(request, 'templates/lesson/view_lesson_bookings_extended.html', {'lesson_bookings': page.items, 'page': page, 'filter_form': filter_form, 'teacher': True})
 
 @login_required
 @user_types_permitted(['ADMIN', 'DIRECTOR'])
@@ -245,10 +304,18 @@ def update_lesson_booking(request, id):
             #try:
             form = UpdateLessonBookingForm(request.POST, instance=lesson_booking)
             if form.is_valid():
-                form.save()
-                messages.add_message(request, messages.SUCCESS,
-                    "The lesson booking has been successfully updated.")
-                return redirect('view_lesson_bookings')
+                try:
+                    form.save()
+                    messages.add_message(request, messages.SUCCESS,
+                        "The lesson booking has been successfully updated.")
+                    return redirect('view_lesson_bookings')
+                except ValidationError as error:
+                    # The teacher was booked by someone else while the form was being submitted
+                    form.add_error('teacher', error)
+                    lesson_booking.refresh_from_db()
+                    return render(request, 'templates/lesson/update_lesson_booking.html',
+                        {'lesson_booking': lesson_booking,
+                        'form': form })
             else:
                 return render(request, 'templates/lesson/update_lesson_booking.html',
                     {'lesson_booking': lesson_booking,
@@ -260,3 +327,59 @@ def update_lesson_booking(request, id):
         messages.add_message(request, messages.ERROR,
                 "The lesson booking you attempted to update was not found.")
         return redirect('view_lesson_bookings')
+
+"""
+Public - Signed token required
+Calendar apps fetch feeds without logging in, so the feed is found by a token only the profile's owner is shown
+"""
+
+def _calendar_feed(request, token):
+    """
+    Returns the kind, id and version of the feed a token is for, or None if it isn't valid
+    Worked out once per request, as both the conditional GET checks and the view need it
+    """
+    if not hasattr(request, '_calendar_feed'):
+        helper = CalendarFeedHelper()
+        feed = helper.read_token(token)
+        if feed is not None:
+            kind, id = feed
+            profiles = TeacherProfile.objects if kind == 'teacher' else StudentProfile.objects
+            feed = (kind, id, helper.version(kind, id)) if profiles.filter(id=id).exists() else None
+        request._calendar_feed = feed
+    return request._calendar_feed
+
+def _calendar_feed_etag(request, token):
+    """
+    Tags the feed with its bookings' count and newest change, so a removed booking changes the tag too
+    """
+    feed = _calendar_feed(request, token)
+    if feed is None:
+        return None
+    kind, id, (count, updated) = feed
+    return f"{kind}-{id}-{count}-{updated.timestamp() if updated else 0}"
+
+def _calendar_feed_last_modified(request, token):
+    """
+    Returns when a booking in the feed was last changed
+    """
+    feed = _calendar_feed(request, token)
+    return feed[2][1] if feed is not None else None
+
+@require_GET
+@condition(etag_func=_calendar_feed_etag, last_modified_func=_calendar_feed_last_modified)
+def calendar_feed(request, token):
+    """
+    Streams an iCalendar feed of a teacher's or student's lessons, each booking as a weekly recurring event
+    Clients polling with the ETag or Last-Modified they were given get a 304 while nothing has changed
+    """
+    feed = _calendar_feed(request, token)
+    if feed is None:
+        raise Http404('Calendar feed not found')
+
+    kind, id, version = feed
+    lines = (line + '\r\n' for line in CalendarFeedHelper().lines(kind, id))
+    response = StreamingHttpResponse(lines, content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="lessons.ics"'
+    # Clients should check with the server before reusing their copy, which is cheap thanks to the validators
+    response['Cache-Control'] = 'private, no-cache'
+    return response
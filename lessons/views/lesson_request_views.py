@@ -9,6 +9,7 @@ from lessons.models.user_models import User, UserType
 from django.views.decorators.http import require_POST, require_GET
 from lessons.decorators import *
 from django.http import HttpResponse
+from lessons.helpers import LessonSearchHelper, ListPaginationHelper
 
 """
 Generic (no specifc type) - Login required
@@ -58,26 +59,21 @@ def view_lesson_requests(request):
     else:
         # Users that possess an AdminProfile can view all lesson_requests
         search_term = request.GET.get('search_term')
+        helper = ListPaginationHelper()
+        lesson_requests = LessonSearchHelper().lesson_requests(search_term)
+        # Unfulfilled requests come first
+        page = helper.paginate(request, lesson_requests, keyset=['is_fulfilled', 'id'])
+
+        if search_term:
+            results_found = helper.count(lesson_requests)
+            if results_found == 0:
+                messages.add_message(request, messages.ERROR,
+                        "No lesson requests with students matching your search term were found.")
+            else:
+                messages.add_message(request, messages.INFO,
+                        f"Found {results_found} lesson requests that matched your search term.")
 
-        if (search_term):
-            search_term = search_term.lower().strip(' ')
-
-            # Do query outside of django quering language as it uses derrived fields that cannot be operated on via SQL
-            lesson_requests = list(filter(lambda lesson_request: search_term in lesson_request.student_profile.user.full_name().lower() or search_term in lesson_request.student_profile.user.email.lower(),
-                LessonRequest.objects.all()))
-        else:
-            lesson_requests = list(LessonRequest.objects.all())
-
-        results_found = len(lesson_requests)
-        lesson_requests.sort(key=lambda request: request.status(), reverse=True)
-        if results_found == 0 and search_term:
-            messages.add_message(request, messages.ERROR,
-                    "No lesson requests with students matching your search term were found.")
-        elif search_term:
-            messages.add_message(request, messages.INFO,
-                    f"Found {results_found} lesson requests that matched your search term.")
-
-        return render(request, 'templates/lesson/view_lesson_requests_extended.html', {'lesson_requests': lesson_requests})
+        return render(request, 'templates/lesson/view_lesson_requests_extended.html', {'lesson_requests': page.items, 'page': page})
 
 @login_required
 @user_types_permitted(['STUDENT'])
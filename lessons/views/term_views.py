@@ -5,6 +5,7 @@ from lessons.decorators import user_types_permitted
 from django.contrib.auth.decorators import login_required
 from lessons.models.term_models import *
 from lessons.forms.term_forms import *
+from lessons.helpers import ListPaginationHelper
 
 @login_required
 @user_types_permitted(['ADMIN', 'DIRECTOR'])
@@ -59,7 +60,6 @@ def view_school_terms(request):
     """
     show user all of the school terms
     """
-    if request.user.type == UserType.TEACHER:
-        return render(request, 'templates/term/view_school_terms.html', {'terms': SchoolTerm.objects.all(), 'readonly': True})
-    else:
-        return render(request, 'templates/term/view_school_terms.html', {'terms': SchoolTerm.objects.all(), 'readonly': False})
+    page = ListPaginationHelper().paginate(request, SchoolTerm.objects.all(), keyset=['start_date', 'id'])
+    return render(request, 'templates/term/view_school_terms.html',
+        {'terms': page.items, 'page': page, 'readonly': request.user.type == UserType.TEACHER})
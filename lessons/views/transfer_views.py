@@ -9,7 +9,8 @@ from django.contrib.auth.decorators import login_required
 from lessons.models.user_models import User, UserType
 from django.views.decorators.http import require_POST, require_GET
 from lessons.decorators import *
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+import io
 from lessons.view_models import TransactionViewModel
 from lessons.helpers import *
 
@@ -38,27 +39,19 @@ def view_transactions(request, email):
     Display transactions for a specified student profile
     """
     try:
-        student_helper = StudentProfileModelHelper()
         transaction_helper = TransactionModelHelper()
 
         student_profile = User.objects.get(username=email).student_profile
-
-        transfers = list(map(lambda pr_transfer: TransactionViewModel(transfer=pr_transfer), student_helper.transfers_for_student(student_profile)))
-        lesson_bookings = list(map(lambda pr_booking: TransactionViewModel(lesson_booking=pr_booking), student_helper.lesson_bookings_for_student(student_profile)))
-
-        transactions = transaction_helper.assign_balances(transfers + lesson_bookings)
-        transactions.sort(key = lambda trans: trans.date, reverse=True)
-
-        if len(transactions) > 0:
-            last_transaction = transactions[0]
-        else:
-            last_transaction = None
+        before = transaction_helper.decode_ledger_cursor(request.GET.get('before'), student_profile)
+        transactions, next_cursor = transaction_helper.ledger_page(student_profile, before)
 
         return render(request, 'templates/transfer/view_transactions.html',
             {
             'transactions': transactions,
             'student_profile': student_profile,
-            'last_transaction': last_transaction,
+            'current_balance': transaction_helper.current_balance(student_profile),
+            'next_cursor': next_cursor,
+            'is_first_page': before is None,
             'view_all': False
             })
 
@@ -76,21 +69,92 @@ def view_all_transactions(request):
     """
     transaction_helper = TransactionModelHelper()
 
-    transfers = list(map(lambda pr_transfer: TransactionViewModel(transfer=pr_transfer), Transfer.objects.all()))
-    lesson_bookings = list(map(lambda pr_booking: TransactionViewModel(lesson_booking=pr_booking), LessonBooking.objects.all()))
-    combined_list = transfers + lesson_bookings
-
-    transactions = transaction_helper.assign_balances(combined_list)
-    transactions.sort(key = lambda trans: trans.date, reverse=True)
-
-    if len(transactions) > 0:
-        last_transaction = transactions[0]
-    else:
-        last_transaction = None
+    before = transaction_helper.decode_ledger_cursor(request.GET.get('before'))
+    transactions, next_cursor = transaction_helper.ledger_page(None, before)
 
     return render(request, 'templates/transfer/view_transactions.html',
         {
         'transactions': transactions,
-        'last_transaction': last_transaction,
+        'current_balance': transaction_helper.current_balance(),
+        'next_cursor': next_cursor,
+        'is_first_page': before is None,
         'view_all': True
         })
+
+@login_required
+@user_types_permitted(['ADMIN', 'DIRECTOR'])
+def export_transactions(request):
+    """
+    Streams the school's transactions as a CSV or JSON lines file
+    """
+    if 'format' in request.GET:
+        form = ExportTransactionsForm(request.GET)
+        if form.is_valid():
+            helper = TransactionExportHelper()
+            rows = helper.rows(
+                school_term=form.cleaned_data.get('school_term'),
+                start_date=form.cleaned_data.get('start_date'),
+                end_date=form.cleaned_data.get('end_date'))
+
+            if form.cleaned_data.get('format') == 'jsonl':
+                response = StreamingHttpResponse(helper.jsonl_lines(rows), content_type='application/x-ndjson')
+            else:
+                response = StreamingHttpResponse(helper.csv_lines(rows), content_type='text/csv')
+
+            response['Content-Disposition'] = f'attachment; filename="transactions.{ form.cleaned_data.get("format") }"'
+            return response
+    else:
+        form = ExportTransactionsForm()
+
+    return render(request, 'templates/transfer/export_transactions.html', {'form': form})
+
+@login_required
+@user_types_permitted(['ADMIN', 'DIRECTOR'])
+def import_bank_statement(request):
+    """
+    Registers the transfers on an uploaded bank statement and shows what needs reconciling
+    """
+    report = None
+    if request.method == 'POST':
+        form = ImportBankStatementForm(request.POST, request.FILES)
+        if form.is_valid():
+            dry_run = form.cleaned_data.get('dry_run')
+            statement = io.TextIOWrapper(form.cleaned_data.get('statement').file, encoding='utf-8-sig', newline='')
+            try:
+                report = BankStatementImportHelper().import_statement(statement, dry_run=dry_run)
+            except UnicodeDecodeError:
+                form.add_error('statement', 'The statement must be a UTF-8 encoded CSV file')
+            except ValueError as error:
+                form.add_error('statement', str(error))
+            else:
+                if dry_run:
+                    messages.add_message(request, messages.INFO, f"{len(report.imported)} transfers would be registered")
+                else:
+                    messages.add_message(request, messages.SUCCESS, f"{len(report.imported)} transfers registered")
+    else:
+        form = ImportBankStatementForm()
+
+    report_sections = []
+    if report is not None:
+        report_sections = [('Invalid', report.invalid), ('Unmatched', report.unmatched), ('Duplicate', report.duplicates), ('Overpaid', report.overpaid)]
+
+    return render(request, 'templates/transfer/import_bank_statement.html', {'form': form, 'report': report, 'report_sections': report_sections})
+
+@login_required
+@user_types_permitted(['DIRECTOR'])
+def view_arrears(request):
+    """
+    Display the students that owe the school money
+    """
+    sort = request.GET.get('sort')
+    if sort not in ArrearsReportHelper.SORT_ORDERS:
+        sort = ArrearsReportHelper.DEFAULT_SORT
+
+    page = ArrearsReportHelper().page(request, sort)
+
+    return render(request, 'templates/director/view_arrears.html',
+        {
+        'accounts': page.items,
+        'page': page,
+        'sort': sort,
+        })
@@ -9,7 +9,10 @@ from django.contrib.auth.decorators import login_required
 from lessons.models.user_models import User, UserType
 from django.views.decorators.http import require_POST, require_GET
 from lessons.decorators import *
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from lessons.helpers import CalendarFeedHelper, UtilizationReportHelper, SchoolTermModelHelper, StudentSearchHelper, StudentTypeaheadIndex, ListPaginationHelper
+from lessons.models import SchoolTerm
 
 """
 Generic (no specifc type) - Login required
@@ -37,14 +40,22 @@ def dashboard(request):
     user = request.user
 
     if (user.type == UserType.STUDENT):
-        return render(request, 'templates/student/student_dashboard.html')
+        return render(request, 'templates/student/student_dashboard.html',
+            {'calendar_feed_url': _calendar_feed_url(request, 'student', user.student_profile.id)})
     elif (user.type == UserType.ADMIN):
         return render(request, 'templates/admin/admin_dashboard.html')
     elif(user.type == UserType.TEACHER):
-        return render(request, 'templates/teacher/teacher_dashboard.html')
+        return render(request, 'templates/teacher/teacher_dashboard.html',
+            {'calendar_feed_url': _calendar_feed_url(request, 'teacher', user.teacher_profile.id)})
     else:
         return render(request, 'templates/director/director_dashboard.html')
 
+def _calendar_feed_url(request, kind, id):
+    """
+    Returns the full address of a teacher's or student's calendar feed
+    """
+    return request.build_absolute_uri(reverse('calendar_feed', kwargs={'token': CalendarFeedHelper().token_for(kind, id)}))
+
 """
 Guest required
 The views below cannot be accessed by authenticated users.
@@ -102,7 +113,40 @@ def view_teachers(request):
     """
     Prompt user to view teacher accounts
     """
-    return render(request, 'templates/teacher/view_teachers.html', {'teachers': User.objects.filter(type=UserType.TEACHER)})
+    page = ListPaginationHelper().paginate(request, User.objects.filter(type=UserType.TEACHER), keyset=['id'])
+    return render(request, 'templates/teacher/view_teachers.html', {'teachers': page.items, 'page': page})
+
+@login_required
+@user_types_permitted(['DIRECTOR'])
+def view_utilization(request):
+    """
+    Display how full each teacher's week is in a school term, per weekday and per hour
+    The capacity is how many minutes of each hour a teacher can teach
+    """
+    school_terms = SchoolTerm.objects.order_by('start_date')
+    school_term = None
+    term_id = request.GET.get('term')
+    if term_id and term_id.isdigit():
+        school_term = school_terms.filter(id=term_id).first()
+    if school_term is None:
+        school_term = SchoolTermModelHelper().default_term_for_bookings() or school_terms.last()
+
+    capacity = request.GET.get('capacity')
+    capacity = int(capacity) if capacity and capacity.isdigit() and 1 <= int(capacity) <= 60 else UtilizationReportHelper.DEFAULT_CAPACITY
+
+    page, hours = None, []
+    if school_term is not None:
+        page, hours = UtilizationReportHelper().page(request, school_term, capacity)
+
+    return render(request, 'templates/director/view_utilization.html',
+        {
+        'school_terms': school_terms,
+        'school_term': school_term,
+        'capacity': capacity,
+        'teachers': page.items if page else None,
+        'page': page,
+        'hours': hours,
+        })
 
 @login_required
 @user_types_permitted(['DIRECTOR'])
@@ -225,7 +269,8 @@ def view_admins(request):
     """
     Prompt user to view admin accounts
     """
-    return render(request, 'templates/admin/view_admins.html', {'admins': User.objects.filter(type=UserType.ADMIN)})
+    page = ListPaginationHelper().paginate(request, User.objects.filter(type=UserType.ADMIN), keyset=['id'])
+    return render(request, 'templates/admin/view_admins.html', {'admins': page.items, 'page': page})
 
 @login_required
 @user_types_permitted(['ADMIN', 'DIRECTOR'])
@@ -233,25 +278,46 @@ def view_students(request):
     """
     Prompt user to view student accounts
     """
+    helper = ListPaginationHelper()
     search_term = request.GET.get('search_term')
 
     if (search_term):
-        search_term = search_term.lower().strip(' ')
-
-        students = list(filter(lambda student: search_term in student.user.full_name().lower() or search_term in student.user.email.lower(),
-            StudentProfile.objects.all()))
+        # Search results are ranked, so they are paged by number
+        students = StudentSearchHelper().search(search_term)
+        page = helper.paginate(request, students)
+
+        results_found = helper.count(students)
+        if results_found == 0:
+            messages.add_message(request, messages.ERROR,
+                    "No students matching your search term were found.")
+        else:
+            messages.add_message(request, messages.INFO,
+                    f"Found {results_found} students that matched your search term.")
     else:
-        students = StudentProfile.objects.all()
+        page = helper.paginate(request, StudentProfile.objects.select_related('user'), keyset=['id'])
 
-    results_found = len(students)
-    if results_found == 0 and search_term:
-        messages.add_message(request, messages.ERROR,
-                "No students matching your search term were found.")
-    elif search_term:
-        messages.add_message(request, messages.INFO,
-                f"Found {results_found} students that matched your search term.")
+    return render(request, 'templates/student/view_students.html', {'students': page.items, 'page': page})
 
-    return render(request, 'templates/student/view_students.html', {'students': students})
+@login_required
+@user_types_permitted(['ADMIN', 'DIRECTOR'])
+@require_GET
+def student_typeahead(request):
+    """
+    Returns, as JSON, the students whose first name, last name, full name or email starts with the q parameter
+    At most the limit parameter are returned, which defaults to 10
+    """
+    limit = request.GET.get('limit', '')
+    limit = min(int(limit), StudentTypeaheadIndex.MAX_LIMIT) if limit.isdigit() else StudentTypeaheadIndex.DEFAULT_LIMIT
+
+    students = StudentTypeaheadIndex.current().lookup(request.GET.get('q', ''), limit)
+    return JsonResponse({
+        'students': [{
+            'id': student_profile_id,
+            'user': user_id,
+            'name': full_name,
+            'email': email,
+        } for student_profile_id, user_id, full_name, email in students],
+    })
 
 @login_required
 @user_types_permitted(['DIRECTOR'])
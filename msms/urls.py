@@ -27,6 +27,7 @@ urlpatterns = [
     path('log-out/', views.log_out, name='log_out'),
     path('administrator-accounts/', views.view_admins, name="view_admins"),
     path('students/', views.view_students, name="view_students"),
+    path('students/typeahead/', views.student_typeahead, name="student_typeahead"),
     path('administrator-accounts/delete/<str:email>/', views.delete_admin, name="delete_admin"),
     path('', views.dashboard, name='home'),
     path('administrator-accounts/update/<str:email>/', views.update_admin, name="update_admin"),
@@ -35,6 +36,9 @@ urlpatterns = [
     path('lesson-requests/update/<int:id>/', views.update_lesson_request, name="update_lesson_request"),
     path('lesson-requests/delete/<int:id>/', views.delete_lesson_request, name="delete_lesson_request"),
     path('lesson-requests/book/<int:id>/', views.book_lesson, name="book_lesson"),
+    path('lesson-requests/book/<int:id>/free-slots/', views.find_free_slots, name="find_free_slots"),
+    path('lesson-requests/schedule/', views.schedule_lesson_requests, name="schedule_lesson_requests"),
+    path('calendar/<str:token>.ics', views.calendar_feed, name="calendar_feed"),
     path('lesson-bookings/', views.view_lesson_bookings, name="view_lesson_bookings"),
     path('lesson-bookings/delete/<int:id>/', views.delete_lesson_booking, name="delete_lesson_booking"),
     path('lesson-bookings/update/<int:id>/', views.update_lesson_booking, name="update_lesson_booking"),
@@ -45,7 +49,11 @@ urlpatterns = [
     path('register-transfer/', views.register_transfer, name="register_transfer"),
     path('transactions/<str:email>/', views.view_transactions, name="view_transactions"),
     path('transactions/', views.view_all_transactions, name="view_all_transactions"),
+    path('transactions-export/', views.export_transactions, name="export_transactions"),
+    path('transactions-import/', views.import_bank_statement, name="import_bank_statement"),
+    path('arrears/', views.view_arrears, name="view_arrears"),
     path('teachers/', views.view_teachers, name='view_teachers'),
+    path('teachers/utilization/', views.view_utilization, name='view_utilization'),
     path('teachers/update/<str:email>/', views.update_teacher, name="update_teacher"),
     path('teachers/delete/<str:email>/', views.delete_teacher, name="delete_teacher"),
     path('lesson-bookings/repeat/<int:id>/', views.request_repeat_booking, name="request_repeat_booking"),